@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, JSON, LargeBinary, Text, Date
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, JSON, LargeBinary, Text, Date, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.api.database import Base
@@ -135,6 +135,8 @@ class Engagement(Base):
     chart_mode = Column(String, default="standard_auditflow")
     client_letterhead_url = Column(String, nullable=True) # Timbrado do Cliente
     client_id = Column(Integer, ForeignKey("clients.id"))
+    # Bumped whenever engagement_balances is recomputed; NULL until first computed
+    balances_version = Column(Integer, nullable=True)
 
     client = relationship("Client", back_populates="engagements")
     transactions = relationship("Transaction", back_populates="engagement")
@@ -147,6 +149,14 @@ class Engagement(Base):
     mistatements = relationship("Mistatement", back_populates="engagement")
     trial_balance = relationship("TrialBalanceEntry", back_populates="engagement")
     fs_context = relationship("FinancialStatementContext", back_populates="engagement", uselist=False)
+    benford_sketches = relationship("BenfordSketch", back_populates="engagement")
+    ledger_snapshots = relationship("LedgerSnapshot", back_populates="engagement")
+    balances = relationship("EngagementBalance", back_populates="engagement")
+
+    @property
+    def year(self):
+        """Base year (of the period end) printed on reports and letters; None when the period is not set."""
+        return self.end_date.year if self.end_date else None
 
 
 class EngagementTeam(Base):
@@ -172,10 +182,34 @@ class Transaction(Base):
     amount = Column(Float)
     account_code = Column(String, nullable=True, index=True)
     account_name = Column(String, nullable=True, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), nullable=True, index=True)
+    # Firm mapping resolved at ingest and whenever mappings change (services.mapping_resolution)
+    mapping_id = Column(Integer, ForeignKey("account_mappings.id"), nullable=True, index=True)
+    standard_account_id = Column(Integer, ForeignKey("standard_accounts.id"), nullable=True, index=True)
+
+    __table_args__ = (
+        # Keyset pagination (services.transaction_query) and amount range filters
+        Index("ix_transactions_engagement_date_id", "engagement_id", "date", "id"),
+        Index("ix_transactions_engagement_amount", "engagement_id", "amount"),
+    )
 
     engagement = relationship("Engagement", back_populates="transactions")
 
 
+class Vendor(Base):
+    __tablename__ = "vendors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    firm_id = Column(Integer, ForeignKey("audit_firms.id"), index=True)
+    # Accent-folded, punctuation-free, token-sorted name (duplicate_analysis.normalize_vendor)
+    normalized_name = Column(String, index=True)
+    name = Column(String)  # First spelling seen
+
+    __table_args__ = (
+        UniqueConstraint("firm_id", "normalized_name", name="uq_vendors_firm_normalized_name"),
+    )
+
+
 class AnalysisResult(Base):
     __tablename__ = "analysis_results"
 
@@ -190,6 +224,65 @@ class AnalysisResult(Base):
     engagement = relationship("Engagement", back_populates="analysis_results")
 
 
+class BenfordSketch(Base):
+    __tablename__ = "benford_sketches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    engagement_id = Column(Integer, ForeignKey("engagements.id"), index=True)
+    account_code = Column(String, nullable=True, index=True)  # One sketch per account
+    # Digit count vectors keyed by Benford test (see benford_analysis.benford_counts)
+    counts = Column(JSON)
+    row_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    engagement = relationship("Engagement", back_populates="benford_sketches")
+
+    __table_args__ = (
+        # NULL account codes share one sketch too (PostgreSQL 15+)
+        UniqueConstraint("engagement_id", "account_code", name="uq_benford_sketches_engagement_account",
+                         postgresql_nulls_not_distinct=True),
+    )
+
+
+class LedgerSnapshot(Base):
+    __tablename__ = "ledger_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    engagement_id = Column(Integer, ForeignKey("engagements.id"), index=True)
+    version = Column(Integer)  # Snapshots are immutable; each rebuild writes a new version
+    path = Column(String)  # Directory of per-column .npy files (services.ledger_snapshot)
+    row_count = Column(Integer, default=0)
+    checksum = Column(String)  # SHA-256 of the column files
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    engagement = relationship("Engagement", back_populates="ledger_snapshots")
+
+    __table_args__ = (
+        UniqueConstraint("engagement_id", "version", name="uq_ledger_snapshots_engagement_version"),
+    )
+
+
+class EngagementBalance(Base):
+    __tablename__ = "engagement_balances"
+
+    id = Column(Integer, primary_key=True, index=True)
+    engagement_id = Column(Integer, ForeignKey("engagements.id"), index=True)
+    standard_account_id = Column(Integer, ForeignKey("standard_accounts.id"), index=True)
+    period = Column(String, nullable=True)  # "YYYY-MM"; NULL for undated transactions
+    balance = Column(Float, default=0.0)
+    transaction_count = Column(Integer, default=0)
+    version = Column(Integer)  # Engagement.balances_version that computed the row
+
+    engagement = relationship("Engagement", back_populates="balances")
+
+    __table_args__ = (
+        # Undated balances (NULL period) are unique too (PostgreSQL 15+)
+        UniqueConstraint("engagement_id", "standard_account_id", "period",
+                         name="uq_engagement_balances_engagement_account_period",
+                         postgresql_nulls_not_distinct=True),
+    )
+
+
 class StandardAccount(Base):
     __tablename__ = "standard_accounts"
     id = Column(Integer, primary_key=True, index=True)
@@ -202,6 +295,8 @@ class StandardAccount(Base):
         "standard_accounts.id"), nullable=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)
     level = Column(Integer, default=1)
+    # Materialized path of ancestor ids, root first: "/1/4/9/" (services.chart_of_accounts)
+    path = Column(String, index=True, nullable=True)
     is_active = Column(Boolean, default=True)
 
     mappings = relationship(
@@ -223,8 +318,14 @@ class AccountMapping(Base):
     id = Column(Integer, primary_key=True, index=True)
     firm_id = Column(Integer, ForeignKey("audit_firms.id"))
     client_description = Column(String, index=True)
+    # services.mapping_resolution.description_key(client_description): matches spelling variants
+    description_key = Column(String(16), nullable=True)
     client_account_code = Column(String, nullable=True, index=True)
     standard_account_id = Column(Integer, ForeignKey("standard_accounts.id"))
+    # Stamped on every write, so cached suggestion indexes notice re-mapped descriptions
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_account_mappings_firm_description_key", "firm_id", "description_key"),)
 
     firm = relationship("AuditFirm", back_populates="account_mappings")
     standard_account = relationship(
@@ -1,5 +1,7 @@
+import os
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -7,12 +9,12 @@ from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
 from src.scripts.benford_analysis import calculate_benford
-from src.scripts.duplicate_analysis import find_duplicates
-from src.scripts.pdf_generator import generate_audit_report
-from src.scripts.docx_generator import generate_audit_report_docx
-from src.scripts.export_utils import export_to_excel, export_to_csv, benford_to_df, duplicates_to_df, transactions_to_df, mistatements_to_df
+from src.scripts.duplicate_analysis import find_duplicates, AMOUNT_TOLERANCE, AMOUNT_TOLERANCE_PCT
+from src.scripts.export_utils import export_to_excel, export_to_csv, export_to_ndjson, benford_to_df, duplicates_to_df, mistatements_to_df
+from src.api.services.transaction_export import EXPORT_MEDIA_TYPES, stream_transactions
 from celery.result import AsyncResult
-from src.api.tasks import task_run_benford, task_run_duplicates
+from src.api.tasks import task_render_report, task_run_benford, task_run_duplicates
+from src.api.services.report_cache import REPORT_MEDIA_TYPES, cached_report_path, claim_render, report_key
 
 router = APIRouter(
     prefix="/engagements",
@@ -22,6 +24,7 @@ router = APIRouter(
 @router.post("/{engagement_id}/run-benford", status_code=status.HTTP_202_ACCEPTED)
 def run_benford_analysis(
     engagement_id: int,
+    account_code: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -34,12 +37,15 @@ def run_benford_analysis(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    task = task_run_benford.delay(engagement_id, current_user.id)
+    task = task_run_benford.delay(engagement_id, current_user.id, account_code)
     return {"task_id": task.id}
 
 @router.post("/{engagement_id}/run-duplicates", status_code=status.HTTP_202_ACCEPTED)
 def run_duplicate_analysis(
     engagement_id: int,
+    mode: str = Query('exact', enum=['exact', 'near']),
+    amount_tolerance: float = Query(AMOUNT_TOLERANCE, ge=0),
+    amount_tolerance_pct: float = Query(AMOUNT_TOLERANCE_PCT, ge=0, le=1),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -52,7 +58,7 @@ def run_duplicate_analysis(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    task = task_run_duplicates.delay(engagement_id, current_user.id)
+    task = task_run_duplicates.delay(engagement_id, current_user.id, mode, amount_tolerance, amount_tolerance_pct)
     return {"task_id": task.id}
 
 @router.get("/tasks/{task_id}")
@@ -82,13 +88,18 @@ def read_analysis_results(
         models.AnalysisResult.engagement_id == engagement.id
     ).order_by(models.AnalysisResult.executed_at.desc()).all()
 
-@router.get("/{engagement_id}/report", response_class=StreamingResponse)
+@router.get("/{engagement_id}/report")
 def download_audit_report(
     engagement_id: int,
     format: str = Query('pdf', enum=['pdf', 'docx']),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    """
+    Returns the audit report when a render of the current inputs is cached.
+    Otherwise answers 202 with {"task_id"}: poll /engagements/tasks/{task_id},
+    then request the report again. Concurrent requests share one render.
+    """
     # 1. Fetch Engagement (with client info)
     engagement = db.query(models.Engagement).join(models.Client).filter(
         models.Engagement.id == engagement_id,
@@ -98,46 +109,25 @@ def download_audit_report(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    # 2. Fetch Analysis History
-    results = db.query(models.AnalysisResult).filter(
-        models.AnalysisResult.engagement_id == engagement.id
-    ).order_by(models.AnalysisResult.executed_at.desc()).all()
-
-    # 3. Fetch Mistatements Summary
-    mistatements = db.query(models.Mistatement).filter(
-        models.Mistatement.engagement_id == engagement.id
-    ).all()
-
-    mistatement_summary = {
-        "items": mistatements,
-        "total_adjusted": sum(m.amount_divergence for m in mistatements if m.status == 'adjusted'),
-        "total_unadjusted": sum(m.amount_divergence for m in mistatements if m.status in ['open', 'unadjusted'])
-    }
-
-    # 4. Generate Document
+    # 2. Cached render of the current inputs (results, mistatements, transaction count, letterhead)
+    key = report_key(db, engagement, format)
+    path = cached_report_path(engagement.id, key, format)
     filename_base = f"Relatorio_Auditoria_{engagement.client.name.replace(' ', '_')}_{engagement.year}"
 
-    if format == 'docx':
-        buffer = generate_audit_report_docx(engagement, results, mistatement_summary)
-        media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        filename = f"{filename_base}.docx"
-    else:
-        buffer = generate_audit_report(engagement, results, mistatement_summary)
-        media_type = "application/pdf"
-        filename = f"{filename_base}.pdf"
+    if os.path.exists(path):
+        return FileResponse(path, media_type=REPORT_MEDIA_TYPES[format], filename=f"{filename_base}.{format}")
 
-    # 5. Return Stream
-    return StreamingResponse(
-        buffer,
-        media_type=media_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    # 3. Render in the background; only the first request enqueues it
+    task_id = f"report-{key}"
+    if claim_render(engagement.id, key, format):
+        task_render_report.apply_async((engagement.id, format, key), task_id=task_id)
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"task_id": task_id})
 
 @router.get("/{engagement_id}/export/{export_type}")
 def export_data(
     engagement_id: int,
-    export_type: str, # benford, duplicates, transactions, mistatements
-    format: str = Query('xlsx', enum=['xlsx', 'csv']),
+    export_type: str, # benford, duplicates, near_duplicates, transactions, mistatements
+    format: str = Query('xlsx', enum=['xlsx', 'csv', 'ndjson']),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -153,13 +143,18 @@ def export_data(
     filename_base = f"{export_type}_{engagement.name}"
 
     if export_type == 'transactions':
-        df = transactions_to_df(engagement.transactions)
+        # Streamed in chunks straight from the database: memory does not grow with the ledger
+        return StreamingResponse(
+            stream_transactions(db, engagement.id, format),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f"attachment; filename={filename_base}.{format}"}
+        )
 
     elif export_type == 'mistatements':
          mistatements = db.query(models.Mistatement).filter(models.Mistatement.engagement_id == engagement.id).all()
          df = mistatements_to_df(mistatements)
 
-    elif export_type in ['benford', 'duplicates']:
+    elif export_type in ['benford', 'duplicates', 'near_duplicates']:
         # Fetch latest result
         result = db.query(models.AnalysisResult).filter(
             models.AnalysisResult.engagement_id == engagement.id,
@@ -187,6 +182,10 @@ def export_data(
         buffer = export_to_csv(df)
         media_type = "text/csv"
         filename = f"{filename_base}.csv"
+    elif format == 'ndjson':
+        buffer = export_to_ndjson(df)
+        media_type = EXPORT_MEDIA_TYPES['ndjson']
+        filename = f"{filename_base}.ndjson"
     else:
         buffer = export_to_excel([df], sheet_names=[export_type.capitalize()])
         media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
@@ -2,13 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
-import io
-import zipfile
 
 from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
-from src.scripts.pdf_generator import generate_confirmation_letter
+from src.api.services.confirmation_letters import LetterJob, render_letters, stream_zip
 
 router = APIRouter(
     prefix="/circularization",
@@ -92,26 +90,21 @@ def download_circularization_letters(
     if not requests:
         raise HTTPException(status_code=400, detail="No confirmation requests found. Generate them first.")
 
-    # Create ZIP in memory
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zf:
-        for req in requests:
-            # Generate PDF
-            pdf_bytes = generate_confirmation_letter(
-                type=req.type,
-                client_data={'name': engagement.client.name},
-                recipient_data={'name': req.recipient_name},
-                date_base=f"31/12/{engagement.year}", # Or handle specific date
-                logo_bytes=engagement.client.logo_content
-            )
-
-            filename = f"{req.type}_{req.recipient_name.replace(' ', '_')}.pdf"
-            zf.writestr(filename, pdf_bytes.getvalue())
-
-    zip_buffer.seek(0)
+    # Plain jobs: letters are rendered (in a process pool for large batches) while the ZIP streams
+    jobs = [
+        LetterJob(
+            filename=f"{req.type}_{req.recipient_name.replace(' ', '_')}.pdf",
+            type=req.type,
+            client_name=engagement.client.name,
+            recipient_name=req.recipient_name,
+            date_base=f"31/12/{engagement.year}", # Or handle specific date
+        )
+        for req in requests
+    ]
+    letters = render_letters(jobs, logo_bytes=engagement.client.logo_content)
 
     return StreamingResponse(
-        zip_buffer,
+        stream_zip(letters),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename=Circularizacoes_{engagement.client.name}.zip"}
     )
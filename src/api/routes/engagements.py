@@ -1,25 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
-import pandas as pd
-import io
 
 from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
+from src.api.services.transaction_query import (
+    MAX_TRANSACTION_PAGE_SIZE, TRANSACTION_PAGE_SIZE, InvalidCursor, TransactionFilters, page_transactions
+)
+from src.api.services.upload_jobs import spool_upload
+from src.api.tasks import task_ingest_transactions
 
 router = APIRouter(
     prefix="/engagements",
     tags=["engagements"]
 )
 
-@router.get("/{engagement_id}/transactions", response_model=List[schemas.TransactionRead])
+@router.get("/{engagement_id}/transactions", response_model=schemas.TransactionPage)
 def read_engagement_transactions(
     engagement_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(TRANSACTION_PAGE_SIZE, ge=1, le=MAX_TRANSACTION_PAGE_SIZE),
+    vendor: Optional[str] = None,
+    account_code: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    """
+    Transactions ordered by (date, id), one page at a time: follow ``next_cursor``
+    until it is null. ``vendor`` and ``account_code`` match prefixes; amount and
+    date ranges are inclusive.
+    """
     # Verify Engagement belongs to user's firm via Client
     engagement = db.query(models.Engagement).join(models.Client).filter(
         models.Engagement.id == engagement_id,
@@ -29,9 +45,14 @@ def read_engagement_transactions(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    return engagement.transactions
+    filters = TransactionFilters(vendor=vendor, account_code=account_code, min_amount=min_amount,
+                                 max_amount=max_amount, date_from=date_from, date_to=date_to)
+    try:
+        return page_transactions(db, engagement_id, filters, cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/{engagement_id}/upload", status_code=status.HTTP_201_CREATED)
+@router.post("/{engagement_id}/upload", status_code=status.HTTP_202_ACCEPTED)
 def upload_transactions_to_engagement(
     engagement_id: int,
     file: UploadFile = File(...),
@@ -41,6 +62,9 @@ def upload_transactions_to_engagement(
     """
     Uploads a CSV to an existing engagement.
     Supported columns: vendor, amount, date, description, account_code, account_name
+
+    The file is spooled to disk and loaded by a background task; poll
+    /engagements/tasks/{task_id} for progress and the import stats.
     """
     # 1. Verify Engagement permissions
     engagement = db.query(models.Engagement).join(models.Client).filter(
@@ -51,57 +75,13 @@ def upload_transactions_to_engagement(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    # 2. Parse CSV
+    # 2. Spool and hand off to the ingestion task (chunked, bulk inserts)
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
 
-    try:
-        content = file.file.read()
-        df = pd.read_csv(io.BytesIO(content))
-
-        # Normalize columns
-        df.columns = [c.lower().strip() for c in df.columns]
-
-        # Basic Validation
-        required_cols = {'vendor', 'amount'}
-        if not required_cols.issubset(set(df.columns)):
-             raise HTTPException(status_code=400, detail=f"CSV must contain columns: {required_cols}")
-
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading CSV: {str(e)}")
-
-    # 3. Create Transactions
-    transactions = []
-    for _, row in df.iterrows():
-        tx_date = None
-        if 'date' in df.columns and pd.notna(row['date']):
-            try:
-                tx_date = pd.to_datetime(row['date']).to_pydatetime()
-            except:
-                pass
-
-        # Extract account info if present (supports aliases)
-        account_code = str(row.get('account_code') or row.get('conta') or row.get('code') or '')
-        if account_code == 'nan': account_code = None
-
-        account_name = str(row.get('account_name') or row.get('description') or row.get('descricao') or '')
-        if account_name == 'nan': account_name = None
-
-        tx = models.Transaction(
-            engagement_id=engagement.id,
-            vendor=str(row['vendor']),
-            amount=float(row['amount']),
-            description=str(row.get('description', '')),
-            date=tx_date,
-            account_code=account_code,
-            account_name=account_name
-        )
-        transactions.append(tx)
-
-    db.add_all(transactions)
-    db.commit()
-
-    return {"message": f"Successfully imported {len(transactions)} transactions."}
+    path = spool_upload(file)
+    task = task_ingest_transactions.delay(engagement.id, current_user.firm_id, path)
+    return {"task_id": task.id}
 
 @router.post("/{engagement_id}/letterhead", status_code=status.HTTP_201_CREATED)
 def upload_letterhead(
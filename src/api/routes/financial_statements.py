@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from datetime import datetime
 
 from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
+from src.api.services.balance_cache import balances_etag, ensure_balances, etag_matches
+from src.api.services.chart_of_accounts import account_tree, engagement_template
+from src.api.services.financial_rollup import account_rollup, rollup_balances
 
 router = APIRouter(
     prefix="/engagements/{engagement_id}/fs",
@@ -69,6 +71,8 @@ def update_fs_context(
 @router.get("/generate")
 def generate_financial_statements(
     engagement_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -79,68 +83,37 @@ def generate_financial_statements(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    # 1. Get Mappings
-    mappings = db.query(models.AccountMapping).filter(
-        models.AccountMapping.firm_id == current_user.firm_id
-    ).all()
-
-    # Map by Client Code -> Standard ID
-    mapping_dict = {m.client_account_code: m.standard_account_id for m in mappings if m.client_account_code}
-
-    # 2. Get Transaction Data (Aggregated by Account Code)
-    # We assume 'Transaction' table is the source of truth for now.
-    # Group by account_code
-    balances = db.query(
-        models.Transaction.account_code,
-        models.Transaction.account_name,
-        func.sum(models.Transaction.amount).label("final_balance")
-    ).filter(
-        models.Transaction.engagement_id == engagement_id
-    ).group_by(models.Transaction.account_code, models.Transaction.account_name).all()
-
-    # 3. Aggregate by Standard Account
-    # Structure: standard_account_code -> total
-    std_balances = {}
-
-    # Pre-fetch standard accounts to know their codes and types
-    if engagement.chart_mode == "client_custom":
-        std_accs = db.query(models.StandardAccount).filter(models.StandardAccount.client_id == engagement.client_id).all()
-    else:
-        std_accs = db.query(models.StandardAccount).filter(models.StandardAccount.template_type == "br_gaap").all()
-
-    std_map = {sa.id: sa for sa in std_accs}
-
-    for code, name, balance in balances:
-        if code in mapping_dict:
-            std_id = mapping_dict[code]
-            if std_id in std_map:
-                std_code = std_map[std_id].code
-                std_balances[std_code] = std_balances.get(std_code, 0.0) + (balance or 0.0)
+    # Context for Notes
+    context = db.query(models.FinancialStatementContext).filter(
+        models.FinancialStatementContext.engagement_id == engagement_id
+    ).first()
+    context_data = context.context_data if context else {}
 
-    # 4. Construct BP and DRE
-    # This requires mapping Standard Codes (e.g. "1.1.01") to Report Lines (e.g. "Caixa e Equivalentes").
-    # Assuming Standard Plan matches Report Structure:
+    # Unchanged while the balances, chart and notes context are the same
+    ensure_balances(db, engagement)
+    tree = account_tree(db, engagement_template(engagement))
+    etag = balances_etag(engagement, engagement.chart_mode, *tree.signature,
+                         context.updated_at.timestamp() if context and context.updated_at else 0)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
 
-    # Helper to sum by prefix
-    def get_bal(prefix):
-        total = 0.0
-        for k, v in std_balances.items():
-            if k.startswith(prefix):
-                total += v
-        return total
+    # 1. Balances by standard code prefix, aggregated and rolled up in the database
+    # (materialized engagement balances -> standard account)
+    balances = rollup_balances(db, engagement)
 
     # Balanço Patrimonial (Simplificado para MVP)
     bp = {
         "ativo": {
-            "circulante": get_bal("1.1"),
-            "nao_circulante": get_bal("1.2"),
-            "total": get_bal("1")
+            "circulante": balances["1.1"],
+            "nao_circulante": balances["1.2"],
+            "total": balances["1"]
         },
         "passivo": {
-            "circulante": get_bal("2.1"),
-            "nao_circulante": get_bal("2.2"),
-            "patrimonio_liquido": get_bal("2.3"),
-            "total": get_bal("2")
+            "circulante": balances["2.1"],
+            "nao_circulante": balances["2.2"],
+            "patrimonio_liquido": balances["2.3"],
+            "total": balances["2"]
         }
     }
 
@@ -150,8 +123,8 @@ def generate_financial_statements(
     # Revenue (Credit) -> Negative. Expense (Debit) -> Positive.
     # We typically invert for reporting.
 
-    receita = -1 * get_bal("3")
-    despesa = get_bal("4")
+    receita = -1 * balances["3"]
+    despesa = balances["4"]
     lucro = receita - despesa # Simplified
 
     dre = {
@@ -161,12 +134,6 @@ def generate_financial_statements(
         "lucro_liquido": lucro
     }
 
-    # Context for Notes
-    context = db.query(models.FinancialStatementContext).filter(
-        models.FinancialStatementContext.engagement_id == engagement_id
-    ).first()
-    context_data = context.context_data if context else {}
-
     # Construct Notes
     # Using simplistic placeholders if data is missing, or formatting based on context
 
@@ -204,7 +171,7 @@ def generate_financial_statements(
     validations = {
         "accounting_equation": accounting_equation,
         "dre_dmpl_reconciliation": True,
-        "balance_check": abs(get_bal("1") + get_bal("2") + get_bal("3") + get_bal("4")) < 0.01
+        "balance_check": abs(balances["1"] + balances["2"] + balances["3"] + balances["4"]) < 0.01
     }
 
     validations["all_checks_passed"] = all(validations.values())
@@ -216,7 +183,9 @@ def generate_financial_statements(
         "validations": validations,
         "indicadores": {
             "margem_liquida": (lucro / receita) if receita else 0
-        }
+        },
+        # Every account of the chart with its sub-accounts rolled up (balancete)
+        "accounts": account_rollup(db, engagement)
     }
 
 @router.post("/cash-flow")
@@ -252,46 +221,13 @@ def calculate_cash_flow(
     context.updated_at = datetime.utcnow()
     db.commit()
 
-    # 2. Calculate Net Income (Automatic)
-    # Ideally, we should reuse the logic from `generate`.
-    # For simplicity/DRY, we'll re-run a simplified version or call an internal helper.
-    # Re-implementing simplified logic here to avoid refactoring risk right now.
-
-    # Get Mappings
-    mappings = db.query(models.AccountMapping).filter(
-        models.AccountMapping.firm_id == current_user.firm_id
-    ).all()
-    mapping_dict = {m.client_account_code: m.standard_account_id for m in mappings if m.client_account_code}
-
-    # Get Balances
-    balances = db.query(
-        models.Transaction.account_code,
-        func.sum(models.Transaction.amount).label("final_balance")
-    ).filter(
-        models.Transaction.engagement_id == engagement_id
-    ).group_by(models.Transaction.account_code).all()
-
-    # Standard Accounts
-    engagement = db.query(models.Engagement).filter(models.Engagement.id == engagement_id).first()
-    if engagement.chart_mode == "client_custom":
-        std_accs = db.query(models.StandardAccount).filter(models.StandardAccount.client_id == engagement.client_id).all()
-    else:
-        std_accs = db.query(models.StandardAccount).filter(models.StandardAccount.template_type == "br_gaap").all()
-    std_map = {sa.id: sa for sa in std_accs}
-
-    std_balances = {}
-    for code, balance in balances:
-        if code in mapping_dict:
-            std_id = mapping_dict[code]
-            if std_id in std_map:
-                std_code = std_map[std_id].code
-                std_balances[std_code] = std_balances.get(std_code, 0.0) + (balance or 0.0)
-
-    # Calculate Net Income (Revenue - Expense)
+    # 2. Calculate Net Income (Automatic), same rollup as `generate`
     # Revenue (3) is negative in DB, Expenses (4) positive.
     # Profit = -1 * Rev - Exp
-    receita = -1 * sum(v for k, v in std_balances.items() if k.startswith("3"))
-    despesa = sum(v for k, v in std_balances.items() if k.startswith("4"))
+    engagement = db.query(models.Engagement).filter(models.Engagement.id == engagement_id).first()
+    balances = rollup_balances(db, engagement, prefixes=("3", "4"))
+    receita = -1 * balances["3"]
+    despesa = balances["4"]
     net_income = receita - despesa
 
     # 3. Apply Adjustments (Indirect Method)
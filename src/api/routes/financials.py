@@ -1,48 +1,25 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, status
 from sqlalchemy.orm import Session
 from ..database import get_db
-import pandas as pd
-import io
-from typing import List
+from ..services.upload_jobs import spool_upload
+from ..tasks import task_preview_financial_file
 
 router = APIRouter()
 
-@router.post("/import", summary="Import Financial Data (Trial Balance)")
-async def import_financial_data(
+@router.post("/import", summary="Import Financial Data (Trial Balance)", status_code=status.HTTP_202_ACCEPTED)
+def import_financial_data(
     engagement_id: int = Form(...),
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
     """
     Parses a Trial Balance (Balancete) from Excel or CSV.
-    Returns the raw data preview and detected columns for mapping.
+    The raw data preview and detected columns for mapping are returned by a
+    background task (poll /engagements/tasks/{task_id}).
     """
-    contents = await file.read()
-    
-    try:
-        if file.filename.endswith('.xlsx') or file.filename.endswith('.xls'):
-            df = pd.read_excel(io.BytesIO(contents))
-        elif file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(contents), encoding='utf-8') # Try utf-8 first
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Use .xlsx, .xls, or .csv")
-            
-        # Clean data (sanitize columns)
-        df.columns = [str(c).strip() for c in df.columns]
-        df = df.where(pd.notnull(df), None) # Replace NaN with None for JSON compatibility
-        
-        # Identification of potential columns (Heuristic)
-        # This acts as the 'De-Para' pre-processing
-        preview = df.head(10).to_dict(orient='records')
-        columns = df.columns.tolist()
-        
-        return {
-            "filename": file.filename,
-            "total_rows": len(df),
-            "columns": columns,
-            "preview": preview,
-            "message": "File parsed successfully. Please map the columns."
-        }
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Use .xlsx, .xls, or .csv")
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error parsing file: {str(e)}")
+    path = spool_upload(file)
+    task = task_preview_financial_file.delay(engagement_id, path, file.filename)
+    return {"task_id": task.id}
@@ -3,7 +3,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
 
-from src.api.services.ingestion import TrialBalanceIngestion
+from src.api.services.chart_of_accounts import link_parents_by_code, rebuild_account_paths
+from src.api.services.mapping_resolution import description_key, load_mapping_lookup
+from src.api.services.mapping_suggestions import invalidate_suggestion_indexes, suggest_mappings
+from src.api.services.mapping_upsert import upsert_mappings
+from src.api.services.upload_jobs import spool_upload
+from src.api.tasks import task_find_unmapped_accounts, task_resolve_mappings
 from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
@@ -114,6 +119,11 @@ def save_as_standard(
             db.add(new_std)
             count += 1
 
+    # Hierarchy from the client's codes (1.1.01 -> 1.1), then paths; drops the cached tree
+    template_type = f"custom_{engagement.client_id}"
+    db.flush()
+    link_parents_by_code(db, template_type)
+    rebuild_account_paths(db, template_type)
     db.commit()
 
     # Auto-switch mode
@@ -141,7 +151,14 @@ def get_mapping_context(
         models.Transaction.account_name
     ).filter(models.Transaction.engagement_id == engagement_id).distinct()
 
-    client_accounts = [{"code": r.account_code, "name": r.account_name} for r in client_accounts_query.all() if r.account_code]
+    # Each account carries the firm mapping it resolves to (by code, then normalized description)
+    lookup = load_mapping_lookup(db, current_user.firm_id)
+    client_accounts = []
+    for r in client_accounts_query.all():
+        if r.account_code:
+            mapping_id, standard_account_id = lookup.resolve(r.account_code, r.account_name)
+            client_accounts.append({"code": r.account_code, "name": r.account_name,
+                                    "mapping_id": mapping_id, "standard_account_id": standard_account_id})
 
     # 2. Get Standard Accounts based on mode
     if engagement.chart_mode == "client_custom":
@@ -194,10 +211,11 @@ def create_mapping(
             models.AccountMapping.client_account_code == mapping.client_account_code
         ).first()
     else:
+        # Spelling variants of the description share the key (indexed with firm_id)
         existing = db.query(models.AccountMapping).filter(
             models.AccountMapping.firm_id == current_user.firm_id,
-            models.AccountMapping.client_description == mapping.client_description
-        ).first()
+            models.AccountMapping.description_key == description_key(mapping.client_description)
+        ).order_by(models.AccountMapping.id.desc()).first()
 
     if existing:
         existing.standard_account_id = mapping.standard_account_id
@@ -206,20 +224,26 @@ def create_mapping(
              existing.client_account_code = mapping.client_account_code
         if mapping.client_description:
              existing.client_description = mapping.client_description
+             existing.description_key = description_key(mapping.client_description)
 
         db.commit()
         db.refresh(existing)
+        invalidate_suggestion_indexes(current_user.firm_id)
+        task_resolve_mappings.delay(current_user.firm_id)
         return existing
     else:
         new_mapping = models.AccountMapping(
             firm_id=current_user.firm_id,
             client_description=mapping.client_description,
+            description_key=description_key(mapping.client_description),
             client_account_code=mapping.client_account_code,
             standard_account_id=mapping.standard_account_id
         )
         db.add(new_mapping)
         db.commit()
         db.refresh(new_mapping)
+        invalidate_suggestion_indexes(current_user.firm_id)
+        task_resolve_mappings.delay(current_user.firm_id)
         return new_mapping
 
 @router.get("/firm-mappings", response_model=List[schemas.AccountMappingRead])
@@ -231,41 +255,39 @@ def list_firm_mappings(
         models.AccountMapping.firm_id == current_user.firm_id
     ).all()
 
-@router.post("/upload-trial-balance", response_model=List[str])
+@router.post("/upload-trial-balance", status_code=status.HTTP_202_ACCEPTED)
 def analyze_trial_balance(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """
-    Parses a Trial Balance (CSV/Excel) and returns a list of account descriptions
-    that are NOT yet mapped for this firm.
+    Parses a Trial Balance (CSV/Excel) in a background task. The task result
+    ({"unmapped": [...], "suggestions": {...}, "auto_mapped": {...}}, via
+    /engagements/tasks/{task_id}) lists the account descriptions that are NOT yet
+    mapped for this firm, each with its suggested standard accounts, and the
+    standard account id of those matched by a mapping from any client.
     """
-    try:
-        df = TrialBalanceIngestion.read_file(file)
-        result = TrialBalanceIngestion.validate_and_parse(df)
-
-        if not result["valid"]:
-             raise HTTPException(status_code=400, detail=f"Invalid file structure: {', '.join(result['errors'])}")
-
-        unique_accounts = result["unique_accounts"]
-
-        # Get existing mappings for firm (by description or code if available in parse result)
-        # Note: validate_and_parse returns descriptions list in unique_accounts.
+    if not file.filename.lower().endswith(('.csv', '.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Use CSV, XLSX, or XLS.")
 
-        existing_mappings = db.query(models.AccountMapping.client_description).filter(
-            models.AccountMapping.firm_id == current_user.firm_id
-        ).all()
-        mapped_set = {m[0] for m in existing_mappings}
-
-        # Filter unmapped
-        unmapped = [acc for acc in unique_accounts if acc not in mapped_set]
-        return unmapped
+    path = spool_upload(file)
+    task = task_find_unmapped_accounts.delay(current_user.firm_id, path, file.filename)
+    return {"task_id": task.id}
 
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+@router.post("/suggestions", response_model=dict)
+def suggest_account_mappings(
+    descriptions: List[str],
+    template_type: str = Query("br_gaap"),
+    top_k: int = Query(3, ge=1, le=20),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Top-k standard account candidates ({standard_account_id, code, name, score})
+    for each client description, from the firm's cached suggestion index.
+    """
+    return suggest_mappings(db, current_user.firm_id, descriptions, template_type, top_k)
 
 @router.post("/bulk-map", status_code=status.HTTP_201_CREATED)
 def bulk_create_mapping(
@@ -273,40 +295,15 @@ def bulk_create_mapping(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    count = 0
-    for mapping in mappings:
-        # Prioritize Code mapping
-        existing = None
-        if mapping.client_account_code:
-            existing = db.query(models.AccountMapping).filter(
-                models.AccountMapping.firm_id == current_user.firm_id,
-                models.AccountMapping.client_account_code == mapping.client_account_code
-            ).first()
-
-        if not existing:
-             existing = db.query(models.AccountMapping).filter(
-                models.AccountMapping.firm_id == current_user.firm_id,
-                models.AccountMapping.client_description == mapping.client_description
-            ).first()
-
-        if existing:
-            existing.standard_account_id = mapping.standard_account_id
-            if mapping.client_account_code:
-                existing.client_account_code = mapping.client_account_code
-        else:
-            new_mapping = models.AccountMapping(
-                firm_id=current_user.firm_id,
-                client_description=mapping.client_description,
-                client_account_code=mapping.client_account_code,
-                standard_account_id=mapping.standard_account_id
-            )
-            db.add(new_mapping)
-        count += 1
-
     try:
+        # One prefetch query, then batched inserts/updates in a single transaction
+        stats = upsert_mappings(db, current_user.firm_id, mappings)
         db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Failed to save mappings: {str(e)}")
 
-    return {"message": f"Successfully processed {count} mappings"}
+    # Transactions pick up the new mappings in the background
+    invalidate_suggestion_indexes(current_user.firm_id)
+    task_resolve_mappings.delay(current_user.firm_id)
+    return {"message": f"Successfully processed {len(mappings)} mappings", "stats": stats.to_dict()}
@@ -2,19 +2,20 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Dict, Any
-import pandas as pd
-import io
 
 from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
+from src.api.services.balance_cache import ensure_balances
+from src.api.services.upload_jobs import spool_upload
+from src.api.tasks import task_ingest_payroll
 
 router = APIRouter(
     prefix="/engagements",
     tags=["payroll"]
 )
 
-@router.post("/{engagement_id}/payroll/upload", status_code=status.HTTP_201_CREATED)
+@router.post("/{engagement_id}/payroll/upload", status_code=status.HTTP_202_ACCEPTED)
 def upload_payroll_summary(
     engagement_id: int,
     file: UploadFile = File(...),
@@ -26,6 +27,8 @@ def upload_payroll_summary(
     Expected columns: code, name, gross_salary, inss, fgts, net_pay
     This data is stored temporarily in AnalysisResult or a dedicated table.
     For MVP, we will process and store the summary in AnalysisResult directly as 'payroll_data'.
+
+    Parsing runs in a background task; poll /engagements/tasks/{task_id} for the result id.
     """
     # Verify Engagement
     engagement = db.query(models.Engagement).join(models.Client).filter(
@@ -39,39 +42,9 @@ def upload_payroll_summary(
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
 
-    try:
-        content = file.file.read()
-        df = pd.read_csv(io.BytesIO(content))
-        df.columns = [c.lower().strip() for c in df.columns]
-
-        required = {'gross_salary', 'inss', 'fgts'}
-        if not required.issubset(set(df.columns)):
-             raise HTTPException(status_code=400, detail=f"CSV must contain: {required}")
-
-        # Calculate totals
-        summary = {
-            "total_gross": float(df['gross_salary'].sum()),
-            "total_inss": float(df['inss'].sum()),
-            "total_fgts": float(df['fgts'].sum()),
-            "employee_count": len(df),
-            "details": df.to_dict(orient='records') # Be careful with size here in production
-        }
-
-        # Save as a raw payroll upload result
-        db_result = models.AnalysisResult(
-            engagement_id=engagement.id,
-            test_type="payroll_upload",
-            result=summary,
-            executed_by_user_id=current_user.id
-        )
-        db.add(db_result)
-        db.commit()
-        db.refresh(db_result)
-
-        return db_result
-
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+    path = spool_upload(file)
+    task = task_ingest_payroll.delay(engagement.id, current_user.id, path)
+    return {"task_id": task.id}
 
 @router.post("/{engagement_id}/payroll/reconcile", response_model=schemas.AnalysisResultRead)
 def reconcile_payroll(
@@ -110,11 +83,13 @@ def reconcile_payroll(
     std_ids = [sa.id for sa in std_accounts]
 
     # Sum transactions mapped to these standard accounts
-    accounting_sum = db.query(func.sum(models.Transaction.amount)).join(
-        models.AccountMapping, models.AccountMapping.client_description == models.Transaction.account_name
-    ).filter(
-        models.Transaction.engagement_id == engagement_id,
-        models.AccountMapping.standard_account_id.in_(std_ids)
+    engagement = db.query(models.Engagement).filter(models.Engagement.id == engagement_id).first()
+    if not engagement:
+        raise HTTPException(status_code=404, detail="Engagement not found")
+    ensure_balances(db, engagement)
+    accounting_sum = db.query(func.sum(models.EngagementBalance.balance)).filter(
+        models.EngagementBalance.engagement_id == engagement_id,
+        models.EngagementBalance.standard_account_id.in_(std_ids)
     ).scalar() or 0.0
 
     # If mapping is weak, fallback to description search (Simulating robust logic)
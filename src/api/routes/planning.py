@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
+from src.api.services.balance_cache import balances_etag, ensure_balances, etag_matches
 
 router = APIRouter(
     prefix="/engagements",
@@ -15,6 +16,8 @@ router = APIRouter(
 @router.get("/{engagement_id}/financial-summary")
 def get_financial_summary(
     engagement_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -27,26 +30,26 @@ def get_financial_summary(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    # 1. Fetch all transactions with their mapped Standard Account
-    # We join Transaction -> AccountMapping (on name matching client_description) -> StandardAccount
-    # Note: This is an exact match on string.
-    # In a real scenario, we might link transaction directly to mapping ID during upload or processing.
-    # For now, we do a join based on the string.
+    # Unchanged since the client's copy (same balances version)
+    ensure_balances(db, engagement)
+    etag = balances_etag(engagement)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # 1. Fetch the engagement's balances per mapped Standard Account
+    # (materialized at upload and whenever mappings change, see services.balance_cache)
 
     results = db.query(
         models.StandardAccount.code,
         models.StandardAccount.name,
         models.StandardAccount.type,
-        func.sum(models.Transaction.amount).label("total_amount")
-    ).join(
-        models.AccountMapping,
-        models.AccountMapping.standard_account_id == models.StandardAccount.id
+        func.sum(models.EngagementBalance.balance).label("total_amount")
     ).join(
-        models.Transaction,
-        models.Transaction.account_name == models.AccountMapping.client_description
+        models.EngagementBalance,
+        models.EngagementBalance.standard_account_id == models.StandardAccount.id
     ).filter(
-        models.Transaction.engagement_id == engagement_id,
-        models.AccountMapping.firm_id == current_user.firm_id
+        models.EngagementBalance.engagement_id == engagement_id
     ).group_by(
         models.StandardAccount.code,
         models.StandardAccount.name,
@@ -135,17 +138,15 @@ def calculate_materiality_suggestion(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
+    ensure_balances(db, engagement)
     results = db.query(
         models.StandardAccount.type,
-        func.sum(models.Transaction.amount).label("total_amount")
-    ).join(
-        models.AccountMapping,
-        models.AccountMapping.standard_account_id == models.StandardAccount.id
+        func.sum(models.EngagementBalance.balance).label("total_amount")
     ).join(
-        models.Transaction,
-        models.Transaction.account_name == models.AccountMapping.client_description
+        models.EngagementBalance,
+        models.EngagementBalance.standard_account_id == models.StandardAccount.id
     ).filter(
-        models.Transaction.engagement_id == engagement_id
+        models.EngagementBalance.engagement_id == engagement_id
     ).group_by(
         models.StandardAccount.type
     ).all()
@@ -200,14 +201,23 @@ def calculate_materiality_suggestion(
 @router.get("/{engagement_id}/risk-matrix")
 def get_risk_matrix(
     engagement_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    engagement = db.query(models.Engagement).join(models.Client).filter(
+        models.Engagement.id == engagement_id,
+        models.Client.firm_id == current_user.firm_id
+    ).first()
+    if not engagement:
+        raise HTTPException(status_code=404, detail="Engagement not found")
+
     # 1. Fetch Materiality
     materiality_record = db.query(models.AnalysisResult).filter(
         models.AnalysisResult.engagement_id == engagement_id,
         models.AnalysisResult.test_type == "materiality"
-    ).order_by(models.AnalysisResult.created_at.desc()).first()
+    ).order_by(models.AnalysisResult.executed_at.desc()).first()
 
     if not materiality_record:
         # Default empty if no materiality
@@ -218,32 +228,36 @@ def get_risk_matrix(
     te = mat_data.get("performance_materiality", 0)
     ctt = (pm * 0.05) # fallback if not saved
 
-    # 2. Fetch Aggregated Data
+    # 2. Fetch Saved Scoping (if any) to preserve overrides
+    saved_scoping = db.query(models.AnalysisResult).filter(
+        models.AnalysisResult.engagement_id == engagement_id,
+        models.AnalysisResult.test_type == "risk_matrix"
+    ).order_by(models.AnalysisResult.executed_at.desc()).first()
+
+    # Unchanged while the balances, materiality and saved scoping are the same
+    ensure_balances(db, engagement)
+    etag = balances_etag(engagement, materiality_record.id, saved_scoping.id if saved_scoping else 0)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # 3. Fetch Aggregated Data (materialized balances, see services.balance_cache)
     results = db.query(
         models.StandardAccount.code,
         models.StandardAccount.name,
         models.StandardAccount.type,
-        func.sum(models.Transaction.amount).label("total_amount")
+        func.sum(models.EngagementBalance.balance).label("total_amount")
     ).join(
-        models.AccountMapping,
-        models.AccountMapping.standard_account_id == models.StandardAccount.id
-    ).join(
-        models.Transaction,
-        models.Transaction.account_name == models.AccountMapping.client_description
+        models.EngagementBalance,
+        models.EngagementBalance.standard_account_id == models.StandardAccount.id
     ).filter(
-        models.Transaction.engagement_id == engagement_id
+        models.EngagementBalance.engagement_id == engagement_id
     ).group_by(
         models.StandardAccount.code,
         models.StandardAccount.name,
         models.StandardAccount.type
     ).all()
 
-    # 3. Fetch Saved Scoping (if any) to preserve overrides
-    saved_scoping = db.query(models.AnalysisResult).filter(
-        models.AnalysisResult.engagement_id == engagement_id,
-        models.AnalysisResult.test_type == "risk_matrix"
-    ).order_by(models.AnalysisResult.created_at.desc()).first()
-
     saved_map = {}
     if saved_scoping and saved_scoping.result:
         for item in saved_scoping.result.get("scoping", []):
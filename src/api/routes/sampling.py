@@ -1,24 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
-import random
 
 from src.api.database import get_db
 from src.api import models, schemas
 from src.api.deps import get_current_user
+from src.api.services.ledger_snapshot import LedgerColumns, ledger_columns
+from src.api.services.sampling import (
+    monetary_unit_sample, random_sample, resolve_seed, sampling_rng, stratified_sample, systematic_sample
+)
 
 router = APIRouter(
     prefix="/engagements",
     tags=["sampling"]
 )
 
-@router.post("/{engagement_id}/sampling/random", response_model=schemas.AnalysisResultRead)
-def run_random_sampling(
-    engagement_id: int,
-    params: Dict[str, Any], # { sample_size: 20, seed: 42 }
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
-):
+def _engagement_ledger(engagement_id: int, db: Session, current_user: models.User):
     engagement = db.query(models.Engagement).join(models.Client).filter(
         models.Engagement.id == engagement_id,
         models.Client.firm_id == current_user.firm_id
@@ -27,33 +24,13 @@ def run_random_sampling(
     if not engagement:
         raise HTTPException(status_code=404, detail="Engagement not found")
 
-    transactions = engagement.transactions
-    if not transactions:
+    # Memory-mapped ledger columns; only the selected rows are materialized
+    ledger = ledger_columns(db, engagement.id)
+    if not len(ledger):
         raise HTTPException(status_code=400, detail="No transactions to sample")
+    return engagement, ledger
 
-    sample_size = int(params.get('sample_size', 10))
-    if sample_size > len(transactions):
-        sample_size = len(transactions)
-
-    # Random selection
-    # Using python's random for MVP. In production, use numpy/pandas for large datasets.
-    selected_txs = random.sample(transactions, sample_size)
-
-    result_data = {
-        "method": "random",
-        "population_size": len(transactions),
-        "sample_size": sample_size,
-        "items": [
-            {
-                "id": t.id,
-                "vendor": t.vendor,
-                "amount": t.amount,
-                "date": str(t.date) if t.date else None,
-                "account": t.account_name
-            } for t in selected_txs
-        ]
-    }
-
+def _save_sample(engagement: models.Engagement, result_data: dict, db: Session, current_user: models.User):
     db_result = models.AnalysisResult(
         engagement_id=engagement.id,
         test_type="sampling",
@@ -66,65 +43,138 @@ def run_random_sampling(
 
     return db_result
 
-@router.post("/{engagement_id}/sampling/stratified", response_model=schemas.AnalysisResultRead)
-def run_stratified_sampling(
+def _items(ledger: LedgerColumns, selected) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": row["id"],
+            "vendor": row["vendor"],
+            "amount": row["amount"],
+            "date": row["date"],
+            "account": row["account_name"]
+        } for row in ledger.rows(selected)
+    ]
+
+@router.post("/{engagement_id}/sampling/random", response_model=schemas.AnalysisResultRead)
+def run_random_sampling(
     engagement_id: int,
-    params: Dict[str, Any], # { threshold: 1000, sample_size_below: 10 }
+    params: Dict[str, Any], # { sample_size: 20, seed: 42 }
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    engagement = db.query(models.Engagement).join(models.Client).filter(
-        models.Engagement.id == engagement_id,
-        models.Client.firm_id == current_user.firm_id
-    ).first()
+    engagement, ledger = _engagement_ledger(engagement_id, db, current_user)
+    seed = resolve_seed(params.get('seed'))
+    try:
+        selected = random_sample(len(ledger), int(params.get('sample_size', 10)), sampling_rng(seed))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if not engagement:
-        raise HTTPException(status_code=404, detail="Engagement not found")
+    result_data = {
+        "method": "random",
+        "seed": seed,
+        "population_size": len(ledger),
+        "sample_size": len(selected),
+        "items": _items(ledger, selected)
+    }
+    return _save_sample(engagement, result_data, db, current_user)
 
-    transactions = engagement.transactions
-    if not transactions:
-        raise HTTPException(status_code=400, detail="No transactions to sample")
+@router.post("/{engagement_id}/sampling/systematic", response_model=schemas.AnalysisResultRead)
+def run_systematic_sampling(
+    engagement_id: int,
+    params: Dict[str, Any], # { sample_size: 20, seed: 42 }
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    engagement, ledger = _engagement_ledger(engagement_id, db, current_user)
+    seed = resolve_seed(params.get('seed'))
+    try:
+        selected = systematic_sample(len(ledger), int(params.get('sample_size', 10)), sampling_rng(seed))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    threshold = float(params.get('threshold', 0))
-    sample_size_below = int(params.get('sample_size_below', 10))
+    result_data = {
+        "method": "systematic",
+        "seed": seed,
+        "population_size": len(ledger),
+        "sample_size": len(selected),
+        "interval": len(ledger) / len(selected),
+        "items": _items(ledger, selected)
+    }
+    return _save_sample(engagement, result_data, db, current_user)
 
-    # Stratification logic: Select ALL above threshold, Random below
-    high_value = [t for t in transactions if (t.amount or 0) >= threshold]
-    low_value = [t for t in transactions if (t.amount or 0) < threshold]
+@router.post("/{engagement_id}/sampling/mus", response_model=schemas.AnalysisResultRead)
+def run_monetary_unit_sampling(
+    engagement_id: int,
+    params: Dict[str, Any], # { sample_size: 60, selection: "systematic" | "cell" | "random", seed: 42 }
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    engagement, ledger = _engagement_ledger(engagement_id, db, current_user)
+    seed = resolve_seed(params.get('seed'))
+    selection = params.get('selection', 'systematic')
+    try:
+        sample = monetary_unit_sample(ledger.amount, int(params.get('sample_size', 10)), sampling_rng(seed), selection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    items = _items(ledger, sample.indexes)
+    for item, hits in zip(items, sample.hits.tolist()):
+        item["hits"] = hits
 
-    if sample_size_below > len(low_value):
-        sample_size_below = len(low_value)
+    result_data = {
+        "method": "mus",
+        "selection": selection,
+        "seed": seed,
+        "population_size": len(ledger),
+        "population_value": sample.population_value,
+        "interval": sample.interval,
+        "sample_size": len(items),
+        "items": items
+    }
+    return _save_sample(engagement, result_data, db, current_user)
 
-    selected_low = random.sample(low_value, sample_size_below)
+@router.post("/{engagement_id}/sampling/stratified", response_model=schemas.AnalysisResultRead)
+def run_stratified_sampling(
+    engagement_id: int,
+    params: Dict[str, Any], # { threshold: 1000, sample_size_below: 10, boundaries: [100, 500], allocation: "optimal", seed: 42 }
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    engagement, ledger = _engagement_ledger(engagement_id, db, current_user)
+    seed = resolve_seed(params.get('seed'))
+    threshold = float(params.get('threshold', 0))
+    sample_size_below = int(params.get('sample_size_below', 10))
 
-    final_sample = high_value + selected_low
+    # Select ALL at or above threshold, allocate the rest over the strata below (NULL amounts count as 0)
+    try:
+        sample = stratified_sample(
+            ledger.amount, sample_size_below, sampling_rng(seed),
+            boundaries=[float(b) for b in params.get('boundaries', [])],
+            allocation=params.get('allocation', 'optimal'),
+            certainty_threshold=threshold
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    items = _items(ledger, sample.indexes)
+    for item, stratum in zip(items, sample.strata.tolist()):
+        del item["account"]
+        item["reason"] = "High Value" if stratum < 0 else "Random Selection"
+        item["stratum"] = stratum
 
     result_data = {
         "method": "stratified",
-        "population_size": len(transactions),
+        "seed": seed,
+        "population_size": len(ledger),
         "threshold": threshold,
-        "high_value_count": len(high_value),
-        "low_value_sample_count": len(selected_low),
-        "total_sample_size": len(final_sample),
-        "items": [
-            {
-                "id": t.id,
-                "vendor": t.vendor,
-                "amount": t.amount,
-                "date": str(t.date) if t.date else None,
-                "reason": "High Value" if (t.amount or 0) >= threshold else "Random Selection"
-            } for t in final_sample
-        ]
+        "boundaries": sample.boundaries.tolist(),
+        "allocation": params.get('allocation', 'optimal'),
+        "strata": [
+            {"stratum": h, "population": population, "sample": size}
+            for h, (population, size) in enumerate(zip(sample.population_counts.tolist(), sample.sample_counts.tolist()))
+        ],
+        "high_value_count": sample.certainty_count,
+        "low_value_sample_count": len(items) - sample.certainty_count,
+        "total_sample_size": len(items),
+        "items": items
     }
-
-    db_result = models.AnalysisResult(
-        engagement_id=engagement.id,
-        test_type="sampling",
-        result=result_data,
-        executed_by_user_id=current_user.id
-    )
-    db.add(db_result)
-    db.commit()
-    db.refresh(db_result)
-
-    return db_result
+    return _save_sample(engagement, result_data, db, current_user)
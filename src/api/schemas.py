@@ -41,6 +41,17 @@ class TransactionRead(TransactionBase):
     class Config:
         from_attributes = True
 
+class TransactionPage(BaseModel):
+    items: List[TransactionRead]
+    # Pass as ?cursor= to get the next page; None on the last one
+    next_cursor: Optional[str] = None
+    # First page only; an estimate (lower bound or planner estimate) when total_is_estimate
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+    class Config:
+        from_attributes = True
+
 # Need to update EngagementRead to recognize TransactionRead which is defined after it in this file order?
 # Pydantic handles forward refs with strings or Rebuild.
 # But for simplicity, I reordered them. Wait, TransactionRead is used in EngagementRead.
@@ -126,6 +137,7 @@ class StandardAccountCreate(StandardAccountBase):
 
 class StandardAccountRead(StandardAccountBase):
     id: int
+    path: Optional[str] = None
     class Config:
         from_attributes = True
 
@@ -0,0 +1,95 @@
+from typing import Any, Optional
+
+from sqlalchemy import extract, func
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.api.services.mapping_resolution import load_mapping_lookup, resolve_engagement_mappings
+
+
+def _lock_engagement(db: Session, engagement_id: int) -> None:
+    """
+    Locks the engagement row until the caller commits, so concurrent refreshes
+    (mapping re-resolution, ingest, first GETs) replace the balances one after
+    the other instead of both inserting their rows.
+    """
+    db.query(models.Engagement.id).filter(models.Engagement.id == engagement_id).with_for_update().one_or_none()
+
+
+def refresh_balances(db: Session, engagement_id: int) -> int:
+    """
+    Recomputes the engagement's materialized balances: one row per resolved
+    standard account and month, aggregated in the database. Bumps and returns
+    ``Engagement.balances_version``; the caller commits (which releases the
+    engagement row lock taken here).
+
+    Called after transactions are loaded and after their mappings are re-resolved,
+    which are the only writes that change the balances.
+    """
+    _lock_engagement(db, engagement_id)
+    year = extract('year', models.Transaction.date)
+    month = extract('month', models.Transaction.date)
+    aggregates = db.query(
+        models.Transaction.standard_account_id, year, month,
+        func.sum(models.Transaction.amount), func.count(models.Transaction.id)
+    ).filter(
+        models.Transaction.engagement_id == engagement_id,
+        models.Transaction.standard_account_id.isnot(None)
+    ).group_by(models.Transaction.standard_account_id, year, month).all()
+
+    engagement = db.query(models.Engagement).filter(models.Engagement.id == engagement_id).populate_existing().one()
+    version = (engagement.balances_version or 0) + 1
+
+    db.query(models.EngagementBalance).filter(
+        models.EngagementBalance.engagement_id == engagement_id
+    ).delete(synchronize_session=False)
+    rows = [
+        {
+            "engagement_id": engagement_id,
+            "standard_account_id": standard_account_id,
+            "period": f"{int(y):04d}-{int(m):02d}" if y is not None else None,
+            "balance": float(balance or 0.0),
+            "transaction_count": count,
+            "version": version,
+        }
+        for standard_account_id, y, m, balance, count in aggregates
+    ]
+    if rows:
+        db.execute(models.EngagementBalance.__table__.insert(), rows)
+
+    engagement.balances_version = version
+    db.flush()
+    return version
+
+
+def ensure_balances(db: Session, engagement: models.Engagement) -> int:
+    """
+    Returns the engagement's balances version, computing the balances first when
+    they never were (engagements loaded before the cache existed). Those
+    transactions were stored before mappings were resolved on load, so they are
+    resolved here first. Commits in that case.
+    """
+    if engagement.balances_version is None:
+        # Another request may have computed them while this one waited for the lock
+        _lock_engagement(db, engagement.id)
+        db.refresh(engagement)
+        if engagement.balances_version is None:
+            if engagement.client is not None:
+                resolve_engagement_mappings(db, engagement.id, load_mapping_lookup(db, engagement.client.firm_id))
+            refresh_balances(db, engagement.id)
+        db.commit()
+    return engagement.balances_version
+
+
+def balances_etag(engagement: models.Engagement, *parts: Any) -> str:
+    """Weak ETag of a response derived from the engagement's balances (plus any other inputs)."""
+    stamp = "-".join(str(p) for p in (engagement.id, engagement.balances_version) + parts)
+    return f'W/"balances-{stamp}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value covers ``etag``."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,137 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.api.services.ledger_snapshot import ledger_columns
+from src.scripts.benford_analysis import benford_counts, merge_benford_counts
+
+
+def _counts_by_account(amounts: Sequence[float], account_codes: Sequence[Optional[str]]) -> Dict[Optional[str], tuple]:
+    """Returns {account_code: (digit counts, row count)} for a batch of amounts."""
+    df = pd.DataFrame({"amount": amounts, "account_code": account_codes})
+    df = df[df["amount"].notna()]
+
+    by_account = {}
+    for code, group in df.groupby("account_code", dropna=False, sort=False):
+        code = None if pd.isna(code) else str(code)
+        by_account[code] = (benford_counts(group["amount"].to_numpy(dtype=float)), len(group))
+    return by_account
+
+
+def _counts_by_account_code(amounts: np.ndarray, codes: np.ndarray, values: List[str]) -> Dict[Optional[str], tuple]:
+    """Same as ``_counts_by_account`` for dictionary-encoded account codes (-1 = NULL)."""
+    valid = ~np.isnan(amounts)
+    amounts, codes = amounts[valid], codes[valid]
+
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    by_account = {}
+    for start, group in zip(np.concatenate(([0], boundaries)), np.split(amounts[order], boundaries)):
+        code = int(codes[start])
+        by_account[values[code] if code >= 0 else None] = (benford_counts(group), len(group))
+    return by_account
+
+
+def _lock_sketches(db: Session, engagement_id: int) -> None:
+    """
+    Locks the engagement row until the caller commits, so concurrent uploads to
+    one engagement merge into its sketches one after the other (no lost
+    increment, no second sketch for the same account).
+    """
+    db.query(models.Engagement.id).filter(models.Engagement.id == engagement_id).with_for_update().one_or_none()
+
+
+def _merge_into_sketches(db: Session, engagement_id: int, by_account: Dict[Optional[str], tuple]) -> None:
+    _lock_sketches(db, engagement_id)
+    existing = {
+        s.account_code: s
+        for s in db.query(models.BenfordSketch).filter(models.BenfordSketch.engagement_id == engagement_id)
+    }
+
+    for code, (counts, row_count) in by_account.items():
+        sketch = existing.get(code)
+        if sketch is None:
+            db.add(models.BenfordSketch(
+                engagement_id=engagement_id,
+                account_code=code,
+                counts=counts,
+                row_count=row_count
+            ))
+        else:
+            # Reassign (not mutate) so SQLAlchemy detects the JSON change
+            sketch.counts = merge_benford_counts(sketch.counts, counts)
+            sketch.row_count = (sketch.row_count or 0) + row_count
+            sketch.updated_at = datetime.utcnow()
+
+
+def update_benford_sketches(
+    db: Session,
+    engagement_id: int,
+    amounts: Sequence[float],
+    account_codes: Sequence[Optional[str]]
+) -> None:
+    """
+    Adds newly inserted transactions to the engagement's per-account Benford sketches.
+
+    Only the new amounts are scanned. The caller is responsible for committing,
+    so the sketches are persisted in the same transaction as the rows they count.
+    """
+    if len(amounts) == 0:
+        return
+
+    _merge_into_sketches(db, engagement_id, _counts_by_account(amounts, account_codes))
+
+
+def rebuild_benford_sketches(db: Session, engagement_id: int) -> None:
+    """
+    Recomputes the engagement's sketches from its transactions.
+
+    Sketches cannot subtract values, so this is required after transactions are deleted.
+    """
+    _lock_sketches(db, engagement_id)
+    db.query(models.BenfordSketch).filter(models.BenfordSketch.engagement_id == engagement_id).delete()
+
+    # Counted straight from the memory-mapped snapshot columns
+    columns = ledger_columns(db, engagement_id)
+    if len(columns):
+        _merge_into_sketches(db, engagement_id, _counts_by_account_code(
+            np.asarray(columns.amount), np.asarray(columns.account_code), columns.account_codes
+        ))
+    db.flush()
+
+
+def get_benford_counts(
+    db: Session,
+    engagement_ids: List[int],
+    account_codes: Optional[List[str]] = None
+) -> Dict[str, List[int]]:
+    """
+    Returns merged digit counts for one or more engagements, optionally
+    restricted to some accounts. Engagements with transactions but no sketch
+    (loaded before sketches existed) are rebuilt on first access.
+    """
+    query = db.query(models.BenfordSketch).filter(models.BenfordSketch.engagement_id.in_(engagement_ids))
+    sketches = query.all()
+
+    sketched = {s.engagement_id for s in sketches}
+    missing = [
+        engagement_id for engagement_id in engagement_ids
+        if engagement_id not in sketched and db.query(models.Transaction.id).filter(
+            models.Transaction.engagement_id == engagement_id
+        ).first()
+    ]
+    if missing:
+        for engagement_id in missing:
+            rebuild_benford_sketches(db, engagement_id)
+        db.commit()
+        sketches = query.all()
+
+    if account_codes is not None:
+        sketches = [s for s in sketches if s.account_code in account_codes]
+
+    return merge_benford_counts(*(s.counts for s in sketches))
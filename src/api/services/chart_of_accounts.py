@@ -0,0 +1,200 @@
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from src.api import models
+
+# In-process cache: template_type -> AccountTree
+_trees: Dict[str, "AccountTree"] = {}
+_trees_lock = threading.Lock()
+
+
+def engagement_template(engagement: models.Engagement) -> str:
+    """Template type of the chart used by the engagement ('br_gaap' or 'custom_<client_id>')."""
+    if engagement.chart_mode == "client_custom":
+        return f"custom_{engagement.client_id}"
+    return "br_gaap"
+
+
+def infer_parent_code(code: str) -> Optional[str]:
+    """
+    Parent code by convention: dotted codes drop their last segment (1.1.01 -> 1.1),
+    condominium codes round down to the hundred (201 -> 200).
+    """
+    if "." in code:
+        return code.rsplit(".", 1)[0]
+    if code.isdigit() and len(code) > 1:
+        parent = (int(code) // 100) * 100
+        if parent != int(code):
+            return str(parent)
+    return None
+
+
+def _paths_from_parents(ids: Sequence[int], parent_ids: Sequence[Optional[int]]) -> Dict[int, str]:
+    """Materialized paths ("/root/.../id/"); parents outside ``ids`` and cycles start a new root."""
+    parents = dict(zip(ids, parent_ids))
+    paths: Dict[int, str] = {}
+
+    for account_id in ids:
+        chain = []
+        current = account_id
+        while current is not None and current in parents and current not in paths and current not in chain:
+            chain.append(current)
+            current = parents[current]
+        prefix = paths.get(current, "/")
+        for node in reversed(chain):
+            prefix = f"{prefix}{node}/"
+            paths[node] = prefix
+    return paths
+
+
+def rebuild_account_paths(db: Session, template_type: str) -> int:
+    """
+    Recomputes ``path`` and ``level`` of every account of the template from
+    ``parent_id`` and drops its cached tree. Returns the number of rows changed;
+    the caller commits.
+    """
+    accounts = db.query(
+        models.StandardAccount.id, models.StandardAccount.parent_id,
+        models.StandardAccount.path, models.StandardAccount.level
+    ).filter(models.StandardAccount.template_type == template_type).all()
+
+    paths = _paths_from_parents([a.id for a in accounts], [a.parent_id for a in accounts])
+    changes = []
+    for account in accounts:
+        path = paths[account.id]
+        level = path.count("/") - 1
+        if account.path != path or account.level != level:
+            changes.append({"id": account.id, "path": path, "level": level})
+
+    if changes:
+        db.execute(update(models.StandardAccount), changes)
+    invalidate_account_trees(template_type)
+    return len(changes)
+
+
+def link_parents_by_code(db: Session, template_type: str) -> int:
+    """Sets ``parent_id`` of accounts without one from their code (``infer_parent_code``)."""
+    accounts = db.query(models.StandardAccount).filter(models.StandardAccount.template_type == template_type).all()
+    by_code = {a.code: a.id for a in accounts}
+    linked = 0
+    for account in accounts:
+        if account.parent_id is None and account.code:
+            parent_id = by_code.get(infer_parent_code(account.code))
+            if parent_id and parent_id != account.id:
+                account.parent_id = parent_id
+                linked += 1
+    db.flush()
+    return linked
+
+
+def invalidate_account_trees(template_type: Optional[str] = None) -> None:
+    """Drops the cached tree of one template (or all of them)."""
+    with _trees_lock:
+        if template_type is None:
+            _trees.clear()
+        else:
+            _trees.pop(template_type, None)
+
+
+class AccountTree:
+    """
+    Immutable hierarchy of one chart of accounts.
+
+    The tree keeps a closure of (account, ancestor) index pairs built from the
+    materialized paths, so rolling balances up to every ancestor is one weighted
+    bincount over the pairs instead of a walk per account.
+    """
+
+    def __init__(self, template_type: str, ids: Sequence[int], codes: Sequence[str],
+                 names: Sequence[str], paths: Sequence[str], signature: tuple = ()):
+        self.template_type = template_type
+        self.signature = signature
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.codes = list(codes)
+        self.names = list(names)
+        self.paths = list(paths)
+        self.position = {account_id: i for i, account_id in enumerate(ids)}
+
+        descendants, ancestors = [], []
+        for i, path in enumerate(self.paths):
+            for ancestor in path.strip("/").split("/"):
+                descendants.append(i)
+                ancestors.append(self.position[int(ancestor)])
+        self._descendant = np.asarray(descendants, dtype=np.int64)
+        self._ancestor = np.asarray(ancestors, dtype=np.int64)
+        self.levels = np.bincount(self._descendant, minlength=len(self.ids))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, account_ids: Sequence[int]) -> np.ndarray:
+        """Tree positions of ``account_ids`` (-1 for ids not in the tree)."""
+        account_ids = np.asarray(account_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(len(account_ids), -1, dtype=np.int64)
+        order = np.argsort(self.ids)
+        found = np.searchsorted(self.ids, account_ids, sorter=order)
+        found = order[np.minimum(found, len(order) - 1)]
+        return np.where(self.ids[found] == account_ids, found, -1)
+
+    def rollup(self, account_ids: Sequence[int], amounts: Sequence[float]) -> pd.Series:
+        """
+        Totals of ``amounts`` (booked to ``account_ids``) for every account of the
+        tree, each including all of its descendants. Indexed by account id.
+        """
+        positions = self.positions(account_ids)
+        amounts = np.nan_to_num(np.asarray(amounts, dtype=np.float64))
+        known = positions >= 0
+        own = np.bincount(positions[known], weights=amounts[known], minlength=len(self.ids))
+        totals = np.bincount(self._ancestor, weights=own[self._descendant], minlength=len(self.ids))
+        return pd.Series(totals, index=self.ids)
+
+    def descendants(self, account_id: int) -> List[int]:
+        """Ids of the account and everything below it."""
+        i = self.position[account_id]
+        return self.ids[self._descendant[self._ancestor == i]].tolist()
+
+    def ancestors(self, account_id: int) -> List[int]:
+        """Ids from the root down to the account."""
+        return [int(a) for a in self.paths[self.position[account_id]].strip("/").split("/")]
+
+
+def _tree_signature(db: Session, template_type: str) -> tuple:
+    return tuple(db.query(func.count(models.StandardAccount.id), func.max(models.StandardAccount.id)).filter(
+        models.StandardAccount.template_type == template_type
+    ).one())
+
+
+def account_tree(db: Session, template_type: str) -> AccountTree:
+    """
+    Returns the cached tree of the template, building it when missing or when
+    accounts were added or removed since (row count or highest id differ).
+    When a stored path is missing or stale the tree is placed from ``parent_id``.
+    """
+    signature = _tree_signature(db, template_type)
+    with _trees_lock:
+        tree = _trees.get(template_type)
+    if tree is not None and tree.signature == signature:
+        return tree
+
+    accounts = db.query(
+        models.StandardAccount.id, models.StandardAccount.code, models.StandardAccount.name,
+        models.StandardAccount.parent_id, models.StandardAccount.path
+    ).filter(models.StandardAccount.template_type == template_type).order_by(models.StandardAccount.code).all()
+
+    paths = [a.path for a in accounts]
+    known = {str(a.id) for a in accounts}
+    if any(path is None or not set(path.strip("/").split("/")) <= known for path in paths):
+        computed = _paths_from_parents([a.id for a in accounts], [a.parent_id for a in accounts])
+        paths = [computed[a.id] for a in accounts]
+
+    tree = AccountTree(template_type, [a.id for a in accounts], [a.code for a in accounts],
+                       [a.name for a in accounts], paths, signature)
+    with _trees_lock:
+        _trees[template_type] = tree
+    return tree
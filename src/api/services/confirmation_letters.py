@@ -0,0 +1,171 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from PIL import Image as PILImage
+
+from src.scripts.pdf_generator import generate_confirmation_letter
+
+logger = logging.getLogger(__name__)
+
+# Processes rendering letters, shared by every request of the API process; the
+# pool is only used for batches of at least PARALLEL_MIN_LETTERS (below that,
+# sending the letters to it costs more than it saves).
+CONFIRMATION_WORKERS = int(os.getenv("CONFIRMATION_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_MIN_LETTERS = 16
+
+# The letter prints the logo in a 2 x 1 inch box; 300 dpi is enough for print
+LOGO_MAX_PIXELS = (600, 300)
+
+
+class LetterJob(NamedTuple):
+    filename: str
+    type: str
+    client_name: str
+    recipient_name: str
+    date_base: str
+
+
+def prepare_logo(logo_bytes: Optional[bytes]) -> Optional[bytes]:
+    """
+    Decodes the client logo once per batch and shrinks it to the printed size,
+    so each letter embeds a small PNG instead of decoding the original upload.
+    Unreadable logos are dropped, as the letter generator would.
+    """
+    if not logo_bytes:
+        return None
+    try:
+        with PILImage.open(io.BytesIO(logo_bytes)) as image:
+            image.thumbnail(LOGO_MAX_PIXELS)
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA")
+            output = io.BytesIO()
+            image.save(output, format="PNG", optimize=True)
+            return output.getvalue()
+    except Exception as e:
+        logger.warning(f"Client logo could not be read ({e}); letters are rendered without it")
+        return None
+
+
+def _render(job: LetterJob, logo: Optional[bytes]) -> Tuple[str, bytes]:
+    pdf = generate_confirmation_letter(
+        type=job.type,
+        client_data={'name': job.client_name},
+        recipient_data={'name': job.recipient_name},
+        date_base=job.date_base,
+        logo_bytes=logo
+    )
+    return job.filename, pdf.getvalue()
+
+
+# Started on first use. Processes come from a fork server, not from forking the
+# API process, whose other threads may hold locks the children would inherit.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _letter_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=CONFIRMATION_WORKERS,
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drops a pool that could not start or broke; the next batch starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_parallel(jobs: List[LetterJob], logo: Optional[bytes], workers: int,
+                     done: Set[int]) -> Iterator[Tuple[str, bytes]]:
+    # At most 2 letters per worker in flight, so finished PDFs never pile up in memory.
+    # The logo is a small thumbnail (prepare_logo): it is sent along with each letter.
+    pool = _letter_pool()
+    pending: Dict[Future, int] = {}
+    try:
+        for index, job in enumerate(jobs):
+            while len(pending) >= workers * 2:
+                yield from _collect(pending, done)
+            pending[pool.submit(_render, job, logo)] = index
+        while pending:
+            yield from _collect(pending, done)
+    except (AssertionError, OSError, BrokenProcessPool):
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _collect(pending: Dict[Future, int], done: Set[int]) -> Iterator[Tuple[str, bytes]]:
+    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in finished:
+        result = future.result()
+        done.add(pending.pop(future))
+        yield result
+
+
+def render_letters(jobs: List[LetterJob], logo_bytes: Optional[bytes] = None,
+                   workers: Optional[int] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yields (filename, PDF bytes) of every letter as soon as it is rendered
+    (not in ``jobs`` order when a process pool is used). Falls back to serial
+    rendering of the remaining letters when a pool cannot be started
+    (e.g. inside a daemonic Celery worker).
+    """
+    logo = prepare_logo(logo_bytes)
+    workers = CONFIRMATION_WORKERS if workers is None else workers
+    done: Set[int] = set()
+
+    if workers > 1 and len(jobs) >= PARALLEL_MIN_LETTERS:
+        try:
+            yield from _render_parallel(jobs, logo, min(workers, CONFIRMATION_WORKERS, len(jobs)), done)
+            return
+        except (AssertionError, OSError, BrokenProcessPool) as e:
+            logger.warning(f"Parallel letter rendering unavailable ({e}); falling back to serial")
+
+    for index, job in enumerate(jobs):
+        if index not in done:
+            yield _render(job, logo)
+
+
+class _ZipSink:
+    """Write-only, unseekable target: zipfile then writes data descriptors and never seeks back."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """ZIP archive of (name, content) entries, yielded entry by entry; only one entry is held at a time."""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+            yield sink.drain()
+    yield sink.drain()
@@ -1,9 +1,184 @@
 from docx import Document
+from docx.oxml.ns import qn
+from collections import OrderedDict
 from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from xml.sax.saxutils import escape
+import bisect
 import io
 import os
+import re
+import threading
+import zipfile
+
+# Compiled templates kept in memory (least recently used are dropped first)
+TEMPLATE_CACHE_SIZE = 32
+
+PLACEHOLDER = re.compile(r"\{\{([^{}]+)\}\}")  # {{key}}
+
+# Private-use characters marking placeholder slots in the serialized XML; a
+# template's own text never contains them.
+_SLOT_OPEN, _SLOT_CLOSE = "\ue000", "\ue001"
+_SLOT = re.compile(f"{_SLOT_OPEN}(\\d+){_SLOT_CLOSE}".encode("utf-8"))
+
+# Parts whose text is templated: the body, headers and footers
+_TEMPLATED_PARTS = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# Line breaks and tabs in values become Word breaks/tabs instead of collapsing to spaces
+_TEXT_CONTROLS = {
+    "\n": '</w:t><w:br/><w:t xml:space="preserve">',
+    "\t": '</w:t><w:tab/><w:t xml:space="preserve">',
+}
+
+
+class CompiledPart(NamedTuple):
+    segments: List[bytes]  # Literal XML; a placeholder goes between each pair
+    keys: List[str]        # keys[i] fills the slot after segments[i]
+
+
+class CompiledTemplate(NamedTuple):
+    archive: bytes                          # Every other member, compressed once at compile time
+    parts: List[Tuple[str, CompiledPart]]  # Templated members, appended to the archive on render
+    keys: frozenset
+
+
+def _slot_runs(paragraph_texts: List, keys: List[str]) -> None:
+    """
+    Moves every {{key}} of one paragraph into a single slot marker in the run
+    where it starts, so placeholders split across runs by Word's editing are
+    found. That run's formatting applies to the value; the text of the other
+    runs is kept with their own formatting.
+    """
+    texts = [t.text or "" for t in paragraph_texts]
+    full = "".join(texts)
+    matches = list(PLACEHOLDER.finditer(full))
+    if not matches:
+        return
+
+    offsets = []
+    position = 0
+    for text in texts:
+        offsets.append(position)
+        position += len(text)
+    pieces: List[List[str]] = [[] for _ in texts]
+
+    def keep(start: int, end: int) -> None:
+        for i, offset in enumerate(offsets):
+            lo, hi = max(start, offset), min(end, offset + len(texts[i]))
+            if lo < hi:
+                pieces[i].append(full[lo:hi])
+
+    position = 0
+    for match in matches:
+        keep(position, match.start())
+        run = bisect.bisect_right(offsets, match.start()) - 1
+        pieces[run].append(f"{_SLOT_OPEN}{len(keys)}{_SLOT_CLOSE}")
+        paragraph_texts[run].set(_XML_SPACE, "preserve")
+        keys.append(match.group(1))
+        position = match.end()
+    keep(position, len(full))
+
+    for node, text in zip(paragraph_texts, pieces):
+        node.text = "".join(text)
+
+
+def compile_template(template_path: str) -> CompiledTemplate:
+    """
+    Parses a DOCX template once: placeholders are located per paragraph (also in
+    tables, headers and footers) and the templated XML parts are split around
+    them, so rendering is a single join with no XML parsing. The other members
+    (styles, media, ...) are compressed here, not on every render.
+    """
+    doc = Document(template_path)
+    keys_by_part: Dict[str, List[str]] = {}
+    for part in doc.part.package.iter_parts():
+        partname = part.partname.lstrip("/")
+        if not _TEMPLATED_PARTS.match(partname):
+            continue
+        keys: List[str] = []
+        paragraphs: Dict[object, List] = OrderedDict()
+        for text in part.element.iter(qn("w:t")):
+            paragraph = next(text.iterancestors(qn("w:p")), None)
+            if paragraph is not None:
+                paragraphs.setdefault(paragraph, []).append(text)
+        for paragraph_texts in paragraphs.values():
+            _slot_runs(paragraph_texts, keys)
+        keys_by_part[partname] = keys
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    static = io.BytesIO()
+    parts: List[Tuple[str, CompiledPart]] = []
+    with zipfile.ZipFile(buffer) as source, zipfile.ZipFile(static, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name in source.namelist():
+            data = source.read(name)
+            keys = keys_by_part.get(name)
+            if keys:
+                chunks = _SLOT.split(data)
+                parts.append((name, CompiledPart(chunks[0::2], [keys[int(i)] for i in chunks[1::2]])))
+            else:
+                archive.writestr(name, data)
+    return CompiledTemplate(static.getvalue(), parts,
+                            frozenset(k for keys in keys_by_part.values() for k in keys))
+
+
+def _xml_value(value) -> bytes:
+    text = escape(str(value))
+    for char, markup in _TEXT_CONTROLS.items():
+        text = text.replace(char, markup)
+    return text.encode("utf-8")
+
+
+def render_template(template: CompiledTemplate, context: dict) -> io.BytesIO:
+    """
+    Fills a compiled template in one pass and appends the filled parts to a copy
+    of the precompressed archive. Placeholders missing from ``context`` are left as they are.
+    """
+    values = {key: _xml_value(context[key]) if key in context else escape(f"{{{{{key}}}}}").encode("utf-8")
+              for key in template.keys}
+    file_stream = io.BytesIO(template.archive)
+    with zipfile.ZipFile(file_stream, "a", zipfile.ZIP_DEFLATED) as archive:
+        for name, part in template.parts:
+            out = [part.segments[0]]
+            for key, segment in zip(part.keys, part.segments[1:]):
+                out.append(values[key])
+                out.append(segment)
+            archive.writestr(name, b"".join(out))
+    file_stream.seek(0)
+    return file_stream
+
 
 class DocumentService:
+    def __init__(self, cache_size: int = TEMPLATE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._templates: "OrderedDict[Tuple[str, int], CompiledTemplate]" = OrderedDict()
+        self._templates_lock = threading.Lock()
+
+    def get_template(self, template_path: str) -> CompiledTemplate:
+        """
+        Returns the compiled template, compiling it on first use. Entries are
+        keyed by path and modification time, so an edited template is recompiled.
+        """
+        if not os.path.exists(template_path):
+            raise FileNotFoundError(f"Template not found: {template_path}")
+        key = (os.path.abspath(template_path), os.stat(template_path).st_mtime_ns)
+        with self._templates_lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+
+        template = compile_template(template_path)
+        with self._templates_lock:
+            for stale in [k for k in self._templates if k[0] == key[0]]:
+                del self._templates[stale]
+            self._templates[key] = template
+            while len(self._templates) > self.cache_size:
+                self._templates.popitem(last=False)
+        return template
+
     def generate_from_template(self, template_path: str, context: dict) -> io.BytesIO:
         """
         Generates a DOCX file by replacing placeholders in a template.
@@ -11,38 +186,15 @@ class DocumentService:
         context: Dictionay of {placeholder: value}.
         Returns: BytesIO object of the generated file.
         """
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"Template not found: {template_path}")
-
-        doc = Document(template_path)
-
-        # 1. Replace in Paragraphs
-        for paragraph in doc.paragraphs:
-            self._replace_text_in_paragraph(paragraph, context)
-
-        # 2. Replace in Tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        self._replace_text_in_paragraph(paragraph, context)
-
-        # Save to buffer
-        file_stream = io.BytesIO()
-        doc.save(file_stream)
-        file_stream.seek(0)
-        return file_stream
+        return render_template(self.get_template(template_path), context)
 
-    def _replace_text_in_paragraph(self, paragraph, context):
+    def generate_batch(self, template_path: str, contexts: Iterable[dict]) -> Iterator[io.BytesIO]:
         """
-        Helper to replace text in a paragraph. 
-        Note: This is a simple replacement. Complex formatting might break if run spans are split.
+        Generates one DOCX per context (e.g. engagement letters for a whole
+        portfolio) from a single compiled template.
         """
-        for key, value in context.items():
-            placeholder = f"{{{{{key}}}}}" # Expects {{key}}
-            if placeholder in paragraph.text:
-                # Simple replacement (might lose formatting if placeholder spans multiple runs)
-                # For robust replacement, we need to iterate runs, but this suffices for MVP
-                paragraph.text = paragraph.text.replace(placeholder, str(value))
+        template = self.get_template(template_path)
+        for context in contexts:
+            yield render_template(template, context)
 
 document_service = DocumentService()
@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.api.services.balance_cache import ensure_balances
+from src.api.services.chart_of_accounts import account_tree, engagement_template
+
+# Standard account code prefixes used by the BP / DRE lines. A prefix matches
+# every code starting with it ("2" also covers condominium codes such as "201").
+REPORT_PREFIXES = ("1", "1.1", "1.2", "2", "2.1", "2.2", "2.3", "3", "4")
+
+
+def _standard_accounts_filter(engagement: models.Engagement):
+    if engagement.chart_mode == "client_custom":
+        return models.StandardAccount.client_id == engagement.client_id
+    return models.StandardAccount.template_type == "br_gaap"
+
+
+def _mapped_balances(engagement: models.Engagement, key):
+    """
+    The engagement's materialized balances (services.balance_cache) summed per
+    ``key`` column of their standard account, restricted to the engagement's chart.
+    """
+    return select(
+        key.label("key"),
+        func.sum(models.EngagementBalance.balance).label("balance")
+    ).select_from(models.EngagementBalance).join(
+        models.StandardAccount, models.StandardAccount.id == models.EngagementBalance.standard_account_id
+    ).where(
+        models.EngagementBalance.engagement_id == engagement.id,
+        _standard_accounts_filter(engagement)
+    ).group_by(key)
+
+
+def rollup_balances(
+    db: Session,
+    engagement: models.Engagement,
+    prefixes: Sequence[str] = REPORT_PREFIXES
+) -> Dict[str, float]:
+    """
+    Returns {prefix: balance} for the engagement in a single query.
+
+    The database sums the engagement's balances per standard code and rolls the
+    sums up by code prefix with conditional aggregation.
+    """
+    ensure_balances(db, engagement)
+    per_standard_code = _mapped_balances(engagement, models.StandardAccount.code).subquery()
+
+    rollup = select(*(
+        func.coalesce(func.sum(case(
+            (per_standard_code.c.key.like(f"{prefix}%"), per_standard_code.c.balance), else_=0.0
+        )), 0.0)
+        for prefix in prefixes
+    ))
+    row = db.execute(rollup).one()
+    return {prefix: float(value) for prefix, value in zip(prefixes, row)}
+
+
+def account_rollup(db: Session, engagement: models.Engagement) -> List[Dict[str, Any]]:
+    """
+    Balance of every account of the engagement's chart including its sub-accounts,
+    in code order: one query for the per-account sums, then a single group-by over
+    the cached chart hierarchy (services.chart_of_accounts).
+    """
+    ensure_balances(db, engagement)
+    rows = db.execute(_mapped_balances(engagement, models.StandardAccount.id)).all()
+    tree = account_tree(db, engagement_template(engagement))
+    totals = tree.rollup([r.key for r in rows], [r.balance for r in rows])
+    return [
+        {"id": int(account_id), "code": code, "name": name, "level": int(level), "balance": float(balance)}
+        for account_id, code, name, level, balance in zip(tree.ids, tree.codes, tree.names, tree.levels, totals)
+    ]
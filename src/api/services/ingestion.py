@@ -1,14 +1,140 @@
 import pandas as pd
+import numpy as np
 import io
+import re
 from fastapi import UploadFile, HTTPException
-from typing import Dict, Any, List
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Union
+
+# A cell holding both separators with '.' before ',' (BR: 1.000,00) or ',' before '.' (US: 1,000.00)
+_DOT_BEFORE_COMMA = re.compile(r'\.[^\n,]*,')
+_COMMA_BEFORE_DOT = re.compile(r',[^\n.]*\.')
+# A separator with no occurrence of the other one after it in the same cell
+_DOT_WITHOUT_LATER_COMMA = re.compile(r'\.[^\n,]*$', re.MULTILINE)
+_COMMA_WITHOUT_LATER_DOT = re.compile(r',[^\n.]*$', re.MULTILINE)
+
+
+def clean_currency(x) -> float:
+    """Parses one monetary value ('R$ 1.000,00', '1,000.00', 1000.0); 0.0 when invalid."""
+    if pd.isna(x): return 0.0
+    if isinstance(x, (int, float)): return float(x)
+    if isinstance(x, str): return _clean_currency_text(x)
+    return 0.0
+
+
+def _clean_currency_text(x: str) -> float:
+    x = x.strip().replace('R$', '').replace(' ', '')
+    # Detect format: 1.000,00 (BR) vs 1,000.00 (US)
+    if ',' in x and '.' in x:
+        if x.rfind(',') > x.rfind('.'): # BR: 1.000,00
+             x = x.replace('.', '').replace(',', '.')
+        else: # US: 1,000.00
+             x = x.replace(',', '')
+    elif ',' in x: # BR without thousands: 1000,00
+        x = x.replace(',', '.')
+    return _to_float(x)
+
+
+def _to_float(x: str) -> float:
+    try:
+        return float(x)
+    except ValueError:
+        return 0.0
+
+
+def _parse_floats(blob: str, count: int) -> np.ndarray:
+    """
+    Parses '\n'-separated numbers. NumPy's C parser is used when every cell is
+    guaranteed to map to exactly one number (it skips empty cells and splits on
+    any whitespace); otherwise, or if it fails, each cell goes through float().
+    """
+    safe = (blob and blob[0] != '\n' and blob[-1] != '\n' and '\n\n' not in blob
+            and not any(c in blob for c in '\t\r\x0b\x0c'))
+    if safe:
+        try:
+            parsed = np.fromstring(blob, dtype=np.float64, sep='\n')
+            if len(parsed) == count:
+                return parsed
+        except ValueError:
+            pass
+    return np.fromiter(map(_to_float, blob.split('\n')), dtype=np.float64, count=count)
+
+
+def _column_format(blob: str) -> Optional[str]:
+    """
+    Detects the separator convention of a whole column ('\n'-joined cells):
+    'plain' when no cell has both separators, 'br' or 'us' when every cell with
+    both follows that format, None when the column mixes them.
+    """
+    if not _DOT_BEFORE_COMMA.search(blob) and not _COMMA_BEFORE_DOT.search(blob):
+        return 'plain'
+    # Every '.' has a later ',' in its cell, so ',' is the decimal separator wherever both appear
+    if not _DOT_WITHOUT_LATER_COMMA.search(blob):
+        return 'br'
+    if not _COMMA_WITHOUT_LATER_DOT.search(blob):
+        return 'us'
+    return None
+
+
+def clean_currency_column(values: pd.Series) -> pd.Series:
+    """
+    Vectorized ``clean_currency`` for a whole column; returns float64 values.
+
+    Text cells are joined into a single string so each cleaning step is one C-level
+    str.replace over the column instead of one Python call per cell. The BR/US
+    format is detected once per column; only columns mixing both formats (or
+    with multi-line cells) fall back to ``clean_currency`` cell by cell.
+    Results are identical to applying ``clean_currency`` to every cell.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64').fillna(0.0)
+
+    cells = values.to_numpy(dtype=object)
+    result = np.zeros(len(cells), dtype=np.float64)
+    present = ~pd.isna(cells)
+    if pd.api.types.infer_dtype(cells, skipna=True) == 'string':
+        is_text = present
+    else:
+        is_text = np.fromiter((isinstance(v, str) for v in cells), dtype=bool, count=len(cells))
+        other = present & ~is_text
+        result[other] = [clean_currency(v) for v in cells[other]]
+
+    texts = cells[is_text]
+    if len(texts) == 0:
+        return pd.Series(result, index=values.index)
+
+    blob = '\n'.join(texts)
+    fmt = _column_format(blob) if blob.count('\n') == len(texts) - 1 else None
+    if fmt is None:
+        result[is_text] = [_clean_currency_text(v) for v in texts]
+        return pd.Series(result, index=values.index)
+
+    blob = blob.replace('R$', '').replace(' ', '')
+    if fmt == 'br':
+        blob = blob.replace('.', '').replace(',', '.')
+    elif fmt == 'us':
+        blob = blob.replace(',', '')
+    else:
+        blob = blob.replace(',', '.')
+
+    result[is_text] = _parse_floats(blob, len(texts))
+    return pd.Series(result, index=values.index)
+
 
 class TrialBalanceIngestion:
     @staticmethod
     def read_file(file: UploadFile) -> pd.DataFrame:
         # Read file content into memory
-        content = file.file.read()
-        filename = file.filename.lower()
+        return TrialBalanceIngestion.read_content(file.file.read(), file.filename)
+
+    @staticmethod
+    def read_path(path: str, filename: Optional[str] = None) -> pd.DataFrame:
+        """Reads a spooled upload (see services.upload_jobs) from disk."""
+        with open(path, 'rb') as f:
+            return TrialBalanceIngestion.read_content(f.read(), filename or path)
+
+    @staticmethod
+    def read_content(content: bytes, filename: str) -> pd.DataFrame:
+        filename = filename.lower()
 
         try:
             if filename.endswith('.csv'):
@@ -37,6 +163,35 @@ class TrialBalanceIngestion:
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
 
+    @staticmethod
+    def preview(source: Union[str, BinaryIO], filename: str, preview_rows: int = 10,
+                chunk_size: int = 50000, progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        Counts rows and returns the first rows and columns of a file (path or binary handle).
+        CSVs are streamed in chunks; ``progress`` receives the rows read so far.
+        """
+        lower = filename.lower()
+        if lower.endswith('.xlsx') or lower.endswith('.xls'):
+            chunks = [pd.read_excel(source)]
+        elif lower.endswith('.csv'):
+            chunks = pd.read_csv(source, encoding='utf-8', chunksize=chunk_size)
+        else:
+            raise HTTPException(status_code=400, detail="Unsupported file format. Use .xlsx, .xls, or .csv")
+
+        columns, preview, total_rows = [], [], 0
+        for df in chunks:
+            # Clean data (sanitize columns)
+            df.columns = [str(c).strip() for c in df.columns]
+            if not columns:
+                columns = df.columns.tolist()
+                head = df.head(preview_rows).astype(object)
+                preview = head.where(pd.notnull(head), None).to_dict(orient='records')
+            total_rows += len(df)
+            if progress:
+                progress(total_rows)
+
+        return {"total_rows": total_rows, "columns": columns, "preview": preview}
+
     @staticmethod
     def validate_and_parse(df: pd.DataFrame) -> Dict[str, Any]:
         """
@@ -77,26 +232,6 @@ class TrialBalanceIngestion:
         if errors:
             return {"valid": False, "errors": errors}
 
-        # Data Cleaning & Calculation
-        def clean_currency(x):
-            if pd.isna(x): return 0.0
-            if isinstance(x, (int, float)): return float(x)
-            if isinstance(x, str):
-                x = x.strip().replace('R$', '').replace(' ', '')
-                # Detect format: 1.000,00 (BR) vs 1,000.00 (US)
-                if ',' in x and '.' in x:
-                    if x.rfind(',') > x.rfind('.'): # BR: 1.000,00
-                         x = x.replace('.', '').replace(',', '.')
-                    else: # US: 1,000.00
-                         x = x.replace(',', '')
-                elif ',' in x: # BR without thousands: 1000,00
-                    x = x.replace(',', '.')
-                try:
-                    return float(x)
-                except ValueError:
-                    return 0.0
-            return 0.0
-
         total_debit = 0.0
         total_credit = 0.0
         net_balance = 0.0
@@ -109,8 +244,8 @@ class TrialBalanceIngestion:
         if has_dc:
             d_col = found_cols['debit']
             c_col = found_cols['credit']
-            df['clean_debit'] = df[d_col].apply(clean_currency)
-            df['clean_credit'] = df[c_col].apply(clean_currency)
+            df['clean_debit'] = clean_currency_column(df[d_col])
+            df['clean_credit'] = clean_currency_column(df[c_col])
 
             total_debit = df['clean_debit'].sum()
             total_credit = df['clean_credit'].sum()
@@ -121,7 +256,7 @@ class TrialBalanceIngestion:
             normalized_data['balance'] = df['clean_debit'] - df['clean_credit']
         elif has_balance:
             b_col = found_cols['balance']
-            df['clean_balance'] = df[b_col].apply(clean_currency)
+            df['clean_balance'] = clean_currency_column(df[b_col])
             net_balance = df['clean_balance'].sum()
 
             normalized_data['balance'] = df['clean_balance']
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from src.api import models
+
+# Snapshots are local files: analytics workers must run on the host (or volume)
+# where they were written, otherwise they are rebuilt on first access.
+SNAPSHOT_DIR = os.getenv("LEDGER_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "auditflow_snapshots"))
+
+# Versions kept on disk per engagement (older ones are deleted with their catalog rows)
+SNAPSHOT_KEEP_VERSIONS = 2
+
+NUMERIC_COLUMNS = {
+    'id': np.int64,
+    'amount': np.float64,
+    'vendor_id': np.int64,  # -1 when the transaction has no canonical vendor
+}
+DATE_COLUMNS = ['date']  # datetime64[s], NaT when missing
+# Dictionary-encoded: <column>.codes.npy (int32, -1 = NULL) + <column>.values.json
+TEXT_COLUMNS = ['vendor', 'account_code', 'account_name', 'description']
+
+SNAPSHOT_COLUMNS = list(NUMERIC_COLUMNS) + DATE_COLUMNS + TEXT_COLUMNS
+
+
+def _column_files(column: str) -> List[str]:
+    if column in TEXT_COLUMNS:
+        return [f"{column}.codes.npy", f"{column}.values.json"]
+    return [f"{column}.npy"]
+
+
+def _checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    for column in SNAPSHOT_COLUMNS:
+        for name in _column_files(column):
+            with open(os.path.join(path, name), 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_columns(df: pd.DataFrame, path: str) -> None:
+    for column, dtype in NUMERIC_COLUMNS.items():
+        values = df[column]
+        if column == 'vendor_id':
+            values = values.fillna(-1)
+        np.save(os.path.join(path, f"{column}.npy"), values.to_numpy(dtype=dtype))
+
+    for column in DATE_COLUMNS:
+        dates = pd.to_datetime(df[column], errors='coerce').to_numpy(dtype='datetime64[s]')
+        np.save(os.path.join(path, f"{column}.npy"), dates)
+
+    for column in TEXT_COLUMNS:
+        codes, uniques = pd.factorize(df[column], use_na_sentinel=True)
+        np.save(os.path.join(path, f"{column}.codes.npy"), codes.astype(np.int32))
+        with open(os.path.join(path, f"{column}.values.json"), 'w', encoding='utf-8') as f:
+            json.dump([str(v) for v in uniques], f, ensure_ascii=False)
+
+
+def _ledger_state(db: Session, engagement_id: int) -> tuple:
+    """(row count, highest transaction id) of the engagement in the database."""
+    return db.query(func.count(models.Transaction.id), func.max(models.Transaction.id)).filter(
+        models.Transaction.engagement_id == engagement_id
+    ).one()
+
+
+def write_snapshot(db: Session, engagement_id: int) -> models.LedgerSnapshot:
+    """
+    Materializes the engagement's ledger into a new immutable snapshot version.
+
+    Columns are read with a single Core query (no ORM objects), written to a
+    temporary directory and renamed into place, so readers never see a partial
+    snapshot. The engagement row stays locked until the caller commits, so
+    concurrent writers get distinct versions; a version directory that already
+    exists is never replaced. The catalog row is added to the session; the
+    caller commits.
+    """
+    _lock_engagement(db, engagement_id)
+    query = select(*(getattr(models.Transaction, c) for c in SNAPSHOT_COLUMNS)).where(
+        models.Transaction.engagement_id == engagement_id
+    ).order_by(models.Transaction.id)
+    df = pd.read_sql(query, db.connection())
+
+    latest = db.query(func.max(models.LedgerSnapshot.version)).filter(
+        models.LedgerSnapshot.engagement_id == engagement_id
+    ).scalar() or 0
+    version = latest + 1
+
+    engagement_dir = os.path.join(SNAPSHOT_DIR, f"engagement_{engagement_id}")
+    os.makedirs(engagement_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=engagement_dir)
+    try:
+        _write_columns(df, tmp_path)
+        checksum = _checksum(tmp_path)
+        path = os.path.join(engagement_dir, f"v{version:06d}")
+        while os.path.exists(path):
+            # Left over from a rolled back write or a catalog that no longer exists
+            # (e.g. a reset dev database): it may still be read, take the next version
+            version += 1
+            path = os.path.join(engagement_dir, f"v{version:06d}")
+        with open(os.path.join(tmp_path, "manifest.json"), 'w') as f:
+            json.dump({"version": version, "row_count": len(df), "columns": SNAPSHOT_COLUMNS,
+                       "checksum": checksum}, f)
+        os.rename(tmp_path, path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    snapshot = models.LedgerSnapshot(
+        engagement_id=engagement_id,
+        version=version,
+        path=path,
+        row_count=len(df),
+        checksum=checksum
+    )
+    db.add(snapshot)
+    _prune_snapshots(db, engagement_id, keep_after=version - SNAPSHOT_KEEP_VERSIONS)
+    db.flush()
+    return snapshot
+
+
+def _lock_engagement(db: Session, engagement_id: int) -> None:
+    """Locks the engagement row until the caller commits (one snapshot writer per engagement)."""
+    db.query(models.Engagement.id).filter(models.Engagement.id == engagement_id).with_for_update().one_or_none()
+
+
+def _prune_snapshots(db: Session, engagement_id: int, keep_after: int) -> None:
+    """
+    Deletes the catalog rows of old versions. Their directories are removed only
+    once the deletion is committed: until then other sessions may still read them.
+    """
+    old = db.query(models.LedgerSnapshot).filter(
+        models.LedgerSnapshot.engagement_id == engagement_id,
+        models.LedgerSnapshot.version <= keep_after
+    ).all()
+    if not old:
+        return
+    if "pruned_snapshot_paths" not in db.info:
+        db.info["pruned_snapshot_paths"] = []
+        event.listen(db, "after_commit", _remove_pruned_paths)
+        event.listen(db, "after_rollback", _forget_pruned_paths)
+    for snapshot in old:
+        db.info["pruned_snapshot_paths"].append(snapshot.path)
+        db.delete(snapshot)
+
+
+def _remove_pruned_paths(db: Session) -> None:
+    for path in db.info["pruned_snapshot_paths"]:
+        shutil.rmtree(path, ignore_errors=True)
+    db.info["pruned_snapshot_paths"] = []
+
+
+def _forget_pruned_paths(db: Session) -> None:
+    db.info["pruned_snapshot_paths"] = []
+
+
+def load_columns(snapshot: models.LedgerSnapshot, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Memory-maps snapshot columns. Numeric and date columns are read-only NumPy
+    memmaps; text columns are returned as (codes memmap, values list).
+    """
+    loaded = {}
+    for column in columns or SNAPSHOT_COLUMNS:
+        if column in TEXT_COLUMNS:
+            codes = np.load(os.path.join(snapshot.path, f"{column}.codes.npy"), mmap_mode='r')
+            with open(os.path.join(snapshot.path, f"{column}.values.json"), encoding='utf-8') as f:
+                loaded[column] = (codes, json.load(f))
+        else:
+            loaded[column] = np.load(os.path.join(snapshot.path, f"{column}.npy"), mmap_mode='r')
+    return loaded
+
+
+def verify_snapshot(snapshot: models.LedgerSnapshot) -> bool:
+    """Recomputes the checksum of the snapshot files (reads every file)."""
+    try:
+        return _checksum(snapshot.path) == snapshot.checksum
+    except FileNotFoundError:
+        return False
+
+
+def current_snapshot(db: Session, engagement_id: int) -> models.LedgerSnapshot:
+    """
+    Returns the latest snapshot of the engagement, writing a new version when
+    there is none, its files are gone or the ledger changed since it was taken
+    (row count or highest transaction id differ). May flush; the caller commits.
+    """
+    snapshot = db.query(models.LedgerSnapshot).filter(
+        models.LedgerSnapshot.engagement_id == engagement_id
+    ).order_by(models.LedgerSnapshot.version.desc()).first()
+
+    if snapshot is not None and os.path.isdir(snapshot.path):
+        row_count, max_id = _ledger_state(db, engagement_id)
+        if snapshot.row_count == row_count:
+            ids = np.load(os.path.join(snapshot.path, "id.npy"), mmap_mode='r')
+            if row_count == 0 or int(ids[-1]) == max_id:
+                return snapshot
+
+    return write_snapshot(db, engagement_id)
+
+
+def snapshot_frame(db: Session, engagement_id: int, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Returns the requested ledger columns as a DataFrame (text decoded, NULLs as None)."""
+    loaded = load_columns(current_snapshot(db, engagement_id), columns)
+    data = {}
+    for column, values in loaded.items():
+        if column in TEXT_COLUMNS:
+            codes, uniques = values
+            lookup = np.array(uniques + [None], dtype=object)
+            data[column] = pd.Series(lookup[codes], dtype=object)  # -1 picks the trailing None
+        else:
+            data[column] = np.asarray(values)
+    return pd.DataFrame(data)
+
+
+class LedgerColumns:
+    """
+    Column accessor over an engagement's ledger snapshot.
+
+    Every column is a read-only memory-mapped NumPy array (text columns as int32
+    codes into a small list of distinct values), so analytics work on whole
+    columns without creating ORM objects or per-row Python values. Only rows that
+    end up in a result are materialized, through ``rows``.
+    """
+
+    def __init__(self, snapshot: models.LedgerSnapshot):
+        self.snapshot = snapshot
+        self._columns: Dict[str, Any] = {}
+
+    def _column(self, name: str):
+        if name not in self._columns:
+            self._columns.update(load_columns(self.snapshot, [name]))
+        return self._columns[name]
+
+    def __len__(self) -> int:
+        return self.snapshot.row_count
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._column('id')
+
+    @property
+    def amount(self) -> np.ndarray:
+        """float64, NaN where the amount is NULL."""
+        return self._column('amount')
+
+    @property
+    def date(self) -> np.ndarray:
+        """datetime64[s], NaT where the date is NULL."""
+        return self._column('date')
+
+    @property
+    def vendor_id(self) -> np.ndarray:
+        """int64, -1 where the transaction has no canonical vendor."""
+        return self._column('vendor_id')
+
+    @property
+    def account_code(self) -> np.ndarray:
+        """int32 codes into ``account_codes`` (-1 where NULL)."""
+        return self._column('account_code')[0]
+
+    @property
+    def account_codes(self) -> List[str]:
+        return self._column('account_code')[1]
+
+    def account_mask(self, account_codes: Sequence[str]) -> np.ndarray:
+        """Boolean mask of the rows booked to any of ``account_codes``."""
+        wanted = [i for i, code in enumerate(self.account_codes) if code in set(account_codes)]
+        return np.isin(self.account_code, wanted)
+
+    def rows(self, indexes: Sequence[int], columns: Sequence[str] = ('id', 'vendor', 'amount', 'date', 'account_name')) -> List[Dict[str, Any]]:
+        """Materializes the given rows as dicts (JSON-ready: NULLs as None, dates as text)."""
+        indexes = np.asarray(indexes, dtype=np.int64)
+        decoded = {}
+        for column in columns:
+            values = self._column(column)
+            if column in TEXT_COLUMNS:
+                codes, uniques = values
+                decoded[column] = [uniques[c] if c >= 0 else None for c in codes[indexes].tolist()]
+            elif column in DATE_COLUMNS:
+                decoded[column] = [None if pd.isna(d) else str(pd.Timestamp(d)) for d in values[indexes]]
+            else:
+                decoded[column] = [None if v != v else v for v in values[indexes].tolist()]
+        return [dict(zip(columns, row)) for row in zip(*(decoded[c] for c in columns))]
+
+
+def ledger_columns(db: Session, engagement_id: int) -> LedgerColumns:
+    """Returns the column accessor of the engagement's current snapshot (built if needed)."""
+    return LedgerColumns(current_snapshot(db, engagement_id))
@@ -0,0 +1,154 @@
+import hashlib
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from src.api import models
+
+# (mapping id, standard account id)
+Resolution = Tuple[Optional[int], Optional[int]]
+UNMAPPED: Resolution = (None, None)
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_description(description: Optional[str]) -> str:
+    """Lowercases, folds accents and drops whitespace and punctuation ("Depreciação - Veículos" -> "depreciacaoveiculos")."""
+    text = unicodedata.normalize('NFKD', str(description or '').lower()).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub('', text)
+
+
+def description_key(description: Optional[str]) -> Optional[str]:
+    """
+    Stored in ``AccountMapping.description_key``: a 64-bit hash (16 hex chars) of
+    the normalized description, so spelling variants of one account share a key
+    and are looked up through a short indexed column. None for empty descriptions.
+    """
+    normalized = normalize_description(description)
+    if not normalized:
+        return None
+    return hashlib.blake2b(normalized.encode('ascii'), digest_size=8).hexdigest()
+
+
+@dataclass
+class MappingLookup:
+    """
+    A firm's account mappings keyed the way transactions are matched: by client
+    account code first, then by client description (the account name) through
+    its ``description_key``, so "CAIXA GERAL" and "Caixa-Geral" from another
+    client reuse the same mapping. When several mappings share a key the most
+    recent one wins.
+    """
+    by_code: Dict[str, Resolution] = field(default_factory=dict)
+    by_description: Dict[str, Resolution] = field(default_factory=dict)
+
+    def resolve(self, account_code: Optional[str], account_name: Optional[str]) -> Resolution:
+        if account_code and account_code in self.by_code:
+            return self.by_code[account_code]
+        key = description_key(account_name)
+        if key and key in self.by_description:
+            return self.by_description[key]
+        return UNMAPPED
+
+    def resolve_columns(self, account_codes: pd.Series, account_names: pd.Series) -> pd.DataFrame:
+        """Vectorized ``resolve``: nullable integer 'mapping_id' and 'standard_account_id' columns."""
+        # Hashed once per distinct name
+        keys = account_names.map({name: description_key(name) for name in account_names.dropna().unique()})
+        out = pd.DataFrame(index=account_codes.index)
+        for i, column in enumerate(('mapping_id', 'standard_account_id')):
+            by_code = account_codes.map({k: v[i] for k, v in self.by_code.items()})
+            by_description = keys.map({k: v[i] for k, v in self.by_description.items()})
+            resolved = by_code.where(account_codes.isin(self.by_code.keys()), by_description)
+            out[column] = resolved.astype('Int64')
+        return out
+
+
+def load_mapping_lookup(db: Session, firm_id: int) -> MappingLookup:
+    lookup = MappingLookup()
+    mappings = db.query(
+        models.AccountMapping.id, models.AccountMapping.client_account_code,
+        models.AccountMapping.client_description, models.AccountMapping.description_key,
+        models.AccountMapping.standard_account_id
+    ).filter(models.AccountMapping.firm_id == firm_id).order_by(models.AccountMapping.id).all()
+
+    for mapping_id, code, description, key, standard_account_id in mappings:
+        if code:
+            lookup.by_code[code] = (mapping_id, standard_account_id)
+        key = key or description_key(description)
+        if key:
+            lookup.by_description[key] = (mapping_id, standard_account_id)
+    return lookup
+
+
+def backfill_description_keys(db: Session) -> int:
+    """Sets ``description_key`` of mappings stored before the column existed. The caller commits."""
+    missing = db.query(models.AccountMapping.id, models.AccountMapping.client_description).filter(
+        models.AccountMapping.description_key.is_(None),
+        models.AccountMapping.client_description.isnot(None)
+    ).all()
+    changes = [{"id": mapping_id, "description_key": description_key(description)}
+               for mapping_id, description in missing]
+    changes = [c for c in changes if c["description_key"]]
+    if changes:
+        db.execute(update(models.AccountMapping), changes)
+    return len(changes)
+
+
+def resolve_engagement_mappings(db: Session, engagement_id: int, lookup: MappingLookup) -> int:
+    """
+    Re-resolves the stored mapping of every transaction of the engagement.
+
+    Resolution only depends on (account_code, account_name), so it is computed
+    once per distinct pair and written with one executemany UPDATE for the pairs
+    whose stored result changed. Returns the number of pairs updated; the caller commits.
+    """
+    pairs = db.query(
+        models.Transaction.account_code, models.Transaction.account_name,
+        models.Transaction.mapping_id, models.Transaction.standard_account_id
+    ).filter(models.Transaction.engagement_id == engagement_id).distinct().all()
+
+    changes = []
+    for code, name, mapping_id, standard_account_id in pairs:
+        resolved = lookup.resolve(code, name)
+        if resolved != (mapping_id, standard_account_id):
+            changes.append({"code": code, "name": name,
+                            "new_mapping_id": resolved[0], "new_standard_account_id": resolved[1]})
+
+    if changes:
+        statement = update(models.Transaction.__table__).where(
+            models.Transaction.engagement_id == engagement_id,
+            models.Transaction.account_code.is_not_distinct_from(bindparam("code")),
+            models.Transaction.account_name.is_not_distinct_from(bindparam("name"))
+        ).values(mapping_id=bindparam("new_mapping_id"), standard_account_id=bindparam("new_standard_account_id"))
+        db.execute(statement, changes)
+    return len(changes)
+
+
+def resolve_firm_mappings(
+    db: Session,
+    firm_id: int,
+    engagement_ids: Optional[Iterable[int]] = None,
+    on_change: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Re-resolves the transactions of the firm's engagements (all of them by default).
+    ``on_change`` is called with the id of every engagement whose transactions changed.
+    """
+    lookup = load_mapping_lookup(db, firm_id)
+    if engagement_ids is None:
+        engagement_ids = [e.id for e in db.query(models.Engagement.id).join(models.Client).filter(
+            models.Client.firm_id == firm_id
+        )]
+
+    updated = 0
+    for engagement_id in engagement_ids:
+        changed = resolve_engagement_mappings(db, engagement_id, lookup)
+        if changed and on_change:
+            on_change(engagement_id)
+        updated += changed
+    return updated
@@ -0,0 +1,286 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.scripts.duplicate_analysis import normalize_vendor
+
+# Candidates returned per description
+SUGGESTION_TOP_K = 3
+# Cosine scores below this are not suggested
+MIN_SUGGESTION_SCORE = 0.15
+# Descriptions scored per block; bounds the (rows x accounts) score matrix
+SUGGESTION_CHUNK_ROWS = 2048
+# N-grams present in more than 1/DENSE_POSTING_RATIO of the accounts are scored with
+# a dense matrix product (cheaper than expanding their long postings), up to MAX_DENSE_NGRAMS
+DENSE_POSTING_RATIO = 20
+MAX_DENSE_NGRAMS = 1024
+
+# In-process cache: (firm_id, template_type) -> SuggestionIndex
+_indexes: Dict[Tuple[int, str], "SuggestionIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def _distinct(values: np.ndarray) -> np.ndarray:
+    """Sorted distinct values; for integer keys a sort is much faster than np.unique's hashing."""
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+
+def _gram_codes(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distinct (row, char 3-gram) pairs of normalized (ASCII) texts, padded with a
+    space on each side. Each 3-gram is encoded as a 24-bit integer, computed for
+    all texts at once over their concatenated bytes.
+    """
+    padded = [f" {text} ".ljust(3) for text in texts]
+    if not padded:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+    data = np.frombuffer("".join(padded).encode('ascii'), dtype=np.uint8).astype(np.int64)
+    counts = lengths - 2
+    starts = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+    codes = (data[positions] << 16) | (data[positions + 1] << 8) | data[positions + 2]
+    keys = _distinct((np.repeat(np.arange(len(padded), dtype=np.int64), counts) << 24) | codes)
+    return keys >> 24, keys & 0xFFFFFF
+
+
+class SuggestionIndex:
+    """
+    Char 3-gram TF-IDF index of standard accounts.
+
+    Each account is represented by the centroid of its own name and of every
+    client description the firm has mapped to it, so past mappings pull similar
+    wordings towards the account. A block of descriptions is scored against all
+    accounts in one product, split by n-gram frequency: the few n-grams shared
+    by many accounts form a small dense matrix multiplied with BLAS, the rest are
+    postings (account, weight) expanded with NumPy and scattered into the scores.
+    N-grams that occur in exactly the same documents are one column of both.
+
+    Descriptions whose normalized text was already mapped by the firm get that
+    account with score 1.0 first.
+    """
+
+    def __init__(self, accounts: Sequence[Tuple[int, str, str]], history: Sequence[Tuple[str, int]],
+                 signature: tuple = ()):
+        self.signature = signature
+        self.account_ids = np.asarray([a[0] for a in accounts], dtype=np.int64)
+        self._ids = [a[0] for a in accounts]
+        self.codes = [a[1] for a in accounts]
+        self.names = [a[2] for a in accounts]
+        n_accounts = len(accounts)
+        position = {account_id: i for i, account_id in enumerate(self.account_ids.tolist())}
+
+        # Documents: account names, then the distinct mapped descriptions
+        texts = [normalize_vendor(name) for name in self.names]
+        owners = list(range(n_accounts))
+        self.exact: Dict[str, int] = {}
+        seen = set()
+        for description, account_id in history:
+            text = normalize_vendor(description)
+            if not text or account_id not in position:
+                continue
+            self.exact[text] = position[account_id]  # Most recent mapping wins
+            if (text, account_id) not in seen:
+                seen.add((text, account_id))
+                texts.append(text)
+                owners.append(position[account_id])
+
+        doc_rows, doc_codes = _gram_codes(texts)
+        self.vocabulary = _distinct(doc_codes)
+        n_features = len(self.vocabulary)
+        doc_features = np.searchsorted(self.vocabulary, doc_codes)
+
+        n_docs = max(len(texts), 1)
+        document_frequency = np.bincount(doc_features, minlength=n_features)
+        self.idf = np.log((1 + n_docs) / (1 + document_frequency)) + 1.0
+        self.unknown_idf = np.log(1 + n_docs) + 1.0
+
+        # N-grams found in exactly the same documents (e.g. every 3-gram inside a word
+        # that appears nowhere else) have the same idf and the same weight in every
+        # account: they share one column, so queries are scored over far fewer columns
+        order = np.lexsort((doc_rows, doc_features))
+        bounds = np.flatnonzero(np.diff(doc_features[order])) + 1
+        self._feature_column = np.empty(n_features, dtype=np.int64)
+        representatives = []
+        column_of_docs: Dict[bytes, int] = {}
+        for feature, docs in enumerate(np.split(doc_rows[order], bounds) if n_features else []):
+            column = column_of_docs.setdefault(docs.tobytes(), len(column_of_docs))
+            if column == len(representatives):
+                representatives.append(feature)
+            self._feature_column[feature] = column
+        n_columns = len(representatives)
+
+        # L2-normalized document vectors summed into one centroid per account
+        weights = self.idf[doc_features]
+        doc_norms = np.sqrt(np.bincount(doc_rows, weights=weights ** 2, minlength=len(texts)))
+        weights = weights / doc_norms[doc_rows]
+        accounts_of = np.asarray(owners, dtype=np.int64)[doc_rows]
+        keys, inverse = np.unique(accounts_of * n_features + doc_features, return_inverse=True)
+        profile = np.bincount(inverse, weights=weights)
+        profile_accounts = keys // max(n_features, 1)
+        profile_features = keys % max(n_features, 1)
+        norms = np.sqrt(np.bincount(profile_accounts, weights=profile ** 2, minlength=n_accounts))
+        profile = profile / norms[profile_accounts]
+        is_representative = np.zeros(n_features, dtype=bool)
+        is_representative[representatives] = True
+        keep = is_representative[profile_features]
+        profile, profile_accounts = profile[keep], profile_accounts[keep]
+        profile_columns = self._feature_column[profile_features[keep]]
+
+        # Dense part: the most widespread columns, as a (columns x accounts) matrix
+        posting_lengths = np.bincount(profile_columns, minlength=n_columns)
+        dense = np.flatnonzero(posting_lengths * DENSE_POSTING_RATIO > n_accounts)
+        dense = dense[np.argsort(-posting_lengths[dense], kind='stable')][:MAX_DENSE_NGRAMS]
+        self._dense_column = np.full(n_columns, -1, dtype=np.int64)
+        self._dense_column[dense] = np.arange(len(dense))
+        in_dense = self._dense_column[profile_columns] >= 0
+        self._dense = np.zeros((len(dense), n_accounts), dtype=np.float32)
+        self._dense[self._dense_column[profile_columns[in_dense]], profile_accounts[in_dense]] = profile[in_dense]
+
+        # Sparse part: postings by column (CSR; dense columns are empty)
+        sparse_columns = profile_columns[~in_dense]
+        order = np.argsort(sparse_columns, kind='stable')
+        self._posting_accounts = profile_accounts[~in_dense][order]
+        self._posting_weights = profile[~in_dense][order]
+        self._indptr = np.concatenate(([0], np.cumsum(np.bincount(sparse_columns, minlength=n_columns))))
+
+    def __len__(self) -> int:
+        return len(self.account_ids)
+
+    def _vectorize(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row, feature, weight) of the L2-normalized query vectors; unseen n-grams only count in the norm."""
+        rows, codes = _gram_codes(texts)
+        if len(self.vocabulary):
+            features = np.minimum(np.searchsorted(self.vocabulary, codes), len(self.vocabulary) - 1)
+            known = self.vocabulary[features] == codes
+        else:
+            features, known = np.zeros(len(codes), dtype=np.int64), np.zeros(len(codes), dtype=bool)
+        unknown = np.bincount(rows[~known], minlength=len(texts))
+        rows, features = rows[known], features[known]
+        weights = self.idf[features]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(texts))
+                        + unknown * self.unknown_idf ** 2)
+        return rows, features, weights / norms[rows]
+
+    def _score_block(self, rows: np.ndarray, features: np.ndarray, weights: np.ndarray, n_rows: int) -> np.ndarray:
+        features = self._feature_column[features]
+        columns = self._dense_column[features]
+        in_dense = columns >= 0
+        n_dense = self._dense.shape[0]
+        # Several n-grams of a row may share a column: their weights add up
+        query = np.bincount(rows[in_dense] * n_dense + columns[in_dense], weights=weights[in_dense],
+                            minlength=n_rows * n_dense).astype(np.float32).reshape(n_rows, n_dense)
+        scores = query @ self._dense
+
+        rows, features, weights = rows[~in_dense], features[~in_dense], weights[~in_dense]
+        starts = self._indptr[features]
+        lengths = self._indptr[features + 1] - starts
+        total = int(lengths.sum())
+        # Position of every posting of every query n-gram, without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        keys = np.repeat(rows, lengths) * len(self) + self._posting_accounts[offsets]
+        products = np.repeat(weights, lengths) * self._posting_weights[offsets]
+        # Rare n-grams only touch a few cells: scatter them rather than counting a full matrix
+        np.add.at(scores.reshape(-1), keys, products.astype(np.float32))
+        return scores
+
+    def suggest(self, descriptions: Sequence[str], top_k: int = SUGGESTION_TOP_K,
+                min_score: float = MIN_SUGGESTION_SCORE) -> List[List[dict]]:
+        """Top-k candidates ({standard_account_id, code, name, score}) per description, best first."""
+        texts = [normalize_vendor(d) for d in descriptions]
+        distinct = list(dict.fromkeys(texts))
+        k = min(top_k, len(self))
+        candidates: Dict[str, List[dict]] = {}
+
+        for start in range(0, len(distinct), SUGGESTION_CHUNK_ROWS):
+            block = distinct[start:start + SUGGESTION_CHUNK_ROWS]
+            if not k:
+                candidates.update((text, []) for text in block)
+                continue
+            scores = self._score_block(*self._vectorize(block), n_rows=len(block))
+            for row, text in enumerate(block):
+                exact = self.exact.get(text)
+                if exact is not None:
+                    scores[row, exact] = 1.0
+            # k is small: k passes of argmax are much cheaper than partitioning every row
+            top = np.empty((len(block), k), dtype=np.int64)
+            top_scores = np.empty((len(block), k), dtype=np.float32)
+            row_index = np.arange(len(block))
+            for i in range(k):
+                top[:, i] = scores.argmax(axis=1)
+                top_scores[:, i] = scores[row_index, top[:, i]]
+                scores[row_index, top[:, i]] = -np.inf
+
+            kept = (top_scores >= min_score).tolist()
+            rounded = np.minimum(top_scores, 1.0).astype(np.float64).round(4).tolist()
+            ids, codes, names = self._ids, self.codes, self.names
+            for text, positions, values, keep in zip(block, top.tolist(), rounded, kept):
+                candidates[text] = [
+                    {"standard_account_id": ids[p], "code": codes[p], "name": names[p], "score": v}
+                    for p, v, k in zip(positions, values, keep) if k
+                ]
+
+        return [candidates[text] for text in texts]
+
+
+def _index_signature(db: Session, firm_id: int, template_type: str) -> tuple:
+    mappings = db.query(
+        func.count(models.AccountMapping.id), func.max(models.AccountMapping.id),
+        func.max(models.AccountMapping.updated_at)
+    ).filter(
+        models.AccountMapping.firm_id == firm_id
+    ).one()
+    accounts = db.query(func.count(models.StandardAccount.id), func.max(models.StandardAccount.id)).filter(
+        models.StandardAccount.template_type == template_type
+    ).one()
+    return tuple(mappings) + tuple(accounts)
+
+
+def suggestion_index(db: Session, firm_id: int, template_type: str = "br_gaap") -> SuggestionIndex:
+    """
+    Returns the cached index of the template's accounts (plus any account the firm
+    maps to) and the firm's mapping history, rebuilding it when mappings or
+    accounts were added or removed (counts or highest ids differ) or a mapping
+    was updated (latest ``updated_at`` differs) since.
+    """
+    key = (firm_id, template_type)
+    signature = _index_signature(db, firm_id, template_type)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is not None and index.signature == signature:
+        return index
+
+    history = db.query(models.AccountMapping.client_description, models.AccountMapping.standard_account_id).filter(
+        models.AccountMapping.firm_id == firm_id,
+        models.AccountMapping.client_description.isnot(None)
+    ).order_by(models.AccountMapping.id).all()
+    mapped_ids = {account_id for _, account_id in history}
+    accounts = db.query(models.StandardAccount.id, models.StandardAccount.code, models.StandardAccount.name).filter(
+        (models.StandardAccount.template_type == template_type) | models.StandardAccount.id.in_(mapped_ids)
+    ).order_by(models.StandardAccount.code).all()
+
+    index = SuggestionIndex([tuple(a) for a in accounts], [tuple(h) for h in history], signature)
+    with _indexes_lock:
+        _indexes[key] = index
+    return index
+
+
+def invalidate_suggestion_indexes(firm_id: Optional[int] = None) -> None:
+    """Drops the cached indexes of one firm (or all of them)."""
+    with _indexes_lock:
+        for key in [k for k in _indexes if firm_id is None or k[0] == firm_id]:
+            del _indexes[key]
+
+
+def suggest_mappings(db: Session, firm_id: int, descriptions: Sequence[str], template_type: str = "br_gaap",
+                     top_k: int = SUGGESTION_TOP_K) -> Dict[str, List[dict]]:
+    """{description: candidates} for the given client descriptions."""
+    candidates = suggestion_index(db, firm_id, template_type).suggest(descriptions, top_k)
+    return dict(zip(descriptions, candidates))
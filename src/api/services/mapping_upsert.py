@@ -0,0 +1,118 @@
+import logging
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterable, List
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.api.services.mapping_resolution import description_key
+
+logger = logging.getLogger(__name__)
+
+# Rows written per executemany round trip
+MAPPING_BATCH_SIZE = 5000
+
+
+@dataclass
+class MappingUpsertStats:
+    created: int = 0
+    updated: int = 0
+    seconds: float = 0.0
+    # Seconds per write batch, in order (inserts first, then updates)
+    batches: List[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _batched(rows: List[dict], size: int) -> Iterable[List[dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def upsert_mappings(
+    db: Session,
+    firm_id: int,
+    mappings: Iterable,
+    batch_size: int = MAPPING_BATCH_SIZE
+) -> MappingUpsertStats:
+    """
+    Creates or updates a firm's account mappings (schemas.AccountMappingBase items).
+
+    An item updates the firm mapping with the same client account code, else the
+    one with the same normalized client description (``description_key``), else
+    it is created. Existing mappings
+    are prefetched with one query into dictionaries (the most recent wins, as in
+    services.mapping_resolution), so matching costs no round trips; inserts and
+    updates are then written with executemany in batches. Items repeating a key
+    within the upload update the same row. The caller commits.
+    """
+    stats = MappingUpsertStats()
+    start = time.perf_counter()
+
+    by_code: Dict[str, dict] = {}
+    by_description: Dict[str, dict] = {}
+    existing = db.query(
+        models.AccountMapping.id, models.AccountMapping.client_account_code,
+        models.AccountMapping.client_description, models.AccountMapping.description_key,
+        models.AccountMapping.standard_account_id
+    ).filter(models.AccountMapping.firm_id == firm_id).order_by(models.AccountMapping.id)
+    for mapping_id, code, description, key, standard_account_id in existing:
+        row = {"id": mapping_id, "client_account_code": code, "client_description": description,
+               "description_key": key or description_key(description), "standard_account_id": standard_account_id}
+        if code:
+            by_code[code] = row
+        if row["description_key"]:
+            by_description[row["description_key"]] = row
+
+    inserts: List[dict] = []
+    updates: Dict[int, dict] = {}
+    for mapping in mappings:
+        key = description_key(mapping.client_description)
+        row = None
+        if mapping.client_account_code:
+            row = by_code.get(mapping.client_account_code)
+        if row is None and key:
+            row = by_description.get(key)
+
+        if row is None:
+            row = {"firm_id": firm_id, "client_description": mapping.client_description,
+                   "description_key": key, "client_account_code": mapping.client_account_code,
+                   "standard_account_id": mapping.standard_account_id}
+            inserts.append(row)
+            # Newest mapping: later lookups (and transaction resolution) find this one
+            if key:
+                by_description[key] = row
+        else:
+            row["standard_account_id"] = mapping.standard_account_id
+            if mapping.client_account_code:
+                row["client_account_code"] = mapping.client_account_code
+            if "id" in row:
+                updates[row["id"]] = row
+
+        if row["client_account_code"]:
+            by_code[row["client_account_code"]] = row
+
+    for batch in _batched(inserts, batch_size):
+        batch_start = time.perf_counter()
+        db.execute(models.AccountMapping.__table__.insert(), batch)
+        stats.batches.append({"operation": "insert", "rows": len(batch),
+                              "seconds": round(time.perf_counter() - batch_start, 3)})
+
+    changes = [{"id": r["id"], "client_account_code": r["client_account_code"],
+                "description_key": r["description_key"], "standard_account_id": r["standard_account_id"]}
+               for r in updates.values()]
+    for batch in _batched(changes, batch_size):
+        batch_start = time.perf_counter()
+        db.execute(update(models.AccountMapping), batch)
+        stats.batches.append({"operation": "update", "rows": len(batch),
+                              "seconds": round(time.perf_counter() - batch_start, 3)})
+
+    stats.created = len(inserts)
+    stats.updated = len(changes)
+    stats.seconds = round(time.perf_counter() - start, 3)
+    logger.info(f"Upserted mappings for firm {firm_id}: {stats.created} created, "
+                f"{stats.updated} updated in {stats.seconds}s ({len(stats.batches)} batches)")
+    return stats
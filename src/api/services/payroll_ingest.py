@@ -0,0 +1,57 @@
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+import pandas as pd
+
+from src.api.services.transaction_ingest import INGEST_CHUNK_SIZE, IngestError
+
+PAYROLL_REQUIRED_COLUMNS = {'gross_salary', 'inss', 'fgts'}
+
+
+def summarize_payroll(
+    source: BinaryIO,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Streams a Payroll Summary CSV (Folha de Pagamento Sintética) and totals it.
+
+    Expected columns: code, name, gross_salary, inss, fgts, net_pay.
+    ``progress`` receives (rows read, rows with non-numeric totals) after each chunk.
+
+    Raises:
+        IngestError: If the CSV cannot be read or lacks the required columns.
+    """
+    totals = {column: 0.0 for column in PAYROLL_REQUIRED_COLUMNS}
+    details = []
+    rows = errors = 0
+
+    try:
+        for df in pd.read_csv(source, chunksize=chunk_size):
+            df.columns = [str(c).lower().strip() for c in df.columns]
+            if not PAYROLL_REQUIRED_COLUMNS.issubset(set(df.columns)):
+                raise IngestError(f"CSV must contain: {PAYROLL_REQUIRED_COLUMNS}")
+
+            invalid = pd.Series(False, index=df.index)
+            for column in PAYROLL_REQUIRED_COLUMNS:
+                values = pd.to_numeric(df[column], errors='coerce')
+                invalid |= values.isna() & df[column].notna()
+                totals[column] += float(values.sum())
+
+            records = df.astype(object)
+            details.extend(records.where(df.notna(), None).to_dict(orient='records'))
+            rows += len(df)
+            errors += int(invalid.sum())
+            if progress:
+                progress(rows, errors)
+    except IngestError:
+        raise
+    except Exception as e:
+        raise IngestError(f"Error processing file: {str(e)}")
+
+    return {
+        "total_gross": totals['gross_salary'],
+        "total_inss": totals['inss'],
+        "total_fgts": totals['fgts'],
+        "employee_count": rows,
+        "details": details  # Be careful with size here in production
+    }
@@ -0,0 +1,142 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.scripts.docx_generator import generate_audit_report_docx
+from src.scripts.pdf_generator import generate_audit_report
+
+# Rendered reports are written here by the Celery workers and served by the API,
+# so in a multi-container deployment this must be a volume shared by both.
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "auditflow_reports"))
+
+# Part of every key: bump when the report layout changes so cached files are not reused
+REPORT_LAYOUT_VERSION = 1
+
+# A render claimed longer ago than this is assumed lost (worker died) and can be claimed again
+RENDER_CLAIM_SECONDS = 600
+
+REPORT_MEDIA_TYPES = {
+    'pdf': "application/pdf",
+    'docx': "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def report_key(db: Session, engagement: models.Engagement, format: str, report_date: Optional[date] = None) -> str:
+    """
+    Content address of a report: a hash of everything it is rendered from. The
+    transactions only appear through their count (an index-only count; no
+    transaction is read here). Any change (new analysis, edited mistatement,
+    letterhead, reload) gives a new key, and so does the printed report date
+    (today unless given), so a cached report is never served on a later day.
+    Read-only: safe to call from a GET.
+    """
+    results = db.query(models.AnalysisResult.id, models.AnalysisResult.executed_at).filter(
+        models.AnalysisResult.engagement_id == engagement.id
+    ).order_by(models.AnalysisResult.id).all()
+    mistatements = db.query(
+        models.Mistatement.id, models.Mistatement.description, models.Mistatement.amount_divergence,
+        models.Mistatement.type, models.Mistatement.status
+    ).filter(models.Mistatement.engagement_id == engagement.id).order_by(models.Mistatement.id).all()
+    transaction_count = db.query(func.count(models.Transaction.id)).filter(
+        models.Transaction.engagement_id == engagement.id
+    ).scalar()
+
+    inputs = {
+        "layout": REPORT_LAYOUT_VERSION,
+        "date": (report_date or date.today()).isoformat(),
+        "format": format,
+        "engagement": [engagement.id, engagement.name, engagement.year, engagement.client.name,
+                       transaction_count],
+        "letterhead": engagement.client_letterhead_url,
+        "results": [[r.id, r.executed_at.isoformat() if r.executed_at else None] for r in results],
+        "mistatements": [list(m) for m in mistatements],
+    }
+    return hashlib.sha256(json.dumps(inputs, default=str).encode()).hexdigest()
+
+
+def _engagement_dir(engagement_id: int) -> str:
+    return os.path.join(REPORT_CACHE_DIR, f"engagement_{engagement_id}")
+
+
+def cached_report_path(engagement_id: int, key: str, format: str) -> str:
+    return os.path.join(_engagement_dir(engagement_id), f"{key}.{format}")
+
+
+def claim_render(engagement_id: int, key: str, format: str) -> bool:
+    """
+    Marks the report as being rendered. Only the first caller gets True (the
+    marker is created with O_EXCL), so concurrent requests for the same report
+    enqueue a single render and share its task.
+    """
+    marker = cached_report_path(engagement_id, key, format) + ".rendering"
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    try:
+        if time.time() - os.path.getmtime(marker) > RENDER_CLAIM_SECONDS:
+            os.remove(marker)
+    except FileNotFoundError:
+        pass
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def release_render(engagement_id: int, key: str, format: str) -> None:
+    try:
+        os.remove(cached_report_path(engagement_id, key, format) + ".rendering")
+    except FileNotFoundError:
+        pass
+
+
+def render_report(db: Session, engagement_id: int, format: str, key: Optional[str] = None) -> str:
+    """
+    Renders the engagement's report unless it is already cached, and returns the
+    path of the cached file. The file is written under a temporary name and
+    renamed, so readers never see a partial report. Reports of older keys for
+    the same engagement and format are removed.
+    """
+    engagement = db.query(models.Engagement).filter(models.Engagement.id == engagement_id).one()
+    report_date = date.today()
+    current_key = report_key(db, engagement, format, report_date)
+    path = cached_report_path(engagement_id, current_key, format)
+    try:
+        if not os.path.exists(path):
+            results = db.query(models.AnalysisResult).filter(
+                models.AnalysisResult.engagement_id == engagement_id
+            ).order_by(models.AnalysisResult.executed_at.desc()).all()
+            mistatements = db.query(models.Mistatement).filter(models.Mistatement.engagement_id == engagement_id).all()
+            mistatement_summary = {
+                "items": mistatements,
+                "total_adjusted": sum(m.amount_divergence for m in mistatements if m.status == 'adjusted'),
+                "total_unadjusted": sum(m.amount_divergence for m in mistatements if m.status in ['open', 'unadjusted'])
+            }
+            transaction_count = db.query(func.count(models.Transaction.id)).filter(
+                models.Transaction.engagement_id == engagement_id
+            ).scalar()
+
+            generate = generate_audit_report_docx if format == 'docx' else generate_audit_report
+            buffer = generate(engagement, results, mistatement_summary, transaction_count=transaction_count,
+                              report_date=report_date)
+
+            os.makedirs(_engagement_dir(engagement_id), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=_engagement_dir(engagement_id))
+            with os.fdopen(fd, 'wb') as out:
+                out.write(buffer.getvalue())
+            os.replace(tmp_path, path)
+
+        for stale in glob.glob(os.path.join(_engagement_dir(engagement_id), f"*.{format}")):
+            if stale != path:
+                os.remove(stale)
+    finally:
+        release_render(engagement_id, key or current_key, format)
+    return path
@@ -0,0 +1,184 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+# Selection of the sampling points in monetary unit sampling
+MUS_SELECTIONS = ('systematic', 'cell', 'random')
+ALLOCATIONS = ('optimal', 'proportional')
+
+# Strata are int8 labels computed with one comparison per boundary
+MAX_STRATA = 64
+
+
+def resolve_seed(seed: Optional[int] = None) -> int:
+    """
+    The seed a sample is drawn with. A fresh one is generated when none is given
+    and must be stored with the result: the same seed over the same ledger
+    snapshot always selects the same rows.
+    """
+    if seed is None:
+        return int(np.random.SeedSequence().generate_state(1)[0])
+    return int(seed)
+
+
+def sampling_rng(seed: int) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def _amounts(amounts: np.ndarray) -> np.ndarray:
+    """float64 copy of the amount column with NULL (NaN) amounts as 0."""
+    values = np.array(amounts, dtype=np.float64)
+    np.copyto(values, 0.0, where=np.isnan(values))
+    return values
+
+
+def _check_size(size: int) -> None:
+    if size <= 0:
+        raise ValueError("Sample size must be positive")
+
+
+def random_sample(population_size: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Simple random selection without replacement; row positions in ledger order."""
+    _check_size(size)
+    size = min(size, population_size)
+    return np.sort(rng.choice(population_size, size=size, replace=False))
+
+
+def systematic_sample(population_size: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Every (population_size / size)-th row from a random start in the first interval."""
+    _check_size(size)
+    size = min(size, population_size)
+    interval = population_size / size
+    points = rng.uniform(0, interval) + interval * np.arange(size)
+    return np.minimum(points.astype(np.int64), population_size - 1)
+
+
+@dataclass
+class MonetaryUnitSample:
+    indexes: np.ndarray  # Selected row positions, ascending
+    hits: np.ndarray     # Sampling points that fell in each selected row (> 1 only for rows above the interval)
+    interval: float
+    population_value: float
+
+
+def monetary_unit_sample(amounts: np.ndarray, size: int, rng: np.random.Generator,
+                         selection: str = 'systematic') -> MonetaryUnitSample:
+    """
+    Monetary unit (probability proportional to size) sampling over absolute
+    amounts; NULL amounts have no monetary units and are never selected.
+
+    ``size`` sampling points are placed on the cumulative value (one every
+    interval from a random start, one at random in each interval cell, or
+    uniformly at random) and mapped to rows with a binary search.
+    """
+    _check_size(size)
+    if selection not in MUS_SELECTIONS:
+        raise ValueError(f"Unknown selection '{selection}'")
+    values = np.abs(_amounts(amounts))
+    cumulative = np.cumsum(values)
+    total = float(cumulative[-1]) if len(cumulative) else 0.0
+    if total <= 0:
+        raise ValueError("Population has no monetary value to sample")
+
+    interval = total / size
+    if selection == 'systematic':
+        points = rng.uniform(0, interval) + interval * np.arange(size)
+    elif selection == 'cell':
+        points = interval * np.arange(size) + rng.uniform(0, interval, size)
+    else:
+        points = np.sort(rng.uniform(0, total, size))
+
+    rows = np.minimum(np.searchsorted(cumulative, points, side='right'), len(values) - 1)
+    indexes, hits = np.unique(rows, return_counts=True)  # rows is sorted: unique is a linear pass
+    return MonetaryUnitSample(indexes, hits, interval, total)
+
+
+def allocate(size: int, counts: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Splits ``size`` over strata proportionally to ``weights`` (largest remainder),
+    never above a stratum's row count; what a full stratum cannot take goes to
+    the others. Strata with zero weight only receive the surplus once every
+    weighted stratum is full.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    allocated = np.zeros(len(counts), dtype=np.int64)
+    remaining = min(int(size), int(counts.sum()))
+    while remaining > 0:
+        capacity = counts - allocated
+        open_weights = np.where(capacity > 0, weights, 0.0)
+        if open_weights.sum() <= 0:
+            open_weights = capacity.astype(np.float64)
+        quota = remaining * open_weights / open_weights.sum()
+        whole = np.floor(quota).astype(np.int64)
+        add = np.minimum(whole, capacity)
+        if not (whole > capacity).any():
+            # Nothing capped: the units left by rounding down go to the largest remainders
+            candidates = np.flatnonzero(capacity > add)
+            order = candidates[np.argsort(-(quota[candidates] - whole[candidates]), kind='stable')]
+            add[order[:remaining - int(add.sum())]] += 1
+        # Otherwise what the capped strata could not take is split again over the rest
+        allocated += add
+        remaining -= int(add.sum())
+    return allocated
+
+
+@dataclass
+class StratifiedSample:
+    indexes: np.ndarray        # Selected row positions, ascending
+    strata: np.ndarray         # Stratum of each selected row (-1 = certainty stratum)
+    boundaries: np.ndarray     # Lower bounds of strata 1..k on the amount
+    population_counts: np.ndarray
+    sample_counts: np.ndarray
+    certainty_count: int
+
+
+def stratified_sample(amounts: np.ndarray, size: int, rng: np.random.Generator,
+                      boundaries: Sequence[float] = (), allocation: str = 'optimal',
+                      certainty_threshold: Optional[float] = None) -> StratifiedSample:
+    """
+    Stratifies rows by amount (NULL as 0) at ``boundaries`` and draws ``size``
+    rows at random across the strata. Rows at or above ``certainty_threshold``
+    are all selected, outside ``size``.
+
+    'optimal' allocation is Neyman's: each stratum's share is proportional to
+    its row count times the standard deviation of its amounts (bincount over
+    the stratum labels, no per-stratum copies). 'proportional' uses row counts only.
+    """
+    if allocation not in ALLOCATIONS:
+        raise ValueError(f"Unknown allocation '{allocation}'")
+    edges = np.sort(np.asarray(boundaries, dtype=np.float64))
+    k = len(edges) + 1
+    if k > MAX_STRATA:
+        raise ValueError(f"At most {MAX_STRATA - 1} stratum boundaries")
+    values = _amounts(amounts)
+
+    # Stratum k holds the certainty rows, so one bincount covers every stratum
+    strata = np.zeros(len(values), dtype=np.int8)
+    for edge in edges:
+        strata += values >= edge
+    if certainty_threshold is not None:
+        strata[values >= certainty_threshold] = k
+
+    counts = np.bincount(strata, minlength=k + 1)
+    if allocation == 'optimal':
+        sums = np.bincount(strata, weights=values, minlength=k + 1)
+        squares = np.bincount(strata, weights=values * values, minlength=k + 1)
+        safe = np.maximum(counts, 1)
+        deviations = np.sqrt(np.maximum(squares / safe - (sums / safe) ** 2, 0.0))
+        weights = counts * deviations
+    else:
+        weights = counts.astype(np.float64)
+    certainty_count = int(counts[k])
+    counts, weights = counts[:k], weights[:k]
+    sample_counts = allocate(size, counts, weights) if size > 0 else np.zeros(k, dtype=np.int64)
+
+    selected = [np.flatnonzero(strata == k) if certainty_count else np.zeros(0, dtype=np.int64)]
+    for stratum in np.flatnonzero(sample_counts):
+        members = np.flatnonzero(strata == stratum)
+        selected.append(rng.choice(members, size=int(sample_counts[stratum]), replace=False))
+    indexes = np.sort(np.concatenate(selected))
+    labels = strata[indexes].astype(np.int64)
+    labels[labels == k] = -1
+    return StratifiedSample(indexes, labels, edges, counts, sample_counts, certainty_count)
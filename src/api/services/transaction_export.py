@@ -0,0 +1,52 @@
+from typing import Iterator, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.scripts.export_utils import iter_csv, iter_ndjson, iter_xlsx
+
+# Rows fetched (server-side cursor) and encoded per chunk
+EXPORT_CHUNK_ROWS = 5000
+
+# (column header in CSV/XLSX, key in NDJSON, Transaction attribute) — headers as in export_utils.transactions_to_df
+TRANSACTION_EXPORT_COLUMNS = [
+    ('ID', 'id', models.Transaction.id),
+    ('Data', 'date', models.Transaction.date),
+    ('Fornecedor', 'vendor', models.Transaction.vendor),
+    ('Valor', 'amount', models.Transaction.amount),
+    ('Descrição', 'description', models.Transaction.description),
+    ('Conta', 'account_code', models.Transaction.account_code),
+    ('Nome da Conta', 'account_name', models.Transaction.account_name),
+]
+
+EXPORT_MEDIA_TYPES = {
+    'csv': "text/csv",
+    'ndjson': "application/x-ndjson",
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def iter_transaction_rows(db: Session, engagement_id: int, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    """
+    The engagement's transactions as lists of plain tuples, ``chunk_rows`` at a
+    time. ``yield_per`` streams results (a server-side cursor on PostgreSQL), so
+    neither the driver nor the ORM hold more than one chunk.
+    """
+    statement = select(*(column for _, _, column in TRANSACTION_EXPORT_COLUMNS)).where(
+        models.Transaction.engagement_id == engagement_id
+    ).order_by(models.Transaction.id).execution_options(yield_per=chunk_rows)
+
+    for partition in db.execute(statement).partitions():
+        yield [tuple(row) for row in partition]
+
+
+def stream_transactions(db: Session, engagement_id: int, format: str,
+                        chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Encoded export of the engagement's transactions ('csv', 'ndjson' or 'xlsx'), for a StreamingResponse."""
+    chunks = iter_transaction_rows(db, engagement_id, chunk_rows)
+    if format == 'csv':
+        return iter_csv([header for header, _, _ in TRANSACTION_EXPORT_COLUMNS], chunks)
+    if format == 'ndjson':
+        return iter_ndjson([key for _, key, _ in TRANSACTION_EXPORT_COLUMNS], chunks)
+    return iter_xlsx([header for header, _, _ in TRANSACTION_EXPORT_COLUMNS], chunks, sheet_name="Transactions")
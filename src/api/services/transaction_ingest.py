@@ -0,0 +1,222 @@
+import csv
+import io
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.api.services.benford_sketch import update_benford_sketches
+from src.api.services.mapping_resolution import load_mapping_lookup
+from src.api.services.vendor_registry import resolve_vendor_ids
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Rows parsed and inserted per round trip; bounds memory regardless of file size
+INGEST_CHUNK_SIZE = 50000
+
+REQUIRED_COLUMNS = {'vendor', 'amount'}
+
+# First non-empty column wins (same aliases accepted by the row-by-row importer)
+ACCOUNT_CODE_ALIASES = ['account_code', 'conta', 'code']
+ACCOUNT_NAME_ALIASES = ['account_name', 'description', 'descricao']
+
+# Ledgers are exported in the Brazilian day-first layout; ISO dates are read as such
+DATE_FORMAT = '%d/%m/%Y'
+
+INSERT_COLUMNS = ['engagement_id', 'date', 'description', 'vendor', 'amount',
+                  'account_code', 'account_name', 'vendor_id', 'mapping_id', 'standard_account_id']
+
+
+class IngestError(ValueError):
+    """Raised when the file cannot be ingested (unreadable or missing columns)."""
+
+
+@dataclass
+class IngestStats:
+    rows: int = 0
+    # Rows loaded with an amount or date that could not be parsed (stored as NULL)
+    errors: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    # Peak resident memory of the process (not only this import), in MB
+    peak_memory_mb: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _peak_memory_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def read_transaction_chunks(source: BinaryIO, chunk_size: int = INGEST_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Streams a transactions CSV in chunks with normalized (lowercase, stripped) headers.
+
+    Every column is read as text so account codes such as '1.10' keep their
+    formatting; amounts and dates are converted per chunk in ``prepare_chunk``.
+    """
+    try:
+        reader = pd.read_csv(source, dtype=str, chunksize=chunk_size)
+        for chunk in reader:
+            chunk.columns = [str(c).lower().strip() for c in chunk.columns]
+            missing = REQUIRED_COLUMNS - set(chunk.columns)
+            if missing:
+                raise IngestError(f"CSV must contain columns: {REQUIRED_COLUMNS}")
+            yield chunk
+    except IngestError:
+        raise
+    except Exception as e:
+        raise IngestError(f"Error reading CSV: {str(e)}")
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """Strips text and turns blanks into missing values."""
+    series = series.astype(object).where(series.notna(), None)
+    series = series.map(lambda v: v.strip() if isinstance(v, str) else v)
+    return series.where(series != '', None)
+
+
+def _first_present(df: pd.DataFrame, aliases: List[str]) -> pd.Series:
+    result = pd.Series(None, index=df.index, dtype=object)
+    for alias in aliases:
+        if alias in df.columns:
+            result = result.where(result.notna(), _text(df[alias]))
+    return result
+
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    """
+    Parses ISO dates as such and everything else day-first with DATE_FORMAT, so the result
+    does not depend on which value happens to open the chunk; the (rare) values that match
+    neither are re-parsed individually, still day-first, instead of being dropped.
+    """
+    text = _text(series)
+    iso = text.str.match(r'\d{4}-\d{2}-\d{2}', na=False)
+    parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+    if iso.any():
+        parsed[iso] = pd.to_datetime(text[iso], errors='coerce', format='ISO8601')
+    if (~iso).any():
+        parsed[~iso] = pd.to_datetime(text[~iso], errors='coerce', format=DATE_FORMAT)
+    retry = parsed.isna() & text.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(text[retry], errors='coerce', format='mixed', dayfirst=True)
+    return parsed
+
+
+def prepare_chunk(df: pd.DataFrame, engagement_id: int) -> pd.DataFrame:
+    """Converts a raw CSV chunk into transaction columns, vectorized per column."""
+    out = pd.DataFrame(index=df.index)
+    out['engagement_id'] = engagement_id
+    out['date'] = _parse_dates(df['date']) if 'date' in df.columns else pd.NaT
+    out['description'] = _text(df['description']) if 'description' in df.columns else None
+    out['vendor'] = _text(df['vendor'])
+    out['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+    out['account_code'] = _first_present(df, ACCOUNT_CODE_ALIASES)
+    out['account_name'] = _first_present(df, ACCOUNT_NAME_ALIASES)
+    return out
+
+
+def _copy_rows(db: Session, rows: pd.DataFrame) -> None:
+    """Loads rows with PostgreSQL COPY FROM STDIN on the session's connection."""
+    buffer = io.StringIO()
+    rows.to_csv(buffer, header=False, index=False, quoting=csv.QUOTE_MINIMAL,
+                date_format='%Y-%m-%d %H:%M:%S')
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {models.Transaction.__tablename__} ({', '.join(INSERT_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_rows(db: Session, rows: pd.DataFrame) -> None:
+    """Bulk inserts rows with a single executemany (Core, no ORM objects)."""
+    records = rows.astype(object).where(rows.notna(), None).to_dict('records')
+    db.execute(models.Transaction.__table__.insert(), records)
+
+
+def _use_copy(db: Session) -> bool:
+    bind = db.get_bind()
+    return bind.dialect.name == 'postgresql' and bind.dialect.driver == 'psycopg2'
+
+
+def ingest_transactions(
+    db: Session,
+    engagement_id: int,
+    firm_id: int,
+    source: BinaryIO,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    progress: Optional[Callable[[IngestStats], None]] = None
+) -> IngestStats:
+    """
+    Streams a transactions CSV into the engagement.
+
+    Each chunk is parsed with vectorized pandas operations, its vendors are
+    resolved to canonical ids and its accounts to the firm's mappings, it is
+    written with COPY (PostgreSQL/psycopg2) or a Core executemany (SQLite and
+    others) and added to the Benford sketches.
+    The caller commits, so the whole file is loaded atomically. ``progress`` is
+    called with the running stats after every chunk.
+
+    Raises:
+        IngestError: If the CSV cannot be read or lacks the required columns.
+    """
+    stats = IngestStats()
+    start = time.perf_counter()
+    use_copy = _use_copy(db)
+    vendor_ids: Dict[str, Optional[int]] = {}
+    mappings = load_mapping_lookup(db, firm_id)
+
+    for chunk in read_transaction_chunks(source, chunk_size):
+        rows = prepare_chunk(chunk, engagement_id)
+        invalid = chunk['amount'].notna() & rows['amount'].isna()
+        if 'date' in chunk.columns:
+            invalid |= rows['date'].isna() & _text(chunk['date']).notna()
+
+        # Vendors already seen in earlier chunks are not normalized or queried again
+        new_names = [v for v in rows['vendor'].dropna().unique() if v not in vendor_ids]
+        if new_names:
+            vendor_ids.update(zip(new_names, resolve_vendor_ids(db, firm_id, new_names)))
+        rows['vendor_id'] = rows['vendor'].map(vendor_ids).astype('Int64')
+        resolved = mappings.resolve_columns(rows['account_code'], rows['account_name'])
+        rows['mapping_id'] = resolved['mapping_id']
+        rows['standard_account_id'] = resolved['standard_account_id']
+        rows = rows[INSERT_COLUMNS]
+
+        if use_copy:
+            _copy_rows(db, rows)
+        else:
+            _insert_rows(db, rows)
+        update_benford_sketches(db, engagement_id, rows['amount'].to_numpy(), rows['account_code'].to_numpy())
+
+        stats.rows += len(rows)
+        stats.errors += int(invalid.sum())
+        stats.chunks += 1
+        if progress:
+            progress(stats)
+
+    stats.seconds = round(time.perf_counter() - start, 3)
+    stats.rows_per_second = round(stats.rows / stats.seconds, 1) if stats.seconds else float(stats.rows)
+    stats.peak_memory_mb = _peak_memory_mb()
+    logger.info(f"Ingested {stats.rows} transactions into engagement {engagement_id}: "
+                f"{stats.rows_per_second:,.0f} rows/s, peak memory {stats.peak_memory_mb} MB")
+    return stats
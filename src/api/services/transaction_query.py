@@ -0,0 +1,139 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from src.api import models
+
+# Rows per page by default, and the most a client may ask for
+TRANSACTION_PAGE_SIZE = 100
+MAX_TRANSACTION_PAGE_SIZE = 1000
+# Totals up to this are counted exactly; beyond it the planner's estimate is used
+EXACT_COUNT_LIMIT = 10000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a page cursor was not produced by ``encode_cursor``."""
+
+
+@dataclass
+class TransactionFilters:
+    # Prefixes, so the vendor / account_code indexes can serve them
+    vendor: Optional[str] = None
+    account_code: Optional[str] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+    def conditions(self) -> list:
+        t = models.Transaction
+        conditions = []
+        if self.vendor:
+            conditions.append(t.vendor.startswith(self.vendor, autoescape=True))
+        if self.account_code:
+            conditions.append(t.account_code.startswith(self.account_code, autoescape=True))
+        if self.min_amount is not None:
+            conditions.append(t.amount >= self.min_amount)
+        if self.max_amount is not None:
+            conditions.append(t.amount <= self.max_amount)
+        if self.date_from is not None:
+            conditions.append(t.date >= self.date_from)
+        if self.date_to is not None:
+            conditions.append(t.date <= self.date_to)
+        return conditions
+
+
+@dataclass
+class TransactionPage:
+    items: List[models.Transaction]
+    next_cursor: Optional[str]
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+
+def encode_cursor(date: Optional[datetime], transaction_id: int) -> str:
+    """Opaque cursor of the last row of a page: its (date, id) sort key."""
+    payload = json.dumps([date.isoformat() if date else None, transaction_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        date, transaction_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(date) if date else None), int(transaction_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+
+def page_transactions(
+    db: Session,
+    engagement_id: int,
+    filters: Optional[TransactionFilters] = None,
+    cursor: Optional[str] = None,
+    limit: int = TRANSACTION_PAGE_SIZE
+) -> TransactionPage:
+    """
+    One page of the engagement's transactions ordered by (date, id), undated ones
+    last (ordered by id). Keyset pagination: the cursor holds the sort key of the
+    previous page's last row, so every page is an index range scan on
+    (engagement_id, date, id) whatever its depth, unlike OFFSET.
+
+    The total is only computed for the first page (no cursor).
+    """
+    t = models.Transaction
+    filters = filters or TransactionFilters()
+    base = [t.engagement_id == engagement_id] + filters.conditions()
+    after_date, after_id = decode_cursor(cursor) if cursor else (None, None)
+
+    items: List[models.Transaction] = []
+    # Dated rows first, unless the cursor is already past them
+    if cursor is None or after_date is not None:
+        query = db.query(t).filter(*base, t.date.isnot(None))
+        if after_date is not None:
+            query = query.filter(tuple_(t.date, t.id) > tuple_(after_date, after_id))
+        items = query.order_by(t.date, t.id).limit(limit + 1).all()
+
+    # Dated rows exhausted on this page: continue with the undated ones (none when a date filter is set)
+    if len(items) <= limit and filters.date_from is None and filters.date_to is None:
+        query = db.query(t).filter(*base, t.date.is_(None))
+        if cursor is not None and after_date is None:
+            query = query.filter(t.id > after_id)
+        items += query.order_by(t.id).limit(limit + 1 - len(items)).all()
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1].date, items[-1].id) if has_more else None
+
+    page = TransactionPage(items=items, next_cursor=next_cursor)
+    if cursor is None:
+        page.total, page.total_is_estimate = count_transactions(db, base)
+    return page
+
+
+def count_transactions(db: Session, conditions: list) -> Tuple[int, bool]:
+    """
+    (total, is_estimate) of the transactions matching ``conditions``. Counting stops
+    after EXACT_COUNT_LIMIT rows; larger totals come from the PostgreSQL planner's
+    row estimate (EXPLAIN) instead of a full COUNT(*), or are reported as that lower
+    bound on other databases.
+    """
+    t = models.Transaction
+    capped = select(t.id).where(*conditions).limit(EXACT_COUNT_LIMIT + 1).subquery()
+    total = db.execute(select(func.count()).select_from(capped)).scalar()
+    if total <= EXACT_COUNT_LIMIT:
+        return total, False
+
+    if db.get_bind().dialect.name == "postgresql":
+        statement = select(t.id).where(*conditions).compile(dialect=db.get_bind().dialect)
+        params = (tuple(statement.params[name] for name in statement.positiontup)
+                  if statement.positional else statement.params)
+        plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]["Plan"]["Plan Rows"]), EXACT_COUNT_LIMIT + 1), True
+    return EXACT_COUNT_LIMIT + 1, True
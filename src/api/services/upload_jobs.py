@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import time
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+
+# Uploads are written here by the API and read by the Celery workers, so in a
+# multi-container deployment this must be a volume shared by both.
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "auditflow_uploads"))
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Minimum seconds between two progress updates written to the result backend
+PROGRESS_INTERVAL = 1.0
+
+
+def spool_upload(file: UploadFile) -> str:
+    """
+    Copies an upload to the spool directory and returns its path.
+
+    The request only pays for a local file copy; parsing happens in the task.
+    The original extension is kept so the task can pick the right reader.
+    """
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    suffix = os.path.splitext(file.filename or '')[1].lower()
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    with os.fdopen(fd, 'wb') as out:
+        shutil.copyfileobj(file.file, out, COPY_BUFFER_SIZE)
+    return path
+
+
+def remove_spooled(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadProgress:
+    """
+    Publishes the progress of an upload task as its Celery 'PROGRESS' state.
+
+    The fraction done is the read position of the spooled file, so no row count
+    is needed up front. The meta (readable through /engagements/tasks/{task_id}) is:
+    {"stage", "rows", "errors", "fraction", "elapsed_seconds", "eta_seconds"}.
+    """
+
+    def __init__(self, task, source: Optional[BinaryIO] = None, total_bytes: Optional[int] = None):
+        self.task = task
+        self.source = source
+        self.total_bytes = total_bytes
+        self.start = time.monotonic()
+        self._last_update = None
+
+    def meta(self, rows: int = 0, errors: int = 0, stage: str = "loading") -> dict:
+        elapsed = time.monotonic() - self.start
+        fraction = None
+        if self.source is not None and self.total_bytes:
+            fraction = min(self.source.tell() / self.total_bytes, 1.0)
+
+        eta = None
+        if fraction:
+            eta = round(elapsed * (1 - fraction) / fraction, 1)
+
+        return {
+            "stage": stage,
+            "rows": rows,
+            "errors": errors,
+            "fraction": round(fraction, 4) if fraction is not None else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta,
+        }
+
+    def update(self, rows: int = 0, errors: int = 0, stage: str = "loading", force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._last_update is not None and now - self._last_update < PROGRESS_INTERVAL:
+            return
+        self._last_update = now
+
+        # Tasks executed directly (not through a worker) have no id to report on
+        if self.task is None or not self.task.request.id:
+            return
+        self.task.update_state(state="PROGRESS", meta=self.meta(rows, errors, stage))
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.api import models
+from src.scripts.duplicate_analysis import VendorTable, normalize_vendor
+
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _vendor_ids(db: Session, firm_id: int, normalized_names: Sequence[str]) -> Dict[str, int]:
+    ids = {}
+    normalized_names = sorted(normalized_names)
+    for start in range(0, len(normalized_names), LOOKUP_CHUNK_SIZE):
+        ids.update(db.query(models.Vendor.normalized_name, models.Vendor.id).filter(
+            models.Vendor.firm_id == firm_id,
+            models.Vendor.normalized_name.in_(normalized_names[start:start + LOOKUP_CHUNK_SIZE])
+        ).all())
+    return ids
+
+
+def _insert_missing(db: Session, rows: List[dict]) -> None:
+    """
+    INSERT ... ON CONFLICT DO NOTHING on (firm_id, normalized_name): a vendor
+    created meanwhile by a concurrent ingest is kept, not duplicated.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(models.Vendor.__table__).on_conflict_do_nothing(
+        index_elements=['firm_id', 'normalized_name']
+    )
+    for start in range(0, len(rows), LOOKUP_CHUNK_SIZE):
+        db.execute(statement, rows[start:start + LOOKUP_CHUNK_SIZE])
+
+
+def resolve_vendor_ids(db: Session, firm_id: int, vendor_names: Sequence[Optional[str]]) -> List[Optional[int]]:
+    """
+    Maps vendor names to the firm's canonical vendor ids, creating missing vendors.
+
+    Normalization runs once per distinct name, so a ledger with millions of rows
+    but thousands of vendors costs thousands of normalizations and a few queries.
+    Missing vendors are inserted with ON CONFLICT DO NOTHING and selected again,
+    so concurrent ingests of the same firm end up with the same ids.
+    """
+    normalized_by_name = {name: normalize_vendor(name) for name in set(vendor_names) if name}
+    ids = _vendor_ids(db, firm_id, {n for n in normalized_by_name.values() if n})
+
+    new_vendors = {}
+    for name, normalized in normalized_by_name.items():
+        if normalized and normalized not in ids and normalized not in new_vendors:
+            new_vendors[normalized] = {"firm_id": firm_id, "normalized_name": normalized, "name": name}
+    if new_vendors:
+        _insert_missing(db, list(new_vendors.values()))
+        ids.update(_vendor_ids(db, firm_id, new_vendors))
+
+    return [ids.get(normalized_by_name.get(name)) if name else None for name in vendor_names]
+
+
+def load_vendor_table(db: Session, firm_id: int) -> VendorTable:
+    """Builds a VendorTable seeded with the firm's persisted vendor ids."""
+    rows = db.query(models.Vendor.normalized_name, models.Vendor.id).filter(models.Vendor.firm_id == firm_id).all()
+    return VendorTable(known_ids={normalized: vendor_id for normalized, vendor_id in rows})
@@ -1,22 +1,53 @@
+import os
+
+from celery import chord
+from fastapi import HTTPException
+
 from src.api.celery_app import celery_app
 from src.api.database import SessionLocal
 from src.api import models
-from src.scripts.benford_analysis import calculate_benford
-from src.scripts.duplicate_analysis import find_duplicates
+from src.scripts.benford_analysis import calculate_benford_from_counts
+from src.api.services.benford_sketch import get_benford_counts
+from src.api.services.vendor_registry import load_vendor_table
+from src.api.services.transaction_ingest import ingest_transactions, IngestError
+from src.api.services.payroll_ingest import summarize_payroll
+from src.api.services.ingestion import TrialBalanceIngestion
+from src.api.services.upload_jobs import UploadProgress, remove_spooled
+from src.api.services.ledger_snapshot import snapshot_frame, write_snapshot
+from src.api.services.mapping_resolution import load_mapping_lookup, resolve_firm_mappings
+from src.api.services.balance_cache import refresh_balances
+from src.api.services.mapping_suggestions import suggest_mappings
+from src.api.services.report_cache import render_report
+from src.scripts.duplicate_analysis import (
+    find_duplicates, find_near_duplicates, AMOUNT_TOLERANCE, AMOUNT_TOLERANCE_PCT, DATE_WINDOW_DAYS,
+    DUPLICATE_WORKERS, SHARDS_PER_WORKER, SIMILARITY_THRESHOLD, duplicate_buckets, match_shard, number_groups,
+    shard_buckets, should_parallelize
+)
+
+def snapshot_transactions(ledger) -> list:
+    """Converts snapshot columns to the transaction dicts used by the analytics scripts."""
+    dates = ledger['date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        {"id": int(i), "vendor": v, "amount": None if a != a else float(a), "date": None if d != d else d}
+        for i, v, a, d in zip(ledger['id'], ledger['vendor'], ledger['amount'], dates)
+    ]
 
 @celery_app.task
-def task_run_benford(engagement_id: int, user_id: int):
+def task_run_benford(engagement_id: int, user_id: int, account_code: str = None):
     db = SessionLocal()
     try:
         engagement = db.query(models.Engagement).filter(models.Engagement.id == engagement_id).first()
         if not engagement:
             return {"error": "Engagement not found"}
 
-        values = [t.amount for t in engagement.transactions if t.amount is not None]
-        if not values:
+        # Served from the incrementally maintained digit-count sketches
+        counts = get_benford_counts(db, [engagement.id], [account_code] if account_code else None)
+        if sum(counts["first_digit"]) == 0:
              return {"error": "No transactions"}
 
-        result = calculate_benford(values)
+        result = calculate_benford_from_counts(counts)
+        if account_code:
+            result["account_code"] = account_code
 
         db_result = models.AnalysisResult(
             engagement_id=engagement.id,
@@ -31,30 +62,212 @@ def task_run_benford(engagement_id: int, user_id: int):
     finally:
         db.close()
 
-@celery_app.task
-def task_run_duplicates(engagement_id: int, user_id: int):
+def _save_duplicates(db, engagement_id: int, user_id: int, test_type: str, result: list, parameters: dict) -> dict:
+    db_result = models.AnalysisResult(
+        engagement_id=engagement_id,
+        test_type=test_type,
+        result={"duplicates": result, "parameters": parameters},
+        executed_by_user_id=user_id
+    )
+    db.add(db_result)
+    db.commit()
+    db.refresh(db_result)
+    return {"status": "completed", "result_id": db_result.id}
+
+@celery_app.task(bind=True)
+def task_run_duplicates(self, engagement_id: int, user_id: int, mode: str = "exact",
+                        amount_tolerance: float = AMOUNT_TOLERANCE,
+                        amount_tolerance_pct: float = AMOUNT_TOLERANCE_PCT):
     db = SessionLocal()
     try:
         engagement = db.query(models.Engagement).filter(models.Engagement.id == engagement_id).first()
         if not engagement:
              return {"error": "Engagement not found"}
 
-        transactions_dicts = [
-            {"id": t.id, "vendor": t.vendor, "amount": t.amount, "date": str(t.date) if t.date else None}
-            for t in engagement.transactions
-        ]
+        # Read from the engagement's columnar snapshot instead of loading ORM rows
+        ledger = snapshot_frame(db, engagement.id, ['id', 'vendor', 'amount', 'date'])
+        db.commit()  # Persists the catalog row if the snapshot had to be (re)built
+        transactions_dicts = snapshot_transactions(ledger)
+
+        # Reuse the firm's canonical vendor ids so signatures are stable across runs
+        vendor_table = load_vendor_table(db, engagement.client.firm_id)
+        if mode == "near":
+            result = find_near_duplicates(
+                transactions_dicts,
+                amount_tolerance=amount_tolerance,
+                amount_tolerance_pct=amount_tolerance_pct,
+                vendor_table=vendor_table
+            )
+            parameters = {"amount_tolerance": amount_tolerance, "amount_tolerance_pct": amount_tolerance_pct}
+            return _save_duplicates(db, engagement.id, user_id, "near_duplicates", result, parameters)
+
+        buckets = duplicate_buckets(transactions_dicts)
+        if should_parallelize(buckets, DUPLICATE_WORKERS):
+            # Prefork children are daemonic and cannot start a process pool: the shards
+            # run as sub-tasks on the worker pool instead. The chord callback inherits
+            # this task's id, so clients keep polling the id they were given.
+            shards = shard_buckets(buckets, DUPLICATE_WORKERS * SHARDS_PER_WORKER)
+            known_ids = vendor_table.known_ids()
+            return self.replace(chord(
+                [task_match_duplicate_shard.s(shard, known_ids) for shard in shards],
+                task_save_duplicate_shards.s(engagement.id, user_id)
+            ))
+
+        result = find_duplicates(transactions_dicts, vendor_table=vendor_table)
+        return _save_duplicates(db, engagement.id, user_id, "duplicates", result, {})
+    finally:
+        db.close()
+
+@celery_app.task
+def task_match_duplicate_shard(shard: list, known_ids: dict):
+    return match_shard(shard, SIMILARITY_THRESHOLD, DATE_WINDOW_DAYS, known_ids)
+
+@celery_app.task
+def task_save_duplicate_shards(shard_results: list, engagement_id: int, user_id: int):
+    db = SessionLocal()
+    try:
+        result = number_groups(shard_results, SIMILARITY_THRESHOLD)
+        return _save_duplicates(db, engagement_id, user_id, "duplicates", result, {})
+    finally:
+        db.close()
+
+
+# Upload tasks read a file spooled by the API (services.upload_jobs), publish
+# PROGRESS updates while parsing and always delete the file when done.
+
+@celery_app.task(bind=True)
+def task_ingest_transactions(self, engagement_id: int, firm_id: int, path: str):
+    db = SessionLocal()
+    try:
+        with open(path, 'rb') as source:
+            progress = UploadProgress(self, source, os.path.getsize(path))
+            try:
+                stats = ingest_transactions(
+                    db, engagement_id, firm_id, source,
+                    progress=lambda s: progress.update(s.rows, s.errors)
+                )
+            except IngestError as e:
+                db.rollback()
+                return {"error": str(e)}
+            refresh_balances(db, engagement_id)
+            progress.update(stats.rows, stats.errors, stage="committing", force=True)
+            db.commit()
 
-        result = find_duplicates(transactions_dicts)
+        progress.update(stats.rows, stats.errors, stage="snapshot", force=True)
+        write_snapshot(db, engagement_id)
+        db.commit()
+        return {
+            "status": "completed",
+            "message": f"Successfully imported {stats.rows} transactions.",
+            "stats": stats.to_dict()
+        }
+    finally:
+        db.close()
+        remove_spooled(path)
 
+@celery_app.task(bind=True)
+def task_ingest_payroll(self, engagement_id: int, user_id: int, path: str):
+    db = SessionLocal()
+    try:
+        with open(path, 'rb') as source:
+            progress = UploadProgress(self, source, os.path.getsize(path))
+            try:
+                summary = summarize_payroll(source, progress=progress.update)
+            except IngestError as e:
+                return {"error": str(e)}
+
+        # Save as a raw payroll upload result
         db_result = models.AnalysisResult(
-            engagement_id=engagement.id,
-            test_type="duplicates",
-            result={"duplicates": result},
+            engagement_id=engagement_id,
+            test_type="payroll_upload",
+            result=summary,
             executed_by_user_id=user_id
         )
         db.add(db_result)
         db.commit()
         db.refresh(db_result)
-        return {"status": "completed", "result_id": db_result.id}
+        return {"status": "completed", "result_id": db_result.id, "employee_count": summary["employee_count"]}
+    finally:
+        db.close()
+        remove_spooled(path)
+
+@celery_app.task(bind=True)
+def task_find_unmapped_accounts(self, firm_id: int, path: str, filename: str):
+    db = SessionLocal()
+    try:
+        progress = UploadProgress(self)
+        progress.update(stage="parsing", force=True)
+        try:
+            df = TrialBalanceIngestion.read_path(path, filename)
+            result = TrialBalanceIngestion.validate_and_parse(df)
+        except HTTPException as e:
+            return {"error": e.detail}
+
+        if not result["valid"]:
+            return {"error": f"Invalid file structure: {', '.join(result['errors'])}"}
+
+        # Note: validate_and_parse returns descriptions list in unique_accounts.
+        # Descriptions are matched by normalized key, so mappings made for any client apply
+        lookup = load_mapping_lookup(db, firm_id)
+        unmapped, auto_mapped = [], {}
+        for acc in result["unique_accounts"]:
+            standard_account_id = lookup.resolve(None, acc)[1]
+            if standard_account_id is None:
+                unmapped.append(acc)
+            else:
+                auto_mapped[acc] = standard_account_id
+        # Ranked standard account candidates for each unmapped description
+        suggestions = suggest_mappings(db, firm_id, unmapped)
+        return {"status": "completed", "unmapped": unmapped, "suggestions": suggestions, "auto_mapped": auto_mapped}
+    finally:
+        db.close()
+        remove_spooled(path)
+
+@celery_app.task(bind=True)
+def task_preview_financial_file(self, engagement_id: int, path: str, filename: str):
+    try:
+        with open(path, 'rb') as source:
+            progress = UploadProgress(self, source, os.path.getsize(path))
+            try:
+                result = TrialBalanceIngestion.preview(source, filename, progress=progress.update)
+            except HTTPException as e:
+                return {"error": e.detail}
+            except Exception as e:
+                return {"error": f"Error parsing file: {str(e)}"}
+        return {
+            "status": "completed",
+            "engagement_id": engagement_id,
+            "filename": filename,
+            **result,
+            "message": "File parsed successfully. Please map the columns."
+        }
+    finally:
+        remove_spooled(path)
+
+@celery_app.task
+def task_resolve_mappings(firm_id: int):
+    """
+    Re-resolves the stored mapping of the firm's transactions after its mappings
+    changed, and recomputes the balances of the engagements affected.
+    """
+    db = SessionLocal()
+    try:
+        updated = resolve_firm_mappings(db, firm_id, on_change=lambda engagement_id: refresh_balances(db, engagement_id))
+        db.commit()
+        return {"status": "completed", "updated_accounts": updated}
+    finally:
+        db.close()
+
+
+@celery_app.task
+def task_render_report(engagement_id: int, format: str, key: str):
+    """
+    Renders an audit report into the report cache. Enqueued with task id
+    "report-<key>", so every request waiting for the same report polls this task.
+    """
+    db = SessionLocal()
+    try:
+        path = render_report(db, engagement_id, format, key)
+        return {"status": "completed", "key": os.path.splitext(os.path.basename(path))[0]}
     finally:
         db.close()
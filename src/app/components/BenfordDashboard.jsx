@@ -17,6 +17,7 @@ import FinancialImport from '../pages/FinancialImport';
 
 const BenfordDashboard = ({ engagement, client }) => {
   const [transactions, setTransactions] = useState([]);
+  const [transactionTotal, setTransactionTotal] = useState({ count: 0, estimate: false });
   const [result, setResult] = useState(null);
   const [history, setHistory] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -36,7 +37,8 @@ const BenfordDashboard = ({ engagement, client }) => {
     setLoading(true);
     try {
       const data = await getTransactions(engagement.id);
-      setTransactions(data);
+      setTransactions(data.items);
+      setTransactionTotal({ count: data.total ?? data.items.length, estimate: data.total_is_estimate });
     } catch (err) {
       console.error(err);
       setError("Falha ao carregar transações.");
@@ -286,7 +288,7 @@ const BenfordDashboard = ({ engagement, client }) => {
                 <div className="flex justify-between items-center mb-4">
                   <h2 className="text-xl font-semibold text-slate-700">Dados da Auditoria</h2>
                   <div className="flex items-center space-x-4">
-                    <span className="text-sm text-slate-500">{transactions.length} transações</span>
+                    <span className="text-sm text-slate-500">{transactionTotal.count}{transactionTotal.estimate ? '+' : ''} transações</span>
                     {transactions.length > 0 && (
                       <>
                         <button
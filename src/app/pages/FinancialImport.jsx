@@ -3,6 +3,7 @@ import React, { useState } from 'react';
 import { useDropzone } from 'react-dropzone';
 import { Upload, FileSpreadsheet, CheckCircle, AlertTriangle, ArrowRight } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
+import { pollUpload } from '../services/clientService';
 
 const FinancialImport = ({ engagementId }) => {
     const { user } = useAuth();
@@ -54,7 +55,8 @@ const FinancialImport = ({ engagementId }) => {
                 throw new Error(err.detail || 'Upload failed');
             }
 
-            const data = await response.json();
+            const { task_id } = await response.json();
+            const data = await pollUpload(task_id); // Parsed in the background
             setPreview(data);
         } catch (err) {
             console.error(err);
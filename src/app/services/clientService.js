@@ -47,8 +47,10 @@ export const createEngagement = async (clientId, name, year) => {
     return response.json();
 };
 
-export const getTransactions = async (engagementId) => {
-    const response = await fetch(`${API_URL}/engagements/${engagementId}/transactions`, {
+// One page ({ items, next_cursor, total }); pass next_cursor as params.cursor for the next one
+export const getTransactions = async (engagementId, params = {}) => {
+    const query = new URLSearchParams(Object.entries(params).filter(([, v]) => v !== undefined && v !== null && v !== ''));
+    const response = await fetch(`${API_URL}/engagements/${engagementId}/transactions?${query}`, {
         headers: getHeaders(),
     });
     if (!response.ok) throw new Error('Failed to fetch transactions');
@@ -68,7 +70,8 @@ export const uploadTransactionFile = async (engagementId, file) => {
         const err = await response.json();
         throw new Error(err.detail || 'Failed to upload file');
     }
-    return response.json();
+    const { task_id } = await response.json(); // Parsed and loaded in the background
+    return pollUpload(task_id);
 };
 
 export const uploadLetterhead = async (engagementId, file) => {
@@ -119,6 +122,13 @@ export const pollTask = async (taskId, interval = 2000, timeout = 60000) => {
     throw new Error('Analysis timed out');
 };
 
+// Upload tasks report { error } for invalid files and may run for several minutes
+export const pollUpload = async (taskId, interval = 2000, timeout = 30 * 60 * 1000) => {
+    const result = await pollTask(taskId, interval, timeout);
+    if (result && result.error) throw new Error(result.error);
+    return result;
+};
+
 export const getAnalysisResults = async (engagementId) => {
     const response = await fetch(`${API_URL}/engagements/${engagementId}/results`, {
         headers: getHeaders(),
@@ -128,10 +138,17 @@ export const getAnalysisResults = async (engagementId) => {
 };
 
 export const downloadReport = async (engagementId, engagementName, format = 'pdf') => {
-    const response = await fetch(`${API_URL}/engagements/${engagementId}/report?format=${format}`, {
+    const fetchReport = () => fetch(`${API_URL}/engagements/${engagementId}/report?format=${format}`, {
         headers: getHeaders(),
     });
-    if (!response.ok) throw new Error('Failed to download report');
+    let response = await fetchReport();
+    // 202: not rendered yet; wait for the render task, then the report is served from cache
+    if (response.status === 202) {
+        const { task_id } = await response.json();
+        await pollTask(task_id, 1000, 5 * 60 * 1000);
+        response = await fetchReport();
+    }
+    if (!response.ok || response.status === 202) throw new Error('Failed to download report');
 
     // Create blob and download link
     const blob = await response.blob();
@@ -301,6 +318,26 @@ export const runStratifiedSampling = async (engagementId, threshold, sampleSizeB
     return response.json();
 };
 
+export const runSystematicSampling = async (engagementId, sampleSize, seed) => {
+    const response = await fetch(`${API_URL}/engagements/${engagementId}/sampling/systematic`, {
+        method: 'POST',
+        headers: getHeaders(),
+        body: JSON.stringify({ sample_size: sampleSize, seed }),
+    });
+    if (!response.ok) throw new Error('Failed to run systematic sampling');
+    return response.json();
+};
+
+export const runMonetaryUnitSampling = async (engagementId, sampleSize, selection = 'systematic', seed) => {
+    const response = await fetch(`${API_URL}/engagements/${engagementId}/sampling/mus`, {
+        method: 'POST',
+        headers: getHeaders(),
+        body: JSON.stringify({ sample_size: sampleSize, selection, seed }),
+    });
+    if (!response.ok) throw new Error('Failed to run monetary unit sampling');
+    return response.json();
+};
+
 export const uploadPayroll = async (engagementId, file) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -314,7 +351,8 @@ export const uploadPayroll = async (engagementId, file) => {
         const err = await response.json();
         throw new Error(err.detail || 'Failed to upload payroll');
     }
-    return response.json();
+    const { task_id } = await response.json();
+    return pollUpload(task_id);
 };
 
 export const runPayrollReconciliation = async (engagementId) => {
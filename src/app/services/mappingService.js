@@ -1,3 +1,5 @@
+import { pollUpload } from './clientService';
+
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 const getHeaders = (isMultipart = false) => {
@@ -61,7 +63,9 @@ export const uploadTrialBalanceForMapping = async (file) => {
         const err = await response.json();
         throw new Error(err.detail || 'Failed to analyze file');
     }
-    return response.json(); // Returns list of unmapped strings (legacy) or full data
+    const { task_id } = await response.json();
+    const result = await pollUpload(task_id);
+    return result.unmapped; // List of unmapped account descriptions
 };
 
 export const saveMappings = async (mappings) => {
@@ -1,79 +1,291 @@
 import math
 
-def calculate_benford(values: list[float]) -> dict[str, dict[int, float] | list[int]]:
+import numpy as np
+
+# Two-tailed 5% critical value of the per-digit Z statistic.
+Z_CRITICAL = 1.96
+
+# Chi-square 5% critical values keyed by degrees of freedom (digits - 1).
+CHI_SQUARE_CRITICAL = {8: 15.507, 9: 16.919, 89: 112.022, 99: 123.225}
+
+FIRST_DIGITS = list(range(1, 10))
+SECOND_DIGITS = list(range(0, 10))
+FIRST_TWO_DIGITS = list(range(10, 100))
+LAST_TWO_DIGITS = list(range(0, 100))
+
+# Benford probabilities (Nigrini, "Benford's Law", 2012)
+EXPECTED_FIRST_DIGIT: dict[int, float] = {d: math.log10(1 + 1 / d) for d in FIRST_DIGITS}
+EXPECTED_FIRST_TWO_DIGITS: dict[int, float] = {d: math.log10(1 + 1 / d) for d in FIRST_TWO_DIGITS}
+EXPECTED_SECOND_DIGIT: dict[int, float] = {
+    d2: sum(math.log10(1 + 1 / (10 * d1 + d2)) for d1 in FIRST_DIGITS) for d2 in SECOND_DIGITS
+}
+# The last-two digit test only uses amounts with at least three integer digits,
+# so it does not overlap the first-two digit test; reported as 'min_amount'
+LAST_TWO_DIGITS_MIN_AMOUNT = 100
+
+# Last two digits are expected to be uniformly distributed (00-99)
+EXPECTED_LAST_TWO_DIGITS: dict[int, float] = {d: 0.01 for d in LAST_TWO_DIGITS}
+
+# Test name -> (digit domain, expected probabilities, Nigrini MAD conformity ranges)
+BENFORD_TESTS = {
+    "first_digit": (FIRST_DIGITS, EXPECTED_FIRST_DIGIT, (0.006, 0.012, 0.015)),
+    "first_two_digits": (FIRST_TWO_DIGITS, EXPECTED_FIRST_TWO_DIGITS, (0.0012, 0.0018, 0.0022)),
+    "second_digit": (SECOND_DIGITS, EXPECTED_SECOND_DIGIT, (0.008, 0.010, 0.012)),
+    "last_two_digits": (LAST_TWO_DIGITS, EXPECTED_LAST_TWO_DIGITS, None),
+}
+
+# Report labels of the conformity returned by ``conformity_statistics``
+MAD_CONFORMITY_LABELS = {
+    'close': 'Conformidade próxima',
+    'acceptable': 'Conformidade aceitável',
+    'marginal': 'Conformidade marginal',
+    'nonconformity': 'Não conformidade'
+}
+
+
+def extract_digits(values) -> dict[str, np.ndarray]:
     """
-    Calculates Benford's Law statistics for a list of monetary values.
+    Extracts the digits used by every Benford test in a single vectorized pass.
+
+    Leading digits are derived arithmetically from the significand
+    (x / 10 ** floor(log10(x))) instead of string manipulation. Zeros,
+    NaN and infinite values are discarded and negatives use their absolute value.
 
     Args:
-        values: A list of float values representing monetary amounts.
+        values: Any sequence (or NumPy array) of monetary amounts.
+
+    Returns:
+        A dictionary of integer arrays:
+        - 'first_digit': first significant digit (1-9) of every valid value.
+        - 'first_two_digits': first two digits (10-99) of values >= 10.
+        - 'second_digit': second digit (0-9) of values >= 10.
+        - 'last_two_digits': last two digits of the integer part (00-99) of values
+          >= LAST_TWO_DIGITS_MIN_AMOUNT (100).
+    """
+    amounts = np.abs(np.asarray(values, dtype=np.float64).ravel())
+    amounts = amounts[np.isfinite(amounts) & (amounts > 0)]
+
+    exponent = np.floor(np.log10(amounts))
+    # Rounding absorbs binary representation error (e.g. 0.3 / 0.1 == 2.9999999999999996)
+    significand = np.round(amounts / 10.0 ** exponent, 9)
+    carry = significand >= 10
+    significand[carry] /= 10
+
+    first_two = np.floor(np.round(significand * 10, 6)).astype(np.int64)
+    first = first_two // 10
+
+    # Nigrini restricts the first-two and second digit tests to amounts >= 10; the
+    # last-two digit test needs a third integer digit so it does not overlap them
+    two_or_more = amounts >= 10
+    integer_part = np.floor(np.round(amounts[amounts >= LAST_TWO_DIGITS_MIN_AMOUNT], 2))
+
+    return {
+        "first_digit": first,
+        "first_two_digits": first_two[two_or_more],
+        "second_digit": first_two[two_or_more] % 10,
+        "last_two_digits": (integer_part % 100).astype(np.int64),
+    }
+
+
+def count_digits(digits: np.ndarray, domain: list[int]) -> np.ndarray:
+    """Counts occurrences of each digit in ``domain`` (a contiguous range)."""
+    counts = np.bincount(digits, minlength=domain[-1] + 1)
+    return counts[domain[0]:domain[-1] + 1]
+
+
+def benford_counts(values) -> dict[str, list[int]]:
+    """
+    Counts digit occurrences for every Benford test.
+
+    This is the only step that touches the raw values. Counts are additive, so
+    large populations can be processed in chunks and summed, and every statistic
+    can later be recomputed from these vectors alone.
+
+    Returns:
+        A dictionary keyed by test name ('first_digit', 'first_two_digits',
+        'second_digit', 'last_two_digits') with the count of each digit, in
+        ascending digit order (9, 90, 10 and 100 elements respectively).
+    """
+    digits = extract_digits(values)
+    return {
+        name: count_digits(digits[name], domain).tolist()
+        for name, (domain, _, _) in BENFORD_TESTS.items()
+    }
+
+
+def merge_benford_counts(*counts: dict[str, list[int]]) -> dict[str, list[int]]:
+    """
+    Merges digit count vectors (e.g. from several accounts, periods or clients).
+
+    Returns zero vectors when nothing is given.
+    """
+    merged = {name: [0] * len(domain) for name, (domain, _, _) in BENFORD_TESTS.items()}
+    for vectors in counts:
+        for name, vector in vectors.items():
+            merged[name] = [a + int(b) for a, b in zip(merged[name], vector)]
+    return merged
+
+
+def _mad_conformity(mad: float, thresholds) -> str | None:
+    """Classifies a MAD value using Nigrini's conformity ranges."""
+    if thresholds is None:
+        return None
+    close, acceptable, marginal = thresholds
+    if mad <= close:
+        return "close"
+    if mad <= acceptable:
+        return "acceptable"
+    if mad <= marginal:
+        return "marginal"
+    return "nonconformity"
+
+
+def conformity_statistics(counts, expected: dict[int, float], mad_thresholds=None) -> dict:
+    """
+    Computes the conformity statistics of one digit test from its count vector.
+
+    Args:
+        counts: Count of each digit, in the same order as ``expected``.
+        expected: Expected Benford probability of each digit.
+        mad_thresholds: Nigrini (close, acceptable, marginal) MAD upper limits,
+                        or None when the test has no published ranges.
 
     Returns:
         A dictionary containing:
-        - 'expected': Dictionary of expected frequencies (key: digit 1-9, value: probability).
-        - 'observed': Dictionary of observed frequencies (key: digit 1-9, value: probability).
-        - 'anomalies': List of digits where the absolute difference between observed and expected
-                       frequency is greater than 5% (0.05).
+        - 'mad': Mean absolute deviation between observed and expected proportions.
+        - 'conformity': Nigrini MAD classification (or None).
+        - 'chi_square' / 'chi_square_critical': Statistic and 5% critical value.
+        - 'ks' / 'ks_critical': Kolmogorov-Smirnov statistic and 5% critical value.
+        - 'z_stats': Per-digit Z statistic (with continuity correction).
     """
+    counts = np.asarray(counts, dtype=np.float64)
+    digits = list(expected.keys())
+    expected_p = np.array([expected[d] for d in digits])
+    total_count = counts.sum()
 
-    # 1. Calculate Expected Frequencies
-    expected: dict[int, float] = {d: math.log10(1 + 1/d) for d in range(1, 10)}
-
-    # 2. Process Values to Extract First Digits
-    first_digits: list[int] = []
-    for v in values:
-        if v == 0:
-            continue
-        try:
-            # Handle negatives by taking abs, and handle floats strictly
-            val_abs = abs(v)
-            if val_abs == 0:
-                continue
-
-            # Convert to string to easily get first digit, handling scientific notation if needed
-            # Or use math: first_digit = int(str(val_abs).replace('.', '').lstrip('0')[0])
-            # A more robust math way:
-            # 10 ** (int(math.log10(val_abs))) -> magnitude
-            # val_abs // magnitude -> first digit
-            # But string manipulation is often safer for edge cases in simple scripts unless performance is critical
-
-            s = str(val_abs)
-            # Remove decimal point
-            s = s.replace('.', '')
-            # Strip leading zeros (for numbers < 1)
-            s = s.lstrip('0')
-
-            if not s:
-                continue
-
-            digit = int(s[0])
-            if 1 <= digit <= 9:
-                first_digits.append(digit)
-
-        except (ValueError, IndexError):
-            continue
-
-    total_count = len(first_digits)
-
-    # 3. Calculate Observed Frequencies
-    observed: dict[int, float] = {d: 0.0 for d in range(1, 10)}
-    if total_count > 0:
-        for d in first_digits:
-            observed[d] += 1
+    if total_count == 0:
+        return {
+            "mad": 0.0,
+            "conformity": None,
+            "chi_square": 0.0,
+            "chi_square_critical": CHI_SQUARE_CRITICAL[len(digits) - 1],
+            "ks": 0.0,
+            "ks_critical": 0.0,
+            "z_stats": {d: 0.0 for d in digits},
+        }
 
-        for d in observed:
-            observed[d] /= total_count
+    observed_p = counts / total_count
+    abs_diff = np.abs(observed_p - expected_p)
+
+    mad = float(abs_diff.mean())
+    chi_square = float((((counts - total_count * expected_p) ** 2) / (total_count * expected_p)).sum())
+    ks = float(np.abs(np.cumsum(observed_p) - np.cumsum(expected_p)).max())
+
+    correction = 1 / (2 * total_count)
+    numerator = np.where(abs_diff > correction, abs_diff - correction, abs_diff)
+    z_stats = numerator / np.sqrt(expected_p * (1 - expected_p) / total_count)
+
+    return {
+        "mad": mad,
+        "conformity": _mad_conformity(mad, mad_thresholds),
+        "chi_square": chi_square,
+        "chi_square_critical": CHI_SQUARE_CRITICAL[len(digits) - 1],
+        "ks": ks,
+        "ks_critical": 1.36 / math.sqrt(total_count),
+        "z_stats": {d: float(z) for d, z in zip(digits, z_stats)},
+    }
+
+
+def _digit_test(counts, expected: dict[int, float], mad_thresholds=None) -> dict:
+    """Builds the expected/observed/anomalies/details structure from a count vector."""
+    digits = list(expected.keys())
+    total_count = int(sum(counts))
+    statistics = conformity_statistics(counts, expected, mad_thresholds)
+    z_stats = statistics.pop("z_stats")
+
+    observed: dict[int, float] = {d: 0.0 for d in digits}
+    if total_count > 0:
+        for d, c in zip(digits, counts):
+            observed[d] = int(c) / total_count
 
-    # 4. Detect Anomalies
     anomalies: list[int] = []
-    for d in range(1, 10):
-        diff = abs(observed[d] - expected[d])
-        if diff > 0.05:
+    details: list[dict] = []
+    for d, c in zip(digits, counts):
+        z_stat = z_stats[d]
+        is_anomaly = z_stat > Z_CRITICAL
+        if is_anomaly:
             anomalies.append(d)
+        details.append({
+            "digit": d,
+            "count": int(c),
+            "expected": expected[d],
+            "observed": observed[d],
+            "deviation": abs(observed[d] - expected[d]),
+            "z_stat": z_stat,
+            "is_anomaly": is_anomaly,
+        })
 
     return {
-        "expected": expected,
+        "expected": dict(expected),
         "observed": observed,
-        "anomalies": anomalies
-                }
-            
+        "anomalies": anomalies,
+        "details": details,
+        "sample_size": total_count,
+        "statistics": statistics,
+    }
 
+
+def calculate_benford_from_counts(counts: dict[str, list[int]]) -> dict:
+    """
+    Builds the full Benford result from count vectors (see ``benford_counts``).
+
+    Used by reports and cached results to recompute every statistic without
+    rescanning the transactions. Tests missing from ``counts`` are skipped.
+    """
+    first_digit = counts.get("first_digit") or [0] * len(FIRST_DIGITS)
+    if sum(first_digit) == 0:
+        return {
+            "expected_frequencies": {},
+            "observed_frequencies": {},
+            "anomalies": [],
+            "details": [],
+            "sample_size": 0
+        }
+
+    domain, expected, thresholds = BENFORD_TESTS["first_digit"]
+    result = _digit_test(first_digit, expected, thresholds)
+    result["expected_frequencies"] = result["expected"]
+    result["observed_frequencies"] = result["observed"]
+    result["counts"] = {name: [int(c) for c in vector] for name, vector in counts.items()}
+    result["tests"] = {
+        name: _digit_test(counts[name], expected, thresholds)
+        for name, (domain, expected, thresholds) in BENFORD_TESTS.items()
+        if name != "first_digit" and name in counts
+    }
+    if "last_two_digits" in result["tests"]:
+        result["tests"]["last_two_digits"]["min_amount"] = LAST_TWO_DIGITS_MIN_AMOUNT
+    return result
+
+
+def calculate_benford(values) -> dict:
+    """
+    Calculates Benford's Law statistics for a list of monetary values.
+
+    Args:
+        values: A list (or NumPy array) of float values representing monetary amounts.
+
+    Returns:
+        A dictionary containing:
+        - 'expected': Dictionary of expected frequencies (key: digit 1-9, value: probability).
+        - 'observed': Dictionary of observed frequencies (key: digit 1-9, value: probability).
+        - 'anomalies': List of digits whose Z statistic exceeds the 5% critical value (1.96).
+        - 'details': One row per digit with count, expected, observed, deviation, z_stat and is_anomaly.
+        - 'sample_size': Number of values with a valid first digit.
+        - 'statistics': MAD (with Nigrini conformity), chi-square and KS statistics.
+        - 'expected_frequencies' / 'observed_frequencies': Aliases used by the dashboard.
+        - 'counts': The digit count vectors every statistic is derived from.
+        - 'tests': The same structure for the 'first_two_digits', 'second_digit'
+                   and 'last_two_digits' tests; the latter also reports the
+                   'min_amount' below which values are excluded from it.
+    """
+    return calculate_benford_from_counts(benford_counts(values))
@@ -4,6 +4,7 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
 import io
 from datetime import datetime
+from src.scripts.benford_analysis import MAD_CONFORMITY_LABELS, calculate_benford_from_counts
 
 def add_heading(doc, text, level=1):
     heading = doc.add_heading(text, level=level)
@@ -33,7 +34,13 @@ def add_paragraph(doc, text, bold=False, italic=False):
             if bold: run.bold = True
             if italic: run.italic = True
 
-def generate_audit_report_docx(engagement, analysis_results, mistatement_summary=None):
+def generate_audit_report_docx(engagement, analysis_results, mistatement_summary=None, transaction_count=None,
+        report_date=None):
+    # Callers pass the count from a COUNT query; loading the transactions is the fallback
+    if transaction_count is None:
+        transaction_count = len(engagement.transactions)
+    # Printed as the report date; cached reports pass the date their key was computed for
+    report_date = report_date or datetime.now().date()
     doc = Document()
 
     # 1. Header / Cover
@@ -45,7 +52,7 @@ def generate_audit_report_docx(engagement, analysis_results, mistatement_summary
         ('Cliente:', engagement.client.name),
         ('Auditoria:', engagement.name),
         ('Ano Base:', str(engagement.year)),
-        ('Data do Relatório:', datetime.now().strftime("%d/%m/%Y"))
+        ('Data do Relatório:', report_date.strftime("%d/%m/%Y"))
     ]
     for i, (label, value) in enumerate(data):
         row = table.rows[i]
@@ -57,7 +64,7 @@ def generate_audit_report_docx(engagement, analysis_results, mistatement_summary
 
     # 2. Executive Summary
     add_heading(doc, "Resumo Executivo", level=1)
-    summary_text = f"Este documento apresenta os resultados da auditoria automatizada realizada para o cliente <b>{engagement.client.name}</b>. Foram analisadas {len(engagement.transactions)} transações financeiras utilizando testes estatísticos e forenses conforme as normas NBC TA 240 e 520."
+    summary_text = f"Este documento apresenta os resultados da auditoria automatizada realizada para o cliente <b>{engagement.client.name}</b>. Foram analisadas {transaction_count} transações financeiras utilizando testes estatísticos e forenses conforme as normas NBC TA 240 e 520."
     add_paragraph(doc, summary_text)
     doc.add_paragraph()
 
@@ -68,15 +75,26 @@ def generate_audit_report_docx(engagement, analysis_results, mistatement_summary
         for analysis in analysis_results:
             test_name = "Lei de Benford" if analysis.test_type == 'benford' else "Pagamentos Duplicados"
             if analysis.test_type == 'materiality': test_name = "Cálculo de Materialidade"
+            if analysis.test_type == 'near_duplicates': test_name = "Pagamentos Quase Duplicados"
 
             add_heading(doc, f"Resultado: {test_name}", level=1)
             add_paragraph(doc, f"Executado em: {analysis.executed_at.strftime('%d/%m/%Y %H:%M')}", italic=True)
 
             if analysis.test_type == 'benford':
-                anomalies = analysis.result.get('anomalies', [])
+                benford = analysis.result
+                if benford.get('counts'):
+                    # Recompute statistics from the stored digit counts
+                    benford = calculate_benford_from_counts(benford['counts'])
+
+                statistics = benford.get('statistics')
+                if statistics:
+                    conformity = MAD_CONFORMITY_LABELS.get(statistics['conformity'], '-')
+                    doc.add_paragraph(f"Amostra: {benford['sample_size']} valores | MAD: {statistics['mad']:.4f} ({conformity}) | Qui-quadrado: {statistics['chi_square']:.2f} (crítico {statistics['chi_square_critical']:.2f})")
+
+                anomalies = benford.get('anomalies', [])
                 if anomalies:
                     add_paragraph(doc, f"<b>{len(anomalies)} Anomalias Estatísticas Detectadas</b>")
-                    doc.add_paragraph("Os seguintes dígitos apresentaram desvio significativo (>5%) da frequência esperada:")
+                    doc.add_paragraph("Os seguintes dígitos apresentaram desvio estatisticamente significativo (teste Z, p < 0,05) da frequência esperada:")
 
                     # Table
                     table = doc.add_table(rows=1, cols=4)
@@ -87,7 +105,7 @@ def generate_audit_report_docx(engagement, analysis_results, mistatement_summary
                     hdr_cells[2].text = 'Observado'
                     hdr_cells[3].text = 'Desvio'
 
-                    details = analysis.result.get('details', [])
+                    details = benford.get('details', [])
                     for d in details:
                         if d['is_anomaly']:
                             row_cells = table.add_row().cells
@@ -98,7 +116,7 @@ def generate_audit_report_docx(engagement, analysis_results, mistatement_summary
                 else:
                     doc.add_paragraph("Nenhuma anomalia estatística detectada. A distribuição segue o padrão esperado.")
 
-            elif analysis.test_type == 'duplicates':
+            elif analysis.test_type in ('duplicates', 'near_duplicates'):
                 groups = analysis.result.get('duplicates', [])
                 if groups:
                     add_paragraph(doc, f"<b>{len(groups)} Grupos de Pagamentos Suspeitos</b>")
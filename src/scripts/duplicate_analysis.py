@@ -1,173 +1,518 @@
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple, FrozenSet, NamedTuple
+from datetime import datetime
 from thefuzz import fuzz
-from collections import defaultdict
+from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import os
+import re
+import unicodedata
+import zlib
 
-def find_duplicates(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = 85
+DATE_WINDOW_DAYS = 7
+
+# Sorted-neighbourhood window: each record is compared with the next N records
+# after sorting the bucket by normalized vendor name.
+NEIGHBOURHOOD_WINDOW = 10
+
+# Tokens shared by more records than this (e.g. "ltda", "servicos") are too common
+# to be useful blocking keys; those records still meet through the sorted neighbourhood.
+MAX_TOKEN_BLOCK = 50
+
+# Parallel scoring of amount buckets: the duplicates task fans shards out as Celery
+# sub-tasks over DUPLICATE_WORKERS worker processes (SHARDS_PER_WORKER shards each,
+# so uneven buckets still balance). Only inputs with at least PARALLEL_MIN_ROWS
+# transactions in multi-row buckets are split.
+DUPLICATE_WORKERS = int(os.getenv("DUPLICATE_WORKERS", str(os.cpu_count() or 1)))
+SHARDS_PER_WORKER = 4
+PARALLEL_MIN_ROWS = 20000
+
+# Near-duplicate mode: amounts within max(absolute, percent * amount) are compared
+AMOUNT_TOLERANCE = 1.0
+AMOUNT_TOLERANCE_PCT = 0.0
+# Each transaction is compared with at most this many neighbours in amount order
+MAX_AMOUNT_NEIGHBOURS = 50
+
+# MinHash/LSH over vendor trigrams: 32 bands x 4 rows puts the 50% detection
+# point near a trigram Jaccard similarity of ~0.42.
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32
+_MERSENNE_PRIME = (1 << 31) - 1
+
+_NON_ALNUM = re.compile(r'[\W_]+')
+
+
+class UnionFind:
+    """Disjoint-set forest used to merge matched pairs into connected groups."""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            # Smallest index becomes the root so group order is deterministic
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def normalize_vendor(vendor: Any) -> str:
+    """Lowercases, folds accents and strips punctuation, returning sorted tokens joined by spaces."""
+    text = str(vendor or '').lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sorted(_NON_ALNUM.sub(' ', text).split()))
+
+
+def char_ngrams(text: str, n: int = 3) -> FrozenSet[str]:
+    """Character n-grams of a normalized name, padded so short names still yield n-grams."""
+    padded = f" {text} "
+    return frozenset(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+
+class VendorSignature(NamedTuple):
+    vendor_id: int
+    normalized: str
+    tokens: Tuple[str, ...]
+    ngrams: FrozenSet[str]
+
+
+class VendorTable:
     """
-    Identifies potential duplicate payments based on amount and vendor name similarity.
+    Vendor canonicalization table: normalization, tokens, n-grams and a stable
+    integer id are computed once per distinct vendor string, and pairwise
+    similarities are cached per id pair.
 
     Args:
-        transactions: A list of dictionaries, each containing:
-            - 'id': str or int (optional)
-            - 'amount': float
-            - 'vendor': str
-            - 'date': str (ISO 8601, optional)
+        known_ids: Optional {normalized name: id} mapping (e.g. the firm's persisted
+                   vendor table) so ids stay stable across runs.
+    """
 
-    Returns:
-        A list of "groups" of suspicious transactions.
-        Each group contains:
-            - 'group_id': int
-            - 'reason': str (description of why it was flagged)
-            - 'transactions': List[Dict] (the transactions involved)
+    def __init__(self, known_ids: Optional[Dict[str, int]] = None):
+        self._ids: Dict[str, int] = dict(known_ids or {})
+        self._next_id = max(self._ids.values(), default=0) + 1
+        self._by_raw: Dict[str, VendorSignature] = {}
+        self._scores: Dict[Tuple[int, int], int] = {}
+
+    def signature(self, vendor: Any) -> VendorSignature:
+        raw = str(vendor or '')
+        sig = self._by_raw.get(raw)
+        if sig is None:
+            normalized = normalize_vendor(raw)
+            vendor_id = self._ids.get(normalized)
+            if vendor_id is None:
+                vendor_id = self._ids[normalized] = self._next_id
+                self._next_id += 1
+            sig = VendorSignature(vendor_id, normalized, tuple(normalized.split()), char_ngrams(normalized))
+            self._by_raw[raw] = sig
+        return sig
+
+    def known_ids(self) -> Dict[str, int]:
+        """{normalized name: id} of every vendor seen so far (seeds tables in other processes)."""
+        return dict(self._ids)
+
+    def similarity(self, a: VendorSignature, b: VendorSignature) -> int:
+        """token_sort_ratio on the pre-sorted normalized names, cached per vendor id pair."""
+        if not a.normalized or not b.normalized:
+            return 0
+        if a.vendor_id == b.vendor_id:
+            return 100
+        key = (a.vendor_id, b.vendor_id) if a.vendor_id < b.vendor_id else (b.vendor_id, a.vendor_id)
+        score = self._scores.get(key)
+        if score is None:
+            score = self._scores[key] = fuzz.ratio(a.normalized, b.normalized)
+        return score
+
+    def could_match(self, a: VendorSignature, b: VendorSignature, threshold: int) -> bool:
+        """Length bound: ratio can never exceed 200 * min_len / (len_a + len_b)."""
+        total = len(a.normalized) + len(b.normalized)
+        return total > 0 and 200 * min(len(a.normalized), len(b.normalized)) / total > threshold
+
+
+def parse_date(value: Any) -> Optional[datetime]:
+    """Parses an ISO 8601 date, returning None when missing or invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def candidate_pairs(keys: List[str], dates: List[Optional[datetime]],
+                    date_window_days: int = DATE_WINDOW_DAYS) -> Set[Tuple[int, int]]:
     """
+    Blocking stage: proposes index pairs worth fuzzy-scoring within one amount bucket.
 
-    # 1. Group by Amount
+    A pair is proposed when both records share a (not too common) vendor token, or
+    when they are close to each other once sorted by normalized vendor name. Pairs
+    whose dates are further apart than the window are pruned.
+    """
+    pairs: Set[Tuple[int, int]] = set()
+
+    # 1. Token blocks
+    blocks: Dict[str, List[int]] = defaultdict(list)
+    for i, key in enumerate(keys):
+        for token in set(key.split()):
+            blocks[token].append(i)
+
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_TOKEN_BLOCK:
+            continue
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                pairs.add((members[a], members[b]))
+
+    # 2. Sorted neighbourhood (ties broken by date so repeated vendors chain in time order)
+    order = sorted(range(len(keys)), key=lambda i: (keys[i], dates[i] or datetime.min, i))
+    for pos, i in enumerate(order):
+        for j in order[pos + 1:pos + 1 + NEIGHBOURHOOD_WINDOW]:
+            pairs.add((min(i, j), max(i, j)))
+
+    # 3. Date window
+    return {
+        (i, j) for i, j in pairs
+        if dates[i] is None or dates[j] is None or abs((dates[i] - dates[j]).days) <= date_window_days
+    }
+
+
+def _match_bucket(bucket_vendors: List[Any], bucket_dates: List[Any], vendors: VendorTable,
+                  similarity_threshold: int, date_window_days: int) -> List[Tuple[List[int], int]]:
+    """
+    Scores one amount bucket and returns its groups as (member indexes, similarity score),
+    ordered by their first member.
+    """
+    signatures = [vendors.signature(v) for v in bucket_vendors]
+    keys = [sig.normalized for sig in signatures]
+    dates = [parse_date(d) for d in bucket_dates]
+
+    uf = UnionFind(len(signatures))
+    scores: Dict[int, int] = {}
+    for i, j in sorted(candidate_pairs(keys, dates, date_window_days)):
+        a, b = signatures[i], signatures[j]
+        if not vendors.could_match(a, b, similarity_threshold):
+            continue
+        similarity = vendors.similarity(a, b)
+        if similarity > similarity_threshold:
+            uf.union(i, j)
+            scores[i] = min(scores.get(i, 100), similarity)
+            scores[j] = min(scores.get(j, 100), similarity)
+
+    # Connected components become groups
+    components: Dict[int, List[int]] = defaultdict(list)
+    for i in scores:
+        components[uf.find(i)].append(i)
+
+    return [(members, min(scores[i] for i in members)) for members in sorted(sorted(m) for m in components.values())]
+
+
+# Matched groups of one bucket as (transactions, similarity score)
+BucketGroups = List[Tuple[List[Dict[str, Any]], int]]
+
+
+def duplicate_buckets(transactions: List[Dict[str, Any]]) -> List[Tuple[float, List[Dict[str, Any]]]]:
+    """Transactions grouped by exact non-zero amount, in first-seen order; single-row buckets are dropped."""
     by_amount: Dict[float, List[Dict[str, Any]]] = defaultdict(list)
     for t in transactions:
         try:
-            amt = float(t.get('amount', 0))
-            if amt != 0:
-                by_amount[amt].append(t)
+            amt = float(t.get('amount'))
         except (ValueError, TypeError):
             continue
+        if amt != 0:
+            by_amount[amt].append(t)
+    return [(amount, tx_list) for amount, tx_list in by_amount.items() if len(tx_list) >= 2]
 
-    suspicious_groups: List[Dict[str, Any]] = []
-    group_counter = 1
-
-    # 2. Analyze within amount groups
-    for amount, tx_list in by_amount.items():
-        if len(tx_list) < 2:
-            continue
 
-        # Iterate pairs to find similar vendors
-        # To avoid N^2 complexity on large sets, we could limit, but usually duplicate sets are small per amount.
+def should_parallelize(buckets: List[Tuple[float, List[Dict[str, Any]]]], workers: int) -> bool:
+    return workers > 1 and sum(len(tx_list) for _, tx_list in buckets) >= PARALLEL_MIN_ROWS
 
-        # We need to cluster them.
-        # Simple approach: Check every pair. If match, add to a set of matched IDs.
-        # Better approach: Build connected components?
-        # Let's stick to simple pair checking and grouping.
 
-        # Using a visited set to avoid re-processing
-        # Note: 'id' might be missing, so we use object identity or index
+def shard_buckets(buckets: List[Tuple[float, List[Dict[str, Any]]]],
+                  shards: int) -> List[List[Tuple[int, float, List[Dict[str, Any]]]]]:
+    """
+    Splits buckets into at most ``shards`` non-empty shards of (bucket index, amount,
+    transactions) with similar work: largest buckets first, each to the currently
+    lightest shard (pair work ~ size^2).
+    """
+    sharded: List[List[Tuple[int, float, List[Dict[str, Any]]]]] = [[] for _ in range(shards)]
+    loads = [0] * shards
+    for index in sorted(range(len(buckets)), key=lambda i: -len(buckets[i][1])):
+        target = loads.index(min(loads))
+        sharded[target].append((index, *buckets[index]))
+        loads[target] += len(buckets[index][1]) ** 2
+    return [shard for shard in sharded if shard]
 
-        n = len(tx_list)
-        visited = [False] * n
 
-        for i in range(n):
-            if visited[i]:
-                continue
+def _bucket_groups(tx_list: List[Dict[str, Any]], vendors: VendorTable,
+                   similarity_threshold: int, date_window_days: int) -> BucketGroups:
+    matches = _match_bucket([t.get('vendor') for t in tx_list], [t.get('date') for t in tx_list],
+                            vendors, similarity_threshold, date_window_days)
+    return [([tx_list[i] for i in members], similarity) for members, similarity in matches]
 
-            current_group = [tx_list[i]]
 
-            for j in range(i + 1, n):
-                if visited[j]:
-                    continue
+def match_shard(shard: List[Tuple[int, float, List[Dict[str, Any]]]], similarity_threshold: int,
+                date_window_days: int, known_ids: Dict[str, int]) -> List[Tuple[int, float, BucketGroups]]:
+    """
+    Scores a shard of (bucket index, amount, transactions). Entry point of the
+    process pool and of the Celery shard task (plain, JSON-serializable data).
+    """
+    vendors = VendorTable(known_ids=known_ids)
+    return [
+        (index, amount, _bucket_groups(tx_list, vendors, similarity_threshold, date_window_days))
+        for index, amount, tx_list in shard
+    ]
 
-                t1 = tx_list[i]
-                t2 = tx_list[j]
-
-                # Check Vendor Similarity
-                vendor1 = str(t1.get('vendor', '')).lower()
-                vendor2 = str(t2.get('vendor', '')).lower()
-
-                similarity = fuzz.token_sort_ratio(vendor1, vendor2)
-
-                if similarity > 85:
-                    # Check Date proximity (optional)
-                    date_match = True
-                    if t1.get('date') and t2.get('date'):
-                        try:
-                            d1 = datetime.fromisoformat(t1['date'].replace('Z', '+00:00'))
-                            d2 = datetime.fromisoformat(t2['date'].replace('Z', '+00:00'))
-                            delta = abs((d1 - d2).days)
-                            if delta > 7:
-                                date_match = False
-                        except ValueError:
-                            # If date parsing fails, ignore date check (assume match or strictly require?)
-                            # Requirement says "Opcional". Let's assume if dates are invalid we fallback to just name match?
-                            # Or maybe skipping date check makes it stricter?
-                            # Let's leniently allow it if dates are unparseable.
-                            pass
-
-                    if date_match:
-                        current_group.append(t2)
-                        visited[j] = True
-
-            if len(current_group) > 1:
-                suspicious_groups.append({
-                    "group_id": group_counter,
-                    "reason": f"Same amount ({amount}) and similar vendor (>85%)",
-                    "transactions": current_group
-                })
-                group_counter += 1
-                visited[i] = True
 
+def number_groups(shard_results: Iterable[List[Tuple[int, float, BucketGroups]]],
+                  similarity_threshold: int = SIMILARITY_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Builds the result groups from scored shards. Groups are numbered in bucket
+    order, so ids do not depend on how buckets were sharded.
+    """
+    scored = sorted((entry for shard in shard_results for entry in shard), key=lambda entry: entry[0])
+    suspicious_groups: List[Dict[str, Any]] = []
+    for _, amount, bucket_groups in scored:
+        for tx_list, similarity in bucket_groups:
+            suspicious_groups.append({
+                "group_id": len(suspicious_groups) + 1,
+                "amount": amount,
+                "similarity_score": similarity,
+                "reason": f"Same amount ({amount}) and similar vendor (>{similarity_threshold}%)",
+                "transactions": list(tx_list)
+            })
     return suspicious_groups
-from thefuzz import fuzz
 
-def find_duplicates(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+def _match_buckets_parallel(buckets: List[Tuple[float, List[Dict[str, Any]]]], workers: int,
+                            similarity_threshold: int, date_window_days: int,
+                            known_ids: Dict[str, int]) -> Optional[List[List[Tuple[int, float, BucketGroups]]]]:
+    """
+    Scores shards of buckets in a local process pool. Returns None when a pool
+    cannot be started (e.g. inside a daemonic worker process, where the Celery
+    task fans out sub-tasks instead) so the caller falls back to serial scoring.
+    """
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(match_shard, shard, similarity_threshold, date_window_days, known_ids)
+                for shard in shard_buckets(buckets, workers * SHARDS_PER_WORKER)
+            ]
+            return [future.result() for future in futures]
+    except (AssertionError, OSError, BrokenProcessPool) as e:
+        logger.warning(f"Parallel duplicate scoring unavailable ({e}); falling back to serial")
+        return None
+
+
+def find_duplicates(transactions: List[Dict[str, Any]],
+                    similarity_threshold: int = SIMILARITY_THRESHOLD,
+                    date_window_days: int = DATE_WINDOW_DAYS,
+                    vendor_table: Optional[VendorTable] = None,
+                    workers: int = 1) -> List[Dict[str, Any]]:
     """
-    Identifies potential duplicate transactions based on exact amount match
-    and fuzzy vendor name matching.
+    Identifies potential duplicate payments based on amount and vendor name similarity.
+
+    Transactions are bucketed by exact amount; within each bucket a blocking stage
+    prunes candidate pairs before fuzzy scoring, and matched pairs are merged with
+    union-find so transitive duplicates (A~B, B~C) end up in the same group.
 
     Args:
-        transactions: List of dictionaries with keys 'amount' (float) and 'vendor' (str).
-                      Optional 'id' key for identification.
+        transactions: A list of dictionaries, each containing:
+            - 'id': str or int (optional)
+            - 'amount': float
+            - 'vendor': str
+            - 'date': str (ISO 8601, optional)
+        similarity_threshold: Minimum token_sort_ratio (exclusive) for two vendors to match.
+        date_window_days: Maximum distance in days between dated transactions.
+        vendor_table: Vendor canonicalization table to reuse (a new one is built per run otherwise).
+        workers: Number of local processes used to score amount buckets (1 = serial).
+                 Only for standalone callers: the duplicates Celery task shards across
+                 the worker pool instead. Results are identical regardless of the number of workers.
 
     Returns:
-        List of groups (dictionaries) containing potential duplicates.
+        A list of "groups" of suspicious transactions.
+        Each group contains:
+            - 'group_id': int
+            - 'amount': float
+            - 'similarity_score': int (lowest vendor similarity among the matched pairs)
+            - 'reason': str (description of why it was flagged)
+            - 'transactions': List[Dict] (the transactions involved)
     """
     if not transactions:
         return []
 
-    # 1. Group by exact amount
-    grouped_by_amount: Dict[float, List[Dict[str, Any]]] = {}
+    vendors = vendor_table or VendorTable()
 
-    for tx in transactions:
-        amount = tx.get('amount')
-        if amount is None:
-            continue
+    # 1. Group by Amount
+    buckets = duplicate_buckets(transactions)
 
-        if amount not in grouped_by_amount:
-            grouped_by_amount[amount] = []
-        grouped_by_amount[amount].append(tx)
+    # 2. Analyze within amount groups (optionally sharded across processes)
+    shard_results = None
+    if should_parallelize(buckets, workers):
+        shard_results = _match_buckets_parallel(buckets, workers, similarity_threshold,
+                                                 date_window_days, vendors.known_ids())
+    if shard_results is None:
+        shard_results = [[
+            (index, amount, _bucket_groups(tx_list, vendors, similarity_threshold, date_window_days))
+            for index, (amount, tx_list) in enumerate(buckets)
+        ]]
 
-    suspect_groups = []
+    # 3. Number groups in bucket order so ids do not depend on the number of workers
+    return number_groups(shard_results, similarity_threshold)
 
-    # 2. Analyze each group for vendor similarity
-    for amount, group in grouped_by_amount.items():
-        if len(group) < 2:
-            continue
 
-        # Compare every pair in the group
-        # To avoid duplicate pairs and self-comparison, use nested loop
-        # We need to cluster them. A simple pair-wise approach is requested: "marque o par".
-        # But we might have A, B, C where A~B and B~C.
-        # Let's stick to finding pairs or small groups.
-        # The requirement says "marque o par".
+class VendorLSHIndex:
+    """
+    MinHash signatures over vendor trigrams, bucketed with locality-sensitive
+    hashing so similar vendors are found without comparing every vendor pair.
+    """
 
-        # We will iterate and find pairs that satisfy the condition.
-        # To avoid outputting the same pair twice (A, B) and (B, A), we use indices.
+    def __init__(self, num_perm: int = MINHASH_PERMUTATIONS, bands: int = LSH_BANDS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.rows = num_perm // bands
+        self.bands = bands
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self._indexed: Set[int] = set()
+
+    def minhash(self, ngrams: FrozenSet[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in ngrams), dtype=np.uint64, count=len(ngrams))
+        if hashes.size == 0:
+            return np.full(self._a.size, _MERSENNE_PRIME, dtype=np.uint64)
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+    def add(self, vendor_id: int, ngrams: FrozenSet[str]) -> None:
+        if vendor_id in self._indexed or not ngrams:
+            return
+        self._indexed.add(vendor_id)
+        minhash = self.minhash(ngrams)
+        for band in range(self.bands):
+            key = (band, minhash[band * self.rows:(band + 1) * self.rows].tobytes())
+            self._buckets[key].append(vendor_id)
+
+    def candidate_pairs(self) -> Set[Tuple[int, int]]:
+        """Vendor id pairs that share at least one LSH bucket."""
+        pairs: Set[Tuple[int, int]] = set()
+        for members in self._buckets.values():
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    pairs.add((min(members[a], members[b]), max(members[a], members[b])))
+        return pairs
+
+
+def find_near_duplicates(transactions: List[Dict[str, Any]],
+                         amount_tolerance: float = AMOUNT_TOLERANCE,
+                         amount_tolerance_pct: float = AMOUNT_TOLERANCE_PCT,
+                         similarity_threshold: int = SIMILARITY_THRESHOLD,
+                         date_window_days: int = DATE_WINDOW_DAYS,
+                         vendor_table: Optional[VendorTable] = None) -> List[Dict[str, Any]]:
+    """
+    Identifies potential duplicate payments whose amounts are close but not equal
+    (e.g. R$ 1.000,00 vs R$ 999,99) and whose vendors are similar.
 
-        checked_pairs = set()
+    Similar vendors are clustered through a MinHash/LSH index over vendor trigrams;
+    inside each cluster transactions are sorted by amount and only neighbours within
+    the tolerance window are scored, so the search is near-linear.
 
-        for i in range(len(group)):
-            for j in range(i + 1, len(group)):
-                tx1 = group[i]
-                tx2 = group[j]
+    Args:
+        transactions: Same format as ``find_duplicates``.
+        amount_tolerance: Absolute amount difference allowed (e.g. 1.0 = R$ 1,00).
+        amount_tolerance_pct: Relative difference allowed (e.g. 0.01 = 1%); the larger
+                              of the two tolerances applies.
+        similarity_threshold: Minimum vendor similarity (exclusive).
+        date_window_days: Maximum distance in days between dated transactions.
+        vendor_table: Vendor canonicalization table to reuse.
 
-                vendor1 = str(tx1.get('vendor', '')).lower()
-                vendor2 = str(tx2.get('vendor', '')).lower()
+    Returns:
+        Groups in the ``find_duplicates`` format, plus 'amount_range': [min, max].
+        'amount' is the smallest amount in the group.
+    """
+    vendors = vendor_table or VendorTable()
 
-                # Use token_sort_ratio as requested
-                similarity = fuzz.token_sort_ratio(vendor1, vendor2)
+    rows = []
+    for t in transactions:
+        try:
+            amt = float(t.get('amount'))
+        except (ValueError, TypeError):
+            continue
+        if amt != 0:
+            rows.append((t, amt, vendors.signature(t.get('vendor')), parse_date(t.get('date'))))
+
+    if len(rows) < 2:
+        return []
 
-                if similarity > 85:
-                    suspect_groups.append({
-                        "amount": amount,
-                        "similarity_score": similarity,
-                        "transactions": [tx1, tx2]
-                    })
+    # 1. Cluster similar vendors (LSH candidates confirmed by fuzzy score)
+    signatures: Dict[int, VendorSignature] = {sig.vendor_id: sig for _, _, sig, _ in rows if sig.normalized}
+
+    # Trigrams shared by most vendors (e.g. from "servicos ltda") would put every
+    # vendor in the same buckets, so only distinctive trigrams are hashed.
+    document_frequency = Counter(g for sig in signatures.values() for g in sig.ngrams)
+    max_df = max(MAX_TOKEN_BLOCK, len(signatures) // 20)
+    index = VendorLSHIndex()
+    for sig in signatures.values():
+        distinctive = frozenset(g for g in sig.ngrams if document_frequency[g] <= max_df)
+        index.add(sig.vendor_id, distinctive or sig.ngrams)
+
+    vendor_ids = sorted(signatures)
+    position = {vendor_id: i for i, vendor_id in enumerate(vendor_ids)}
+    vendor_clusters = UnionFind(len(vendor_ids))
+    for a, b in index.candidate_pairs():
+        if vendors.similarity(signatures[a], signatures[b]) > similarity_threshold:
+            vendor_clusters.union(position[a], position[b])
+
+    by_cluster: Dict[int, List[int]] = defaultdict(list)
+    for i, (_, _, sig, _) in enumerate(rows):
+        if sig.normalized:
+            by_cluster[vendor_clusters.find(position[sig.vendor_id])].append(i)
+
+    # 2. Sliding amount window inside each vendor cluster
+    uf = UnionFind(len(rows))
+    scores: Dict[int, int] = {}
+    for members in by_cluster.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda i: (rows[i][1], rows[i][3] or datetime.min, i))
+        for pos, i in enumerate(members):
+            _, amt_i, sig_i, date_i = rows[i]
+            for j in members[pos + 1:pos + 1 + MAX_AMOUNT_NEIGHBOURS]:
+                _, amt_j, sig_j, date_j = rows[j]
+                tolerance = max(amount_tolerance, amount_tolerance_pct * max(abs(amt_i), abs(amt_j)))
+                if amt_j - amt_i > tolerance:
+                    break
+                if date_i and date_j and abs((date_i - date_j).days) > date_window_days:
+                    continue
+                similarity = vendors.similarity(sig_i, sig_j)
+                if similarity > similarity_threshold:
+                    uf.union(i, j)
+                    scores[i] = min(scores.get(i, 100), similarity)
+                    scores[j] = min(scores.get(j, 100), similarity)
+
+    # 3. Connected components become groups
+    components: Dict[int, List[int]] = defaultdict(list)
+    for i in scores:
+        components[uf.find(i)].append(i)
 
-    return suspect_groups
+    suspicious_groups: List[Dict[str, Any]] = []
+    for group_id, members in enumerate(sorted(sorted(m) for m in components.values()), start=1):
+        amounts = [rows[i][1] for i in members]
+        suspicious_groups.append({
+            "group_id": group_id,
+            "amount": min(amounts),
+            "amount_range": [min(amounts), max(amounts)],
+            "similarity_score": min(scores[i] for i in members),
+            "reason": f"Similar amount ({min(amounts)} - {max(amounts)}) and similar vendor (>{similarity_threshold}%)",
+            "transactions": [rows[i][0] for i in members]
+        })
+
+    return suspicious_groups
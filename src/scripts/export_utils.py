@@ -1,5 +1,15 @@
-import pandas as pd
+import csv
 import io
+import json
+import tempfile
+from datetime import date, datetime
+from typing import Iterable, Iterator, Sequence
+
+import pandas as pd
+from openpyxl import Workbook
+
+# Bytes per chunk when streaming a finished file
+STREAM_CHUNK_BYTES = 1024 * 1024
 
 def export_to_excel(dataframes, sheet_names=None):
     """
@@ -21,6 +31,57 @@ def export_to_csv(dataframe):
     dataframe.to_csv(output, index=False)
     return io.BytesIO(output.getvalue().encode('utf-8'))
 
+def export_to_ndjson(dataframe):
+    output = dataframe.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+    return io.BytesIO(output.encode('utf-8'))
+
+def iter_csv(header: Sequence[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """Encodes rows to CSV one chunk at a time: memory and time to first byte do not depend on the row count."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    yield output.getvalue().encode('utf-8')
+    for rows in chunks:
+        output.seek(0)
+        output.truncate()
+        writer.writerows(rows)
+        yield output.getvalue().encode('utf-8')
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def iter_ndjson(keys: Sequence[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """One JSON object per line (keyed by ``keys``), encoded one chunk at a time."""
+    for rows in chunks:
+        lines = [json.dumps(dict(zip(keys, row)), default=_json_default, ensure_ascii=False) for row in rows]
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+def iter_xlsx(header: Sequence[str], chunks: Iterable[Sequence[tuple]], sheet_name: str = "Sheet1") -> Iterator[bytes]:
+    """
+    Writes rows with openpyxl's write-only mode, which flushes each row to a
+    temporary file instead of keeping cells in memory, then streams the saved
+    workbook. Unlike CSV the first byte comes after the last row: an XLSX is a
+    zip whose sheets are only complete at the end.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(list(header))
+    for rows in chunks:
+        for row in rows:
+            sheet.append(row)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            data = output.read(STREAM_CHUNK_BYTES)
+            if not data:
+                break
+            yield data
+
 def benford_to_df(result):
     details = result.get('details', [])
     df = pd.DataFrame(details)
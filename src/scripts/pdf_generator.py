@@ -6,8 +6,15 @@ from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
 import io
 from datetime import datetime
-
-def generate_audit_report(engagement, analysis_results, mistatement_summary=None):
+from src.scripts.benford_analysis import MAD_CONFORMITY_LABELS, calculate_benford_from_counts
+
+def generate_audit_report(engagement, analysis_results, mistatement_summary=None, transaction_count=None,
+        report_date=None):
+    # Callers pass the count from a COUNT query; loading the transactions is the fallback
+    if transaction_count is None:
+        transaction_count = len(engagement.transactions)
+    # Printed as the report date; cached reports pass the date their key was computed for
+    report_date = report_date or datetime.now().date()
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     styles = getSampleStyleSheet()
@@ -40,7 +47,7 @@ def generate_audit_report(engagement, analysis_results, mistatement_summary=None
         ['Cliente:', engagement.client.name],
         ['Auditoria:', engagement.name],
         ['Ano Base:', str(engagement.year)],
-        ['Data do Relatório:', datetime.now().strftime("%d/%m/%Y")]
+        ['Data do Relatório:', report_date.strftime("%d/%m/%Y")]
     ]
 
     t = Table(data, colWidths=[2*inch, 4*inch])
@@ -57,7 +64,7 @@ def generate_audit_report(engagement, analysis_results, mistatement_summary=None
     story.append(Paragraph("Resumo Executivo", heading_style))
     summary_text = f"""
     Este documento apresenta os resultados da auditoria automatizada realizada para o cliente <b>{engagement.client.name}</b>.
-    Foram analisadas {len(engagement.transactions)} transações financeiras utilizando testes estatísticos e forenses
+    Foram analisadas {transaction_count} transações financeiras utilizando testes estatísticos e forenses
     conforme as normas NBC TA 240 e 520.
     """
     story.append(Paragraph(summary_text, styles['Normal']))
@@ -71,6 +78,7 @@ def generate_audit_report(engagement, analysis_results, mistatement_summary=None
             # Section Title
             test_name = "Lei de Benford" if analysis.test_type == 'benford' else "Pagamentos Duplicados"
             if analysis.test_type == 'materiality': test_name = "Cálculo de Materialidade"
+            if analysis.test_type == 'near_duplicates': test_name = "Pagamentos Quase Duplicados"
 
             story.append(Paragraph(f"Resultado: {test_name}", heading_style))
 
@@ -80,14 +88,25 @@ def generate_audit_report(engagement, analysis_results, mistatement_summary=None
 
             # Content based on type
             if analysis.test_type == 'benford':
-                anomalies = analysis.result.get('anomalies', [])
+                benford = analysis.result
+                if benford.get('counts'):
+                    # Recompute statistics from the stored digit counts
+                    benford = calculate_benford_from_counts(benford['counts'])
+
+                statistics = benford.get('statistics')
+                if statistics:
+                    conformity = MAD_CONFORMITY_LABELS.get(statistics['conformity'], '-')
+                    story.append(Paragraph(f"Amostra: {benford['sample_size']} valores | MAD: {statistics['mad']:.4f} ({conformity}) | Qui-quadrado: {statistics['chi_square']:.2f} (crítico {statistics['chi_square_critical']:.2f})", styles['Normal']))
+                    story.append(Spacer(1, 0.1 * inch))
+
+                anomalies = benford.get('anomalies', [])
                 if anomalies:
                     story.append(Paragraph(f"<b>{len(anomalies)} Anomalias Estatísticas Detectadas</b>", styles['Normal']))
-                    story.append(Paragraph("Os seguintes dígitos apresentaram desvio significativo (>5%) da frequência esperada:", styles['Normal']))
+                    story.append(Paragraph("Os seguintes dígitos apresentaram desvio estatisticamente significativo (teste Z, p < 0,05) da frequência esperada:", styles['Normal']))
                     story.append(Spacer(1, 0.1 * inch))
 
                     # Table of anomalies
-                    details = analysis.result.get('details', [])
+                    details = benford.get('details', [])
                     table_data = [['Dígito', 'Esperado', 'Observado', 'Desvio']]
                     for d in details:
                         if d['is_anomaly']:
@@ -109,7 +128,7 @@ def generate_audit_report(engagement, analysis_results, mistatement_summary=None
                 else:
                     story.append(Paragraph("Nenhuma anomalia estatística detectada. A distribuição segue o padrão esperado.", styles['Normal']))
 
-            elif analysis.test_type == 'duplicates':
+            elif analysis.test_type in ('duplicates', 'near_duplicates'):
                 groups = analysis.result.get('duplicates', [])
                 if groups:
                     story.append(Paragraph(f"<b>{len(groups)} Grupos de Pagamentos Suspeitos</b>", styles['Normal']))
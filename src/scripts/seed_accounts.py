@@ -1,10 +1,111 @@
+from typing import List
+
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
 from src.api.database import SessionLocal, engine
 from src.api import models
+from src.api.services.chart_of_accounts import infer_parent_code, rebuild_account_paths
+from src.api.services.mapping_resolution import backfill_description_keys
+
+# Columns added after the tables were first created (create_all does not alter
+# existing tables): (table, column, DDL type). Added where the column is missing.
+ADDED_COLUMNS = [
+    ("standard_accounts", "path", "VARCHAR"),
+    # Canonical vendors of the transactions
+    ("transactions", "vendor_id", "INTEGER REFERENCES vendors (id)"),
+    # Resolved mapping of each transaction (balances are aggregated from it)
+    ("transactions", "mapping_id", "INTEGER REFERENCES account_mappings (id)"),
+    ("transactions", "standard_account_id", "INTEGER REFERENCES standard_accounts (id)"),
+    # NULL until ensure_balances builds the engagement's materialized balances
+    ("engagements", "balances_version", "INTEGER"),
+    ("account_mappings", "description_key", "VARCHAR(16)"),
+    ("account_mappings", "updated_at", "TIMESTAMP"),
+]
+
+# Rows that would break a unique index created below, fixed before it is created
+# (plain SQL, valid on SQLite and PostgreSQL)
+DATA_PATCHES = [
+    # One canonical vendor per normalized name: duplicates are merged into the oldest
+    "UPDATE transactions SET vendor_id = ("
+    "SELECT MIN(k.id) FROM vendors v JOIN vendors k "
+    "ON k.firm_id = v.firm_id AND k.normalized_name = v.normalized_name "
+    "WHERE v.id = transactions.vendor_id) "
+    "WHERE vendor_id IN (SELECT id FROM vendors WHERE id NOT IN ("
+    "SELECT MIN(id) FROM vendors GROUP BY firm_id, normalized_name));",
+    "DELETE FROM vendors WHERE id NOT IN (SELECT MIN(id) FROM vendors GROUP BY firm_id, normalized_name);",
+    # Engagements with duplicate sketches lose them; they are rebuilt on first access
+    "DELETE FROM benford_sketches WHERE engagement_id IN ("
+    "SELECT engagement_id FROM benford_sketches "
+    "GROUP BY engagement_id, account_code HAVING COUNT(*) > 1);",
+    # Versions written twice by concurrent rebuilds share one directory: keep one catalog row
+    "DELETE FROM ledger_snapshots WHERE id NOT IN ("
+    "SELECT MIN(id) FROM ledger_snapshots GROUP BY engagement_id, version);",
+    # Balances doubled by concurrent refreshes are dropped and recomputed on first access
+    "UPDATE engagements SET balances_version = NULL WHERE id IN ("
+    "SELECT engagement_id FROM engagement_balances "
+    "GROUP BY engagement_id, standard_account_id, period HAVING COUNT(*) > 1);",
+    "DELETE FROM engagement_balances WHERE engagement_id IN ("
+    "SELECT id FROM engagements WHERE balances_version IS NULL);",
+]
+
+# Unique constraints of the models on tables that existed before them:
+# (index name, table, columns, NULLs compare equal). SQLite always treats
+# NULLs as distinct; PostgreSQL (15+) is told not to where the model says so.
+UNIQUE_INDEXES = [
+    ("uq_vendors_firm_normalized_name", "vendors", "firm_id, normalized_name", False),
+    ("uq_benford_sketches_engagement_account", "benford_sketches", "engagement_id, account_code", True),
+    ("uq_ledger_snapshots_engagement_version", "ledger_snapshots", "engagement_id, version", False),
+    ("uq_engagement_balances_engagement_account_period", "engagement_balances",
+     "engagement_id, standard_account_id, period", True),
+]
+
+
+def schema_patch_statements(bind) -> List[str]:
+    """The DDL/DML bringing an existing database up to the models, for its dialect."""
+    inspector = inspect(bind)
+    postgresql = bind.dialect.name == "postgresql"
+    statements = []
+    for table, column, ddl in ADDED_COLUMNS:
+        if inspector.has_table(table) and column not in {c["name"] for c in inspector.get_columns(table)}:
+            statements.append(f"ALTER TABLE {table} ADD COLUMN {column} {ddl};")
+    statements.extend(DATA_PATCHES)
+    for name, table, columns, nulls_not_distinct in UNIQUE_INDEXES:
+        suffix = " NULLS NOT DISTINCT" if nulls_not_distinct and postgresql else ""
+        statements.append(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({columns}){suffix};")
+    return statements
+
+
+def apply_schema_patches(db: Session):
+    """
+    Runs each patch in its own savepoint, so one failing statement does not undo
+    the others, then creates every index declared on the models that is missing.
+    """
+    for statement in schema_patch_statements(db.get_bind()):
+        try:
+            with db.begin_nested():
+                db.execute(text(statement))
+        except Exception as e:
+            print(f"Schema patch failed ({statement}): {e}")
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with db.begin_nested():
+                    index.create(db.connection(), checkfirst=True)
+            except Exception as e:
+                print(f"Index {index.name} could not be created: {e}")
+    db.commit()
 
 def seed_standard_accounts():
     db = SessionLocal()
 
+    apply_schema_patches(db)
+    try:
+        backfill_description_keys(db)
+        db.commit()
+    except Exception as e:
+        print(f"Schema patch error (might be ignored): {e}")
+        db.rollback()
+
     # Re-seed logic:
     # Since we added parent_id, we might want to clear existing ones or just update them.
     # For simplicity in this dev environment, if the schema changed significantly (columns added),
@@ -103,22 +204,8 @@ def seed_standard_accounts():
         if acc["level"] > 1:
             # Infer parent code
             # BR GAAP logic: 1.1 -> 1; 1.1.01 -> 1.1
-            parent_code = None
-            if "." in acc["code"]:
-                parts = acc["code"].rsplit(".", 1)
-                parent_code = parts[0]
-            elif len(acc["code"]) > 1:
-                # Condo logic: 101 -> 100? No, 100 is parent of 101?
-                # The list says 100 is Level 1, 101 is Level 2.
-                # If structure is not dot-based, we need explicit parent definition or heuristic.
-                # For Condo, let's assume 101 -> 100, 201 -> 200.
-                try:
-                    val = int(acc["code"])
-                    parent_val = (val // 100) * 100
-                    if parent_val != val:
-                         parent_code = str(parent_val)
-                except:
-                    pass
+            # Condo logic: 101 -> 100, 201 -> 200
+            parent_code = infer_parent_code(acc["code"])
 
             if parent_code:
                 parent_id = code_map.get((parent_code, acc["template"]))
@@ -128,6 +215,11 @@ def seed_standard_accounts():
                      db.query(models.StandardAccount).filter(models.StandardAccount.id == current_id).update({"parent_id": parent_id})
 
     db.commit()
+
+    # Materialized paths (and the cached trees) follow the hierarchy
+    for template in ("br_gaap", "condo"):
+        rebuild_account_paths(db, template)
+    db.commit()
     print("Standard accounts seeded and hierarchy updated.")
     db.close()
 
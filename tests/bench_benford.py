@@ -0,0 +1,57 @@
+"""
+Benchmark: vectorized Benford engine vs. the previous string-based implementation.
+
+Usage:
+    PYTHONPATH=. python tests/bench_benford.py [sizes...]
+
+Default sizes are 10k, 1M and 10M values drawn from a log-uniform distribution
+(which follows Benford's Law).
+"""
+import sys
+import time
+
+import numpy as np
+
+from src.scripts.benford_analysis import calculate_benford
+
+
+def legacy_first_digits(values):
+    """First-digit extraction as done before the NumPy engine (str per value)."""
+    first_digits = []
+    for v in values:
+        if v == 0:
+            continue
+        s = str(abs(v)).replace('.', '').lstrip('0')
+        if not s:
+            continue
+        digit = int(s[0])
+        if 1 <= digit <= 9:
+            first_digits.append(digit)
+    return first_digits
+
+
+def synthetic_amounts(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return np.round(10 ** rng.uniform(0, 7, n), 2)
+
+
+def bench(n):
+    amounts = synthetic_amounts(n)
+    values = amounts.tolist()
+
+    start = time.perf_counter()
+    legacy_first_digits(values)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calculate_benford(amounts)
+    vectorized = time.perf_counter() - start
+
+    print(f"{n:>12,d} | legacy {n / legacy:>14,.0f} rows/s | "
+          f"numpy (4 tests) {n / vectorized:>14,.0f} rows/s | speedup {legacy / vectorized:6.1f}x")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 1_000_000, 10_000_000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,71 @@
+"""
+Benchmark: vectorized currency cleaning vs. the previous per-cell parser.
+
+Usage:
+    PYTHONPATH=. python tests/bench_currency.py [rows...]
+
+Default sizes are 10k, 100k and 500k trial balance lines, formatted as BR
+(1.234,56), US (1,234.56) and a mix of both.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.api.services.ingestion import clean_currency_column
+
+
+def legacy_clean_currency(x):
+    """The per-cell parser used by validate_and_parse before vectorization."""
+    if pd.isna(x): return 0.0
+    if isinstance(x, (int, float)): return float(x)
+    if isinstance(x, str):
+        x = x.strip().replace('R$', '').replace(' ', '')
+        if ',' in x and '.' in x:
+            if x.rfind(',') > x.rfind('.'):
+                x = x.replace('.', '').replace(',', '.')
+            else:
+                x = x.replace(',', '')
+        elif ',' in x:
+            x = x.replace(',', '.')
+        try:
+            return float(x)
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def synthetic_column(n, fmt, seed=42):
+    rng = np.random.default_rng(seed)
+    amounts = np.round(rng.uniform(-1e6, 1e6, n), 2)
+    us = [f"{a:,.2f}" for a in amounts]
+    if fmt == "us":
+        return pd.Series(us)
+    br = [f"R$ {s.replace(',', '_').replace('.', ',').replace('_', '.')}" for s in us]
+    if fmt == "br":
+        return pd.Series(br)
+    return pd.Series([b if i % 2 else u for i, (b, u) in enumerate(zip(br, us))])
+
+
+def bench(n, fmt):
+    column = synthetic_column(n, fmt)
+
+    start = time.perf_counter()
+    expected = column.apply(legacy_clean_currency)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = clean_currency_column(column)
+    vectorized = time.perf_counter() - start
+
+    assert np.array_equal(result.to_numpy(), expected.to_numpy())
+    print(f"{n:>10,d} {fmt:<5} | apply {legacy * 1000:9.1f} ms | vectorized {vectorized * 1000:9.1f} ms | "
+          f"speedup {legacy / vectorized:5.1f}x")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 500_000]
+    for size in sizes:
+        for fmt in ("br", "us", "mixed"):
+            bench(size, fmt)
@@ -0,0 +1,63 @@
+"""
+Benchmark: serial vs. process-pool duplicate scoring.
+
+Usage:
+    PYTHONPATH=. python tests/bench_duplicates.py [rows] [workers...]
+
+Builds a synthetic ledger (default 200k rows) where a few round amounts are
+shared by thousands of vendors, injects near-identical duplicate payments and
+times find_duplicates with 1 worker and with each requested worker count
+(default: 2, 4 and the number of CPUs).
+"""
+import os
+import random
+import string
+import sys
+import time
+
+from src.scripts.duplicate_analysis import find_duplicates
+
+ROUND_AMOUNTS = [100.0, 250.0, 500.0, 1000.0, 1500.0, 2000.0, 5000.0, 10000.0]
+
+
+def synthetic_ledger(rows, duplicate_rate=0.01, seed=42):
+    rng = random.Random(seed)
+    vendors = [
+        f"{''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))} "
+        f"{rng.choice(['Servicos', 'Comercio', 'Transportes', 'Consultoria'])} Ltda"
+        for _ in range(max(rows // 20, 10))
+    ]
+
+    transactions = []
+    for i in range(rows):
+        amount = rng.choice(ROUND_AMOUNTS) if rng.random() < 0.4 else round(rng.uniform(10, 50000), 2)
+        transactions.append({
+            "id": i,
+            "vendor": rng.choice(vendors),
+            "amount": amount,
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        })
+
+    for i in rng.sample(range(rows), int(rows * duplicate_rate)):
+        original = transactions[i]
+        transactions.append({**original, "id": f"dup-{i}", "vendor": original["vendor"].upper() + "."})
+    return transactions
+
+
+def bench(transactions, workers):
+    start = time.perf_counter()
+    groups = find_duplicates(transactions, workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f"workers {workers:>3} | {elapsed:8.2f}s | {len(transactions) / elapsed:>12,.0f} rows/s | {len(groups):,d} groups")
+    return groups
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    worker_counts = [int(w) for w in sys.argv[2:]] or sorted({2, 4, os.cpu_count() or 1})
+
+    transactions = synthetic_ledger(rows)
+    serial = bench(transactions, 1)
+    for workers in worker_counts:
+        if workers > 1:
+            assert bench(transactions, workers) == serial, "parallel result differs from serial"
@@ -0,0 +1,79 @@
+"""
+Benchmark: streamed transaction export vs. building the whole file with pandas.
+
+Usage:
+    PYTHONPATH=. python tests/bench_export.py [rows] [database_url]
+
+Loads one engagement with ``rows`` transactions (default: a temporary SQLite
+file), then reports time to first chunk, total time and peak traced memory of
+the streamed CSV, NDJSON and XLSX exports and of the previous path
+(ORM objects -> transactions_to_df -> export_to_csv / export_to_excel).
+Times include tracemalloc overhead; compare them with each other only.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.api.database import Base
+from src.api import models
+from src.api.services.transaction_export import stream_transactions
+from src.scripts.export_utils import export_to_csv, export_to_excel, transactions_to_df
+
+
+def seed(db, n):
+    rows = [{"engagement_id": 1, "vendor": f"Fornecedor {i % 997}", "amount": float(i % 10000) / 3,
+             "date": datetime(2024, 1, 1) + timedelta(minutes=i), "description": f"Lancamento {i}",
+             "account_code": f"1.{i % 50}", "account_name": f"Conta {i % 50}"} for i in range(n)]
+    db.execute(models.Transaction.__table__.insert(), rows)
+    db.commit()
+
+
+def measure(label, produce):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for part in produce():
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(part)
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<14} first byte {first:6.2f}s  total {total:6.2f}s  peak {peak / 2**20:7.1f} MiB  {size / 2**20:6.1f} MiB out")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    url = sys.argv[2] if len(sys.argv) > 2 else f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'export.db')}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    seed(db, n)
+    db.close()
+
+    for format in ('csv', 'ndjson', 'xlsx'):
+        db = Session()
+        measure(f"stream {format}", lambda: stream_transactions(db, 1, format))
+        db.close()
+
+    def legacy(export):
+        db = Session()
+        transactions = db.query(models.Transaction).filter(models.Transaction.engagement_id == 1).all()
+        yield export(transactions_to_df(transactions)).getvalue()
+        db.close()
+
+    measure("pandas csv", lambda: legacy(export_to_csv))
+    measure("pandas xlsx", lambda: legacy(lambda df: export_to_excel([df], sheet_names=["Transactions"])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: streaming chunked ingestion vs. the previous iterrows + ORM importer.
+
+Usage:
+    PYTHONPATH=. python tests/bench_ingest.py [rows] [database_url]
+
+Writes a synthetic ledger CSV (default 200k rows) and loads it into a fresh
+database (default: a temporary SQLite file; pass a postgresql+psycopg2 URL to
+exercise COPY). Reports rows/s and the process peak memory after each run.
+"""
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.api.database import Base
+from src.api import models
+from src.api.services.transaction_ingest import ingest_transactions, _peak_memory_mb
+
+
+def synthetic_csv(rows, seed=42):
+    rng = random.Random(seed)
+    vendors = [f"Fornecedor {i} Ltda" for i in range(max(rows // 50, 10))]
+    lines = ["vendor,amount,date,account_code,account_name"]
+    for _ in range(rows):
+        lines.append(f"{rng.choice(vendors)},{rng.uniform(1, 100000):.2f},"
+                     f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},"
+                     f"1.{rng.randint(1, 40)},Conta")
+    return "\n".join(lines).encode()
+
+
+def legacy_ingest(db, engagement_id, content):
+    """The importer as it was before streaming: one ORM object per row."""
+    df = pd.read_csv(io.BytesIO(content))
+    transactions = []
+    for _, row in df.iterrows():
+        transactions.append(models.Transaction(
+            engagement_id=engagement_id,
+            vendor=str(row['vendor']),
+            amount=float(row['amount']),
+            date=pd.to_datetime(row['date']).to_pydatetime(),
+            account_code=str(row['account_code']),
+            account_name=str(row['account_name'])
+        ))
+    db.add_all(transactions)
+
+
+def fresh_session(url):
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    firm = models.AuditFirm(name="Bench", cnpj="bench")
+    engagement = models.Engagement(name="Bench")
+    db.add_all([firm, engagement])
+    db.commit()
+    return db, firm.id, engagement.id
+
+
+def timed(label, rows, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {rows:>10,d} rows | {elapsed:8.2f}s | {rows / elapsed:>10,.0f} rows/s | "
+          f"peak RSS {_peak_memory_mb()} MB")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    tmpdir = tempfile.mkdtemp()
+    url = sys.argv[2] if len(sys.argv) > 2 else f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    content = synthetic_csv(rows)
+
+    # Streaming first: peak RSS is monotonic, so the legacy run cannot hide behind it
+    db, firm_id, engagement_id = fresh_session(url)
+    timed("streaming", rows, lambda: (ingest_transactions(db, engagement_id, firm_id, io.BytesIO(content)), db.commit()))
+    db.close()
+
+    db, firm_id, engagement_id = fresh_session(url)
+    timed("legacy", rows, lambda: (legacy_ingest(db, engagement_id, content), db.commit()))
+    db.close()
@@ -0,0 +1,47 @@
+"""
+Benchmark: mapping suggestions for a large trial balance.
+
+Usage:
+    PYTHONPATH=. python tests/bench_mapping_suggestions.py [descriptions] [accounts] [history]
+
+Builds a suggestion index over synthetic standard accounts and mapping history
+drawn from a small accounting vocabulary (so most descriptions share n-grams
+with most accounts, the expensive case) and times building it and suggesting
+for all descriptions, every one distinct.
+"""
+import random
+import sys
+import time
+
+from src.api.services.mapping_suggestions import SuggestionIndex
+
+WORDS = [
+    "caixa", "banco", "fornecedores", "salarios", "impostos", "receita", "despesa", "servicos", "energia",
+    "aluguel", "juros", "depreciacao", "estoque", "clientes", "provisao", "ferias", "inss", "fgts", "icms",
+    "pis", "cofins", "manutencao", "veiculos", "software", "seguros", "material", "escritorio", "comissoes",
+    "frete", "agua",
+]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    n_accounts = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    n_history = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    rng = random.Random(1)
+
+    accounts = [(i, str(i), " ".join(rng.sample(WORDS, 3)) + f" {i % 97}") for i in range(n_accounts)]
+    history = [(" ".join(rng.sample(WORDS, 2)) + f" filial {i % 50}", rng.randrange(n_accounts))
+               for i in range(n_history)]
+    descriptions = [" ".join(rng.sample(WORDS, 3)) + f" {i}" for i in range(n)]
+
+    start = time.perf_counter()
+    index = SuggestionIndex(accounts, history)
+    print(f"build:    {n_accounts} accounts + {n_history} mappings in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    index.suggest(descriptions)
+    print(f"suggest:  {n} descriptions in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: bulk mapping upsert vs. the previous two-queries-per-item loop.
+
+Usage:
+    PYTHONPATH=. python tests/bench_mapping_upsert.py [mappings] [database_url]
+
+Loads a firm with half of the mappings already present (so the upload is half
+updates, half inserts) into a fresh database (default: a temporary SQLite file)
+and times both paths. The legacy loop only runs up to 10k items.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.api.database import Base
+from src.api import models, schemas
+from src.api.services.mapping_upsert import upsert_mappings
+
+LEGACY_MAX_ITEMS = 10000
+
+
+def legacy_bulk_map(db, firm_id, mappings):
+    """bulk_create_mapping as it was: up to two SELECT ... first() per item."""
+    for mapping in mappings:
+        existing = None
+        if mapping.client_account_code:
+            existing = db.query(models.AccountMapping).filter(
+                models.AccountMapping.firm_id == firm_id,
+                models.AccountMapping.client_account_code == mapping.client_account_code
+            ).first()
+        if not existing:
+            existing = db.query(models.AccountMapping).filter(
+                models.AccountMapping.firm_id == firm_id,
+                models.AccountMapping.client_description == mapping.client_description
+            ).first()
+        if existing:
+            existing.standard_account_id = mapping.standard_account_id
+            if mapping.client_account_code:
+                existing.client_account_code = mapping.client_account_code
+        else:
+            db.add(models.AccountMapping(
+                firm_id=firm_id,
+                client_description=mapping.client_description,
+                client_account_code=mapping.client_account_code,
+                standard_account_id=mapping.standard_account_id
+            ))
+    db.commit()
+
+
+def fresh_session(url):
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    return db
+
+
+def seed(db, items):
+    db.execute(models.AccountMapping.__table__.insert(), [
+        {"firm_id": 1, "client_description": m.client_description,
+         "client_account_code": m.client_account_code, "standard_account_id": 1}
+        for m in items[::2]
+    ])
+    db.commit()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    url = sys.argv[2] if len(sys.argv) > 2 else None
+    tmp_dir = tempfile.mkdtemp()
+    items = [schemas.AccountMappingBase(client_description=f"Conta {i}", client_account_code=f"1.{i}",
+                                        standard_account_id=2) for i in range(n)]
+
+    db = fresh_session(url or f"sqlite:///{os.path.join(tmp_dir, 'bulk.db')}")
+    seed(db, items)
+    start = time.perf_counter()
+    stats = upsert_mappings(db, 1, items)
+    db.commit()
+    print(f"bulk upsert:  {n} items in {time.perf_counter() - start:.2f}s "
+          f"({stats.created} created, {stats.updated} updated, {len(stats.batches)} batches)")
+    db.close()
+
+    legacy_items = items[:LEGACY_MAX_ITEMS]
+    db = fresh_session(url or f"sqlite:///{os.path.join(tmp_dir, 'legacy.db')}")
+    seed(db, legacy_items)
+    start = time.perf_counter()
+    legacy_bulk_map(db, 1, legacy_items)
+    print(f"legacy loop:  {len(legacy_items)} items in {time.perf_counter() - start:.2f}s")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Benchmark: sampling engine over a large amount column.
+
+Usage:
+    PYTHONPATH=. python tests/bench_sampling.py [rows] [sample_size]
+
+Draws every sampling method over ``rows`` lognormal amounts (default 10M, 1%
+NULL) twice with the same seed, and reports the time of each draw and whether
+both draws selected the same rows.
+"""
+import sys
+import time
+
+import numpy as np
+
+from src.api.services.sampling import (
+    monetary_unit_sample, random_sample, sampling_rng, stratified_sample, systematic_sample
+)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    amounts = np.random.default_rng(0).lognormal(5, 2, n)
+    amounts[::100] = np.nan
+
+    methods = {
+        "random": lambda rng: random_sample(n, size, rng),
+        "systematic": lambda rng: systematic_sample(n, size, rng),
+        "mus systematic": lambda rng: monetary_unit_sample(amounts, size, rng).indexes,
+        "mus cell": lambda rng: monetary_unit_sample(amounts, size, rng, 'cell').indexes,
+        "stratified": lambda rng: stratified_sample(amounts, size, rng, boundaries=[100, 1000, 10000],
+                                                    certainty_threshold=1e6).indexes,
+    }
+    for label, draw in methods.items():
+        start = time.perf_counter()
+        first = draw(sampling_rng(42))
+        elapsed = time.perf_counter() - start
+        same = np.array_equal(first, draw(sampling_rng(42)))
+        print(f"{label:<15} {elapsed:6.3f}s  {len(first):6d} rows  reproducible={same}")
+
+
+if __name__ == '__main__':
+    main()
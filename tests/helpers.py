@@ -0,0 +1,63 @@
+from typing import NamedTuple
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.api.database import Base, get_db
+from src.api.deps import get_current_user
+from src.api import models
+
+
+class FirmSeed(NamedTuple):
+    firm: models.AuditFirm
+    user: models.User
+    client: models.Client
+    engagement: models.Engagement
+
+
+def make_sessionmaker() -> sessionmaker:
+    """Session factory over a fresh in-memory database shared by all its sessions."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def make_session():
+    return make_sessionmaker()()
+
+
+def seed_firm(db, client_name="Client", engagement_name="Test", **engagement_fields) -> FirmSeed:
+    """Firm with one auditor and one client engagement; flushed, left for the caller to commit."""
+    firm = models.AuditFirm(name="Firm", cnpj="00.000.000/0001-00")
+    db.add(firm)
+    db.flush()
+    user = models.User(email="auditor@example.com", firm_id=firm.id, role="auditor")
+    client = models.Client(name=client_name, firm_id=firm.id)
+    db.add_all([user, client])
+    db.flush()
+    engagement = models.Engagement(name=engagement_name, client_id=client.id, **engagement_fields)
+    db.add(engagement)
+    db.flush()
+    return FirmSeed(firm, user, client, engagement)
+
+
+def override_dependencies(test, Session, user):
+    """Routes `test`'s API requests to `Session` as `user` until the test ends."""
+    # Imported here so the database-only tests do not load the whole app
+    from src.api.main import app
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    overrides = mock.patch.dict(app.dependency_overrides, {
+        get_db: override_get_db,
+        get_current_user: lambda: user,
+    })
+    overrides.start()
+    test.addCleanup(overrides.stop)
@@ -0,0 +1,132 @@
+import unittest
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+from src.api.main import app
+from src.api import models
+from src.api.services.balance_cache import ensure_balances, etag_matches, refresh_balances
+from src.api.services.mapping_resolution import resolve_firm_mappings
+from tests.helpers import make_sessionmaker, override_dependencies, seed_firm
+
+
+class TestBalanceCache(unittest.TestCase):
+
+    def setUp(self):
+        Session = make_sessionmaker()
+        self.db = Session()
+
+        firm, self.user, _, self.engagement = seed_firm(self.db)
+        self.cash = models.StandardAccount(code="1.1.01", name="Caixa", type="Asset", template_type="br_gaap")
+        self.revenue = models.StandardAccount(code="3.1", name="Receitas", type="Revenue", template_type="br_gaap")
+        self.db.add_all([self.cash, self.revenue])
+        self.db.flush()
+        self.db.add(models.AccountMapping(firm_id=firm.id, client_description="Caixa",
+                                          client_account_code="10", standard_account_id=self.cash.id))
+        self.db.add_all([
+            models.Transaction(engagement_id=self.engagement.id, vendor="V", account_code="10", amount=100.0,
+                               date=datetime(2024, 1, 5)),
+            models.Transaction(engagement_id=self.engagement.id, vendor="V", account_code="10", amount=50.0,
+                               date=datetime(2024, 1, 20)),
+            models.Transaction(engagement_id=self.engagement.id, vendor="V", account_code="10", amount=25.0,
+                               date=datetime(2024, 2, 1)),
+            models.Transaction(engagement_id=self.engagement.id, vendor="V", account_code="10", amount=5.0),
+            models.Transaction(engagement_id=self.engagement.id, vendor="V", account_code="30", amount=-300.0,
+                               date=datetime(2024, 1, 5)),
+        ])
+        self.db.commit()
+        self.firm_id = firm.id
+        resolve_firm_mappings(self.db, firm.id)
+        self.db.commit()
+
+        override_dependencies(self, Session, self.user)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _balances(self):
+        return sorted((b.standard_account_id, b.period or "", b.balance, b.transaction_count)
+                      for b in self.db.query(models.EngagementBalance))
+
+    def test_refresh_by_account_and_month(self):
+        self.assertEqual(refresh_balances(self.db, self.engagement.id), 1)
+        self.db.commit()
+        self.assertEqual(self._balances(), sorted([
+            (self.cash.id, "2024-01", 150.0, 2),
+            (self.cash.id, "2024-02", 25.0, 1),
+            (self.cash.id, "", 5.0, 1),  # undated
+        ]))
+
+        self.assertEqual(refresh_balances(self.db, self.engagement.id), 2)
+        self.assertEqual(len(self._balances()), 3)
+
+    def test_ensure_balances_resolves_legacy_transactions(self):
+        # Loaded before mappings were stored on transactions: nothing resolved, no balances
+        self.db.query(models.Transaction).update({"mapping_id": None, "standard_account_id": None})
+        self.engagement.balances_version = None
+        self.db.commit()
+
+        self.assertEqual(ensure_balances(self.db, self.engagement), 1)
+        self.assertIn((self.cash.id, "2024-01", 150.0, 2), self._balances())
+        self.assertEqual(len(self._balances()), 3)
+
+    def test_one_balance_per_account_and_period(self):
+        refresh_balances(self.db, self.engagement.id)
+        self.db.commit()
+        self.db.add(models.EngagementBalance(engagement_id=self.engagement.id, standard_account_id=self.cash.id,
+                                             period="2024-01", balance=150.0, version=1))
+        with self.assertRaises(IntegrityError):
+            self.db.commit()
+        self.db.rollback()
+
+    def test_risk_matrix_of_another_firm(self):
+        other = models.AuditFirm(name="Other", cnpj="11.111.111/0001-11")
+        self.db.add(other)
+        self.db.flush()
+        self.db.add(models.AnalysisResult(engagement_id=self.engagement.id, test_type="materiality",
+                                          result={"global_materiality": 1000.0, "performance_materiality": 750.0}))
+        self.engagement.balances_version = None
+        self.db.commit()
+        url = f"/engagements/{self.engagement.id}/risk-matrix"
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.db.refresh(self.engagement)
+        self.engagement.balances_version = None
+        self.user.firm_id = other.id
+        self.db.commit()
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.db.refresh(self.engagement)
+        self.assertIsNone(self.engagement.balances_version)
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('W/"a", W/"b"', 'W/"b"'))
+        self.assertTrue(etag_matches('*', 'W/"b"'))
+        self.assertFalse(etag_matches(None, 'W/"b"'))
+
+    def test_financial_summary_etag_follows_mapping_changes(self):
+        url = f"/engagements/{self.engagement.id}/financial-summary"
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["assets"], 180.0)
+        etag = first.headers["etag"]
+
+        cached = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+
+        # A new mapping reaches the summary through re-resolution (task_resolve_mappings)
+        self.db.add(models.AccountMapping(firm_id=self.firm_id, client_description="Receitas",
+                                          client_account_code="30", standard_account_id=self.revenue.id))
+        self.db.commit()
+        resolve_firm_mappings(self.db, self.firm_id, on_change=lambda e: refresh_balances(self.db, e))
+        self.db.commit()
+
+        changed = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+        self.assertEqual(changed.json()["revenue"], -300.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
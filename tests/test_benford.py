@@ -1,7 +1,7 @@
 import unittest
 import math
 import random
-from src.scripts.benford_analysis import calculate_benford
+from src.scripts.benford_analysis import calculate_benford, benford_counts, calculate_benford_from_counts
 
 class TestBenfordAnalysis(unittest.TestCase):
 
@@ -148,5 +148,35 @@ class TestBenfordAnalysis(unittest.TestCase):
         res = calculate_benford([0.0, 0.0])
         self.assertEqual(res["sample_size"], 0)
 
+    def test_conformity_statistics(self):
+        """MAD, chi-square and KS are derived from the digit counts."""
+        # Log-uniform data follows Benford's Law closely
+        data = [round(10 ** (6 * i / 5000), 2) for i in range(5000)]
+        stats = calculate_benford(data)["statistics"]
+
+        self.assertEqual(stats["conformity"], "close")
+        self.assertLess(stats["chi_square"], stats["chi_square_critical"])
+        self.assertLess(stats["ks"], stats["ks_critical"])
+
+        biased = calculate_benford([900.0] * 90 + [100.0] * 10)["statistics"]
+        self.assertEqual(biased["conformity"], "nonconformity")
+        self.assertGreater(biased["chi_square"], biased["chi_square_critical"])
+
+    def test_recompute_from_counts(self):
+        """Counts are additive and reproduce the full result without the raw values."""
+        data = [float(v) for v in range(1, 3000, 7)]
+        first, second = benford_counts(data[:200]), benford_counts(data[200:])
+        merged = {name: [a + b for a, b in zip(first[name], second[name])] for name in first}
+
+        self.assertEqual(merged, benford_counts(data))
+        self.assertEqual(calculate_benford_from_counts(merged), calculate_benford(data))
+
+    def test_last_two_digits_min_amount(self):
+        """Amounts below 100 are left out of the last-two digit test, and the result says so."""
+        test = calculate_benford([12.0, 99.0, 100.0, 1234.0, 5678.9])["tests"]["last_two_digits"]
+        self.assertEqual(test["min_amount"], 100)
+        self.assertEqual(test["sample_size"], 3)
+        self.assertEqual([d["digit"] for d in test["details"] if d["count"]], [0, 34, 78])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy.exc import IntegrityError
+
+from src.api import models
+from src.api.services import ledger_snapshot
+from src.api.services.benford_sketch import update_benford_sketches, rebuild_benford_sketches, get_benford_counts
+from src.scripts.benford_analysis import benford_counts
+from tests.helpers import make_session
+
+
+class TestBenfordSketch(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(ledger_snapshot, "SNAPSHOT_DIR", tempfile.mkdtemp())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.db = make_session()
+        self.engagement = models.Engagement(name="Test")
+        self.db.add(self.engagement)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _insert(self, rows):
+        self.db.add_all([
+            models.Transaction(engagement_id=self.engagement.id, vendor="V", amount=a, account_code=c)
+            for a, c in rows
+        ])
+        update_benford_sketches(self.db, self.engagement.id, [a for a, _ in rows], [c for _, c in rows])
+        self.db.commit()
+
+    def test_incremental_updates_match_full_count(self):
+        first = [(123.45, "1.1"), (987.0, "1.1"), (15.5, "2.1")]
+        second = [(1500.0, "1.1"), (42.0, None), (0.0, "2.1")]
+        self._insert(first)
+        self._insert(second)
+
+        all_amounts = [a for a, _ in first + second]
+        self.assertEqual(get_benford_counts(self.db, [self.engagement.id]), benford_counts(all_amounts))
+
+        account_counts = get_benford_counts(self.db, [self.engagement.id], ["1.1"])
+        self.assertEqual(account_counts, benford_counts([123.45, 987.0, 1500.0]))
+        self.assertEqual(self.db.query(models.BenfordSketch).count(), 3)
+
+    def test_one_sketch_per_account(self):
+        self._insert([(123.45, "1.1")])
+        self.db.add(models.BenfordSketch(engagement_id=self.engagement.id, account_code="1.1",
+                                         counts=benford_counts([5.0]), row_count=1))
+        with self.assertRaises(IntegrityError):
+            self.db.flush()
+        self.db.rollback()
+
+    def test_rebuild_after_delete(self):
+        self._insert([(123.45, "1.1"), (987.0, "1.1")])
+        self.db.query(models.Transaction).filter(models.Transaction.amount == 987.0).delete()
+        rebuild_benford_sketches(self.db, self.engagement.id)
+        self.db.commit()
+
+        self.assertEqual(get_benford_counts(self.db, [self.engagement.id]), benford_counts([123.45]))
+
+    def test_legacy_engagement_is_sketched_on_first_access(self):
+        self.db.add(models.Transaction(engagement_id=self.engagement.id, vendor="V", amount=300.0))
+        self.db.commit()
+
+        self.assertEqual(get_benford_counts(self.db, [self.engagement.id]), benford_counts([300.0]))
+        self.assertEqual(self.db.query(models.BenfordSketch).count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
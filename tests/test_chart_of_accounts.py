@@ -0,0 +1,85 @@
+import unittest
+
+from src.api import models
+from src.api.services import chart_of_accounts
+from src.api.services.chart_of_accounts import (
+    account_tree, infer_parent_code, invalidate_account_trees, link_parents_by_code, rebuild_account_paths
+)
+from src.api.services.financial_rollup import account_rollup
+from src.api.services.mapping_resolution import resolve_firm_mappings
+from tests.helpers import make_session
+
+CODES = ["1", "1.1", "1.1.01", "1.1.02", "1.2", "2", "2.1", "2.1.01", "3"]
+
+
+class TestChartOfAccounts(unittest.TestCase):
+
+    def setUp(self):
+        invalidate_account_trees()
+        self.db = make_session()
+        self.accounts = {code: models.StandardAccount(code=code, name=code, template_type="br_gaap") for code in CODES}
+        self.db.add_all(self.accounts.values())
+        self.db.add(models.StandardAccount(code="200", name="Condo", template_type="condo"))
+        self.db.commit()
+        link_parents_by_code(self.db, "br_gaap")
+        rebuild_account_paths(self.db, "br_gaap")
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+        invalidate_account_trees()
+
+    def test_infer_parent_code(self):
+        self.assertEqual(infer_parent_code("1.1.01"), "1.1")
+        self.assertEqual(infer_parent_code("201"), "200")
+        self.assertIsNone(infer_parent_code("200"))
+        self.assertIsNone(infer_parent_code("1"))
+
+    def test_paths_and_levels(self):
+        a = self.accounts
+        self.assertEqual(a["1.1.01"].path, f"/{a['1'].id}/{a['1.1'].id}/{a['1.1.01'].id}/")
+        self.assertEqual((a["1"].level, a["2.1"].level, a["1.1.02"].level), (1, 2, 3))
+        self.assertEqual(rebuild_account_paths(self.db, "br_gaap"), 0)
+
+    def test_rollup_matches_prefix_sums(self):
+        amounts = {"1.1.01": 100.0, "1.1.02": 50.0, "1.2": 25.0, "2.1.01": -175.0, "3": 10.0}
+        tree = account_tree(self.db, "br_gaap")
+        totals = tree.rollup([self.accounts[c].id for c in amounts] + [999], list(amounts.values()) + [1e6])
+        for code in CODES:
+            expected = sum(v for k, v in amounts.items() if k == code or k.startswith(code + "."))
+            self.assertEqual(totals[self.accounts[code].id], expected, code)
+        self.assertEqual(sorted(tree.descendants(self.accounts["1.1"].id)),
+                         sorted(self.accounts[c].id for c in ["1.1", "1.1.01", "1.1.02"]))
+
+    def test_tree_is_cached_until_accounts_change(self):
+        tree = account_tree(self.db, "br_gaap")
+        self.assertIs(account_tree(self.db, "br_gaap"), tree)
+
+        self.db.add(models.StandardAccount(code="1.1.03", name="Estoques", template_type="br_gaap",
+                                           parent_id=self.accounts["1.1"].id))
+        self.db.commit()
+        rebuilt = account_tree(self.db, "br_gaap")
+        self.assertIsNot(rebuilt, tree)
+        self.assertEqual(len(rebuilt), len(CODES) + 1)  # path missing: placed from parent_id
+
+        rebuild_account_paths(self.db, "br_gaap")
+        self.assertNotIn("br_gaap", chart_of_accounts._trees)
+
+    def test_account_rollup(self):
+        engagement = models.Engagement(name="Test", chart_mode="standard")
+        self.db.add(engagement)
+        self.db.add(models.AccountMapping(firm_id=1, client_account_code="10",
+                                          standard_account_id=self.accounts["1.1.01"].id))
+        self.db.commit()
+        self.db.add_all([models.Transaction(engagement_id=engagement.id, vendor="V", account_code="10", amount=v)
+                         for v in (40.0, 2.0)])
+        resolve_firm_mappings(self.db, 1, [engagement.id])
+        self.db.commit()
+
+        rows = {r["code"]: r for r in account_rollup(self.db, engagement)}
+        self.assertEqual([rows[c]["balance"] for c in ["1", "1.1", "1.1.01", "1.2", "2"]], [42.0, 42.0, 42.0, 0.0, 0.0])
+        self.assertEqual(rows["1.1.01"]["level"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
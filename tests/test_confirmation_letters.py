@@ -0,0 +1,120 @@
+import io
+import unittest
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from PIL import Image as PILImage
+
+from src.api.main import app
+from src.api import models
+from src.api.services import confirmation_letters
+from src.api.services.confirmation_letters import (
+    LOGO_MAX_PIXELS, PARALLEL_MIN_LETTERS, LetterJob, prepare_logo, render_letters, stream_zip
+)
+from tests.helpers import make_sessionmaker, override_dependencies, seed_firm
+
+
+def png_bytes(size):
+    output = io.BytesIO()
+    PILImage.new("RGB", size, (200, 30, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def jobs(n):
+    return [LetterJob(f"bank_Banco_{i}.pdf", "bank", "Client SA", f"Banco {i}", "31/12/2024") for i in range(n)]
+
+
+class TestConfirmationLetters(unittest.TestCase):
+
+    def test_stream_zip(self):
+        entries = [("a.pdf", b"%PDF-a"), ("b.pdf", b"%PDF-b" * 1000)]
+        parts = list(stream_zip(iter(entries)))
+        self.assertEqual(len(parts), 3)  # One part per entry, then the central directory
+        with zipfile.ZipFile(io.BytesIO(b"".join(parts))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ["a.pdf", "b.pdf"])
+            self.assertEqual(archive.read("b.pdf"), b"%PDF-b" * 1000)
+
+    def test_prepare_logo(self):
+        logo = prepare_logo(png_bytes((3000, 900)))
+        with PILImage.open(io.BytesIO(logo)) as image:
+            self.assertEqual(image.format, "PNG")
+            self.assertLessEqual(image.size[0], LOGO_MAX_PIXELS[0])
+            self.assertLessEqual(image.size[1], LOGO_MAX_PIXELS[1])
+        self.assertIsNone(prepare_logo(b"not an image"))
+        self.assertIsNone(prepare_logo(None))
+
+    def test_serial_and_parallel_render_same_letters(self):
+        batch = jobs(PARALLEL_MIN_LETTERS)
+        logo = png_bytes((50, 20))
+        serial = dict(render_letters(batch, logo, workers=1))
+        parallel = dict(render_letters(batch, logo, workers=2))
+        self.assertEqual(set(serial), {job.filename for job in batch})
+        self.assertEqual(set(parallel), set(serial))
+        self.assertTrue(all(pdf.startswith(b"%PDF") for pdf in parallel.values()))
+
+    def test_batches_share_one_pool(self):
+        batch = jobs(PARALLEL_MIN_LETTERS)
+        with mock.patch.object(confirmation_letters, "_pool", None):
+            list(render_letters(batch, workers=2))
+            pool = confirmation_letters._pool
+            list(render_letters(batch, workers=2))
+            self.assertIsNotNone(pool)
+            self.assertIs(confirmation_letters._pool, pool)
+        pool.shutdown()
+
+    def test_fallback_renders_each_letter_once(self):
+        batch = jobs(PARALLEL_MIN_LETTERS)
+        with mock.patch.object(confirmation_letters, "_pool", None), \
+                mock.patch("src.api.services.confirmation_letters.ProcessPoolExecutor",
+                           side_effect=AssertionError("daemonic processes are not allowed to have children")):
+            names = [name for name, _ in render_letters(batch, workers=4)]
+        self.assertEqual(sorted(names), sorted(job.filename for job in batch))
+
+    def test_broken_pool_is_replaced(self):
+        batch = jobs(PARALLEL_MIN_LETTERS)
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool("A child process terminated abruptly")
+        with mock.patch.object(confirmation_letters, "_pool", broken):
+            names = [name for name, _ in render_letters(batch, workers=2)]
+            self.assertIsNone(confirmation_letters._pool)
+        self.assertEqual(sorted(names), sorted(job.filename for job in batch))
+        broken.shutdown.assert_called_once()
+
+
+class TestDownloadLetters(unittest.TestCase):
+
+    def setUp(self):
+        Session = make_sessionmaker()
+        self.db = Session()
+
+        _, self.user, client, self.engagement = seed_firm(self.db, "Client SA", "Audit 2024",
+                                                          end_date=datetime(2024, 12, 31))
+        client.logo_content = png_bytes((1200, 400))
+        self.db.add_all([
+            models.ConfirmationRequest(engagement_id=self.engagement.id, type="bank", recipient_name="Banco do Brasil"),
+            models.ConfirmationRequest(engagement_id=self.engagement.id, type="legal", recipient_name="Silva Advogados"),
+        ])
+        self.db.commit()
+
+        override_dependencies(self, Session, self.user)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_endpoint_streams_zip(self):
+        response = self.client.get(f"/circularization/engagements/{self.engagement.id}/download")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/zip")
+        self.assertIn("Circularizacoes_Client SA.zip", response.headers["content-disposition"])
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(sorted(archive.namelist()), ["bank_Banco_do_Brasil.pdf", "legal_Silva_Advogados.pdf"])
+            self.assertEqual(archive.read("bank_Banco_do_Brasil.pdf")[:4], b"%PDF")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from docx import Document
+
+from src.api.services import document_service
+from src.api.services.document_service import DocumentService
+
+
+class TestDocumentService(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.service = DocumentService(cache_size=2)
+
+    def make_template(self, name="letter.docx"):
+        doc = Document()
+        paragraph = doc.add_paragraph("Prezados, ")
+        run = paragraph.add_run("{{cli")  # Placeholder split across runs, as Word saves edited text
+        run.bold = True
+        paragraph.add_run("ent}} - exercício {{year}}.")
+        doc.add_table(rows=1, cols=1).cell(0, 0).text = "Total: {{amount}} {{unknown}}"
+        doc.sections[0].header.paragraphs[0].text = "{{client}}"
+        path = os.path.join(self.dir, name)
+        doc.save(path)
+        return path
+
+    def test_substitutes_everywhere_keeping_formatting(self):
+        path = self.make_template()
+        output = self.service.generate_from_template(path, {"client": "Alfa & Beta <Ltda>", "year": 2024,
+                                                            "amount": "1.000,00"})
+        doc = Document(output)
+        runs = doc.paragraphs[0].runs
+        self.assertEqual(doc.paragraphs[0].text, "Prezados, Alfa & Beta <Ltda> - exercício 2024.")
+        self.assertEqual((runs[1].text, runs[1].bold), ("Alfa & Beta <Ltda>", True))
+        self.assertEqual((runs[2].text, runs[2].bold), (" - exercício 2024.", None))
+        self.assertEqual(doc.tables[0].cell(0, 0).text, "Total: 1.000,00 {{unknown}}")
+        self.assertEqual(doc.sections[0].header.paragraphs[0].text, "Alfa & Beta <Ltda>")
+
+    def test_multiline_value(self):
+        doc = Document(self.service.generate_from_template(self.make_template(), {"client": "Alfa\nBeta"}))
+        self.assertEqual(doc.paragraphs[0].runs[1].text, "Alfa\nBeta")
+        self.assertEqual(len(doc.paragraphs), 1)
+
+    def test_batch_compiles_once(self):
+        path = self.make_template()
+        with mock.patch.object(document_service, "compile_template", wraps=document_service.compile_template) as compile:
+            outputs = list(self.service.generate_batch(path, [{"client": f"Cliente {i}"} for i in range(5)]))
+            self.service.generate_from_template(path, {"client": "Outro"})
+        self.assertEqual(compile.call_count, 1)
+        self.assertEqual([Document(o).paragraphs[0].runs[1].text for o in outputs],
+                         [f"Cliente {i}" for i in range(5)])
+
+    def test_recompiles_edited_template_and_evicts(self):
+        path = self.make_template()
+        self.service.generate_from_template(path, {})
+        doc = Document()
+        doc.add_paragraph("Novo modelo {{client}}")
+        doc.save(path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        output = Document(self.service.generate_from_template(path, {"client": "X"}))
+        self.assertEqual(output.paragraphs[0].text, "Novo modelo X")
+        self.assertEqual(len(self.service._templates), 1)
+
+        for name in ("b.docx", "c.docx"):
+            self.service.generate_from_template(self.make_template(name), {})
+        self.assertEqual(len(self.service._templates), 2)
+        self.assertNotIn(os.path.abspath(path), [key[0] for key in self.service._templates])
+
+    def test_missing_template(self):
+        with self.assertRaises(FileNotFoundError):
+            self.service.generate_from_template(os.path.join(self.dir, "none.docx"), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,19 @@
+import random
+import string
+import json
+import os
+import tempfile
 import unittest
-from src.scripts.duplicate_analysis import find_duplicates
+from unittest import mock
+
+from src.api import models, tasks
+from src.api.services import ledger_snapshot
+
+from src.scripts import duplicate_analysis
+from src.scripts.duplicate_analysis import (
+    find_duplicates, find_near_duplicates, match_shard, number_groups, shard_buckets, duplicate_buckets, VendorTable
+)
+from tests.helpers import make_sessionmaker, seed_firm
 
 class TestDuplicateAnalysis(unittest.TestCase):
 
@@ -53,6 +67,11 @@ class TestDuplicateAnalysis(unittest.TestCase):
         transactions = [
             {"id": 1, "vendor": "Vendor A", "amount": 100.00},
             {"id": 2, "vendor": "Vendor A", "amount": 100.01},
+        ]
+        result = find_duplicates(transactions)
+        self.assertEqual(len(result), 0)
+
+    def test_exact_match(self):
         """Test case where vendor and amount are exactly the same."""
         transactions = [
             {"id": 1, "vendor": "Fornecedor A", "amount": 100.0},
@@ -63,7 +82,7 @@ class TestDuplicateAnalysis(unittest.TestCase):
         self.assertEqual(result[0]["similarity_score"], 100)
         self.assertEqual(len(result[0]["transactions"]), 2)
 
-    def test_fuzzy_duplicates(self):
+    def test_fuzzy_duplicates_similarity_score(self):
         """Test case: 'Fornecedor Alpha' vs 'Fornecedor Alpha S.A.' (same amount)."""
         transactions = [
             {"id": 1, "vendor": "Fornecedor Alpha", "amount": 500.0},
@@ -101,28 +120,44 @@ class TestDuplicateAnalysis(unittest.TestCase):
         # id 1 and id 3 are < 7 days.
         # id 3 and id 2 are < 7 days (5 vs 10 = 5).
 
-        # Logic:
-        # Compare 1 vs 2 -> Fail date.
-        # Compare 1 vs 3 -> Match. Group [1, 3].
-        # Compare 2 vs 3 -> Match. Group [2, 3]??
-        # My implementation groups by connected pairs?
-        # No, my implementation iterates:
-        # i=0 (id 1):
-        #   j=1 (id 2): date fail.
-        #   j=2 (id 3): date pass. Group=[1, 3]. Visited 3.
-        # i=1 (id 2):
-        #   j=2 (id 3): visited. Skip.
-        # Result: Group [1, 3]. id 2 is left out.
-
-        # Ideally, it should find all connected components, but the logic I wrote is greedy/simple.
-        # It finds [1, 3].
+        # Matched pairs are merged with union-find, so the transitive
+        # chain 1 ~ 3 ~ 2 becomes a single group even though 1 and 2 are 9 days apart.
 
         result = find_duplicates(transactions)
         self.assertEqual(len(result), 1)
         ids = [t['id'] for t in result[0]['transactions']]
-        self.assertIn(1, ids)
-        self.assertIn(3, ids)
-        self.assertNotIn(2, ids)
+        self.assertEqual(sorted(ids), [1, 2, 3])
+
+    def test_date_window(self):
+        transactions = [
+            {"id": 1, "vendor": "Vendor A", "amount": 100.00, "date": "2023-01-01"},
+            {"id": 2, "vendor": "Vendor A", "amount": 100.00, "date": "2023-01-10"},
+        ]
+        self.assertEqual(find_duplicates(transactions), [])
+
+    def test_large_bucket_is_blocked(self):
+        """A round amount shared by many unrelated vendors still finds the true duplicate."""
+        rng = random.Random(7)
+        names = [''.join(rng.choice(string.ascii_lowercase) for _ in range(10)) for _ in range(2000)]
+        transactions = [
+            {"id": i, "vendor": f"{name} Servicos Ltda", "amount": 1000.0}
+            for i, name in enumerate(names)
+        ]
+        transactions.append({"id": "dup", "vendor": f"{names[42]} Servicos Ltda.", "amount": 1000.0})
+
+        result = find_duplicates(transactions)
+        groups = [sorted(str(t['id']) for t in g['transactions']) for g in result]
+        self.assertIn(["42", "dup"], groups)
+
+    def test_parallel_matches_serial(self):
+        """Sharding buckets across processes yields the same groups and group ids."""
+        transactions = random_ledger()
+        serial = find_duplicates(transactions, workers=1)
+        with mock.patch.object(duplicate_analysis, "PARALLEL_MIN_ROWS", 0):
+            parallel = find_duplicates(transactions, workers=2)
+        self.assertTrue(serial)
+        self.assertEqual(parallel, serial)
+
     def test_negative_case_different_amounts(self):
         """Test case: Similar vendors, different amounts."""
         transactions = [
@@ -132,8 +167,97 @@ class TestDuplicateAnalysis(unittest.TestCase):
         result = find_duplicates(transactions)
         self.assertEqual(len(result), 0)
 
+    def test_vendor_table_canonicalizes_once(self):
+        table = VendorTable(known_ids={"a fornecedor ltda": 7})
+        a = table.signature("Fornecedor A Ltda.")
+        b = table.signature("FORNECEDOR  A, LTDA")
+        c = table.signature("Fornecedor B Ltda")
+
+        self.assertEqual(a.vendor_id, 7)
+        self.assertIs(a, table.signature("Fornecedor A Ltda."))
+        self.assertEqual(a.vendor_id, b.vendor_id)
+        self.assertNotEqual(a.vendor_id, c.vendor_id)
+        self.assertEqual(table.similarity(a, b), 100)
+        self.assertEqual(table.similarity(table.signature(""), table.signature("")), 0)
+
+    def test_near_duplicates_amount_tolerance(self):
+        transactions = [
+            {"id": 1, "vendor": "Fornecedor Alpha", "amount": 1000.00, "date": "2023-01-01"},
+            {"id": 2, "vendor": "Fornecedor Alpha S.A.", "amount": 999.99, "date": "2023-01-03"},
+            {"id": 3, "vendor": "Fornecedor Alpha", "amount": 1200.00, "date": "2023-01-02"},
+            {"id": 4, "vendor": "Outro Fornecedor", "amount": 1000.00, "date": "2023-01-01"},
+        ]
+        self.assertEqual(find_duplicates(transactions), [])
+
+        result = find_near_duplicates(transactions)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(sorted(t["id"] for t in result[0]["transactions"]), [1, 2])
+        self.assertEqual(result[0]["amount_range"], [999.99, 1000.00])
+
+        # 1200 is within 20% of 1000
+        result = find_near_duplicates(transactions, amount_tolerance_pct=0.2)
+        self.assertEqual(sorted(t["id"] for t in result[0]["transactions"]), [1, 2, 3])
+
     def test_empty_input(self):
         self.assertEqual(find_duplicates([]), [])
 
+def random_ledger(n=600, seed=11):
+    rng = random.Random(seed)
+    vendors = [''.join(rng.choice(string.ascii_lowercase) for _ in range(8)) for _ in range(50)]
+    transactions = []
+    for i in range(n):
+        vendor = rng.choice(vendors)
+        if rng.random() < 0.2:
+            vendor = vendor + " Ltda"
+        transactions.append({"id": i, "vendor": vendor, "amount": float(rng.choice([100, 250, 999.9, 1000]))})
+    return transactions
+
+
+class TestDuplicateShards(unittest.TestCase):
+
+    def test_json_shards_match_serial(self):
+        """Shards survive the JSON round trip of Celery messages and give the serial groups."""
+        transactions = random_ledger()
+        shards = json.loads(json.dumps(shard_buckets(duplicate_buckets(transactions), 3)))
+        results = json.loads(json.dumps([match_shard(shard, 85, 7, {}) for shard in reversed(shards)]))
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(number_groups(results), find_duplicates(transactions))
+
+    def test_task_fans_out_shards(self):
+        tmp = tempfile.mkdtemp()
+        Session = make_sessionmaker()
+        db = Session()
+        engagement = seed_firm(db, engagement_name="Ledger").engagement
+        db.add_all([models.Transaction(engagement_id=engagement.id, vendor=t["vendor"], amount=t["amount"])
+                    for t in random_ledger()])
+        db.commit()
+        engagement_id = engagement.id
+        db.close()
+
+        replaced = []
+        with mock.patch.object(tasks, "SessionLocal", Session), \
+                mock.patch.object(ledger_snapshot, "SNAPSHOT_DIR", os.path.join(tmp, "snapshots")):
+            serial = tasks.task_run_duplicates(engagement_id, None)
+            with mock.patch.object(tasks, "DUPLICATE_WORKERS", 2), \
+                    mock.patch.object(duplicate_analysis, "PARALLEL_MIN_ROWS", 0), \
+                    mock.patch.object(tasks.task_run_duplicates, "replace", side_effect=replaced.append):
+                tasks.task_run_duplicates(engagement_id, None)
+
+            # What the workers run, with arguments as they arrive from the broker
+            workflow = replaced[0]
+            shard_results = [
+                tasks.task_match_duplicate_shard(*json.loads(json.dumps(header.args)))
+                for header in workflow.tasks
+            ]
+            saved = tasks.task_save_duplicate_shards(json.loads(json.dumps(shard_results)), *workflow.body.args)
+
+        self.assertGreater(len(workflow.tasks), 1)
+        db = Session()
+        results = {r.id: r.result["duplicates"] for r in db.query(models.AnalysisResult)}
+        db.close()
+        self.assertTrue(results[serial["result_id"]])
+        self.assertEqual(results[saved["result_id"]], results[serial["result_id"]])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from src.api import models
+from src.api.services.financial_rollup import REPORT_PREFIXES, rollup_balances
+from src.api.services.mapping_resolution import resolve_firm_mappings
+from tests.helpers import make_session
+
+
+def python_rollup(db, engagement, firm_id):
+    """The per-row aggregation the financial statements route used to do in Python."""
+    mappings = db.query(models.AccountMapping).filter(models.AccountMapping.firm_id == firm_id).all()
+    mapping_dict = {m.client_account_code: m.standard_account_id for m in mappings if m.client_account_code}
+    std_map = {sa.id: sa for sa in db.query(models.StandardAccount).filter(
+        models.StandardAccount.template_type == "br_gaap").all()}
+    std_balances = {}
+    for t in db.query(models.Transaction).filter(models.Transaction.engagement_id == engagement.id):
+        std_id = mapping_dict.get(t.account_code)
+        if std_id in std_map:
+            code = std_map[std_id].code
+            std_balances[code] = std_balances.get(code, 0.0) + (t.amount or 0.0)
+    return {p: sum(v for k, v in std_balances.items() if k.startswith(p)) for p in REPORT_PREFIXES}
+
+
+class TestFinancialRollup(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_session()
+
+        self.engagement = models.Engagement(name="Test", chart_mode="standard")
+        other = models.Engagement(name="Other", chart_mode="standard")
+        self.db.add_all([self.engagement, other])
+        accounts = {code: models.StandardAccount(code=code, name=code, template_type="br_gaap")
+                    for code in ["1.1.01", "1.2.01", "2.1.01", "2.3.01", "201", "3.1", "4.1"]}
+        custom = models.StandardAccount(code="1.1.99", name="Custom", template_type="custom")
+        self.db.add_all(list(accounts.values()) + [custom])
+        self.db.commit()
+
+        self.db.add_all([
+            models.AccountMapping(firm_id=1, client_account_code="100", standard_account_id=accounts["2.1.01"].id),
+            # Remapped later: the most recent mapping wins
+            models.AccountMapping(firm_id=1, client_account_code="100", standard_account_id=accounts["1.1.01"].id),
+            models.AccountMapping(firm_id=1, client_account_code="110", standard_account_id=accounts["1.2.01"].id),
+            models.AccountMapping(firm_id=1, client_account_code="200", standard_account_id=accounts["2.3.01"].id),
+            models.AccountMapping(firm_id=1, client_account_code="201", standard_account_id=accounts["201"].id),
+            models.AccountMapping(firm_id=1, client_account_code="300", standard_account_id=accounts["3.1"].id),
+            models.AccountMapping(firm_id=1, client_account_code="400", standard_account_id=accounts["4.1"].id),
+            models.AccountMapping(firm_id=1, client_account_code="999", standard_account_id=custom.id),
+            models.AccountMapping(firm_id=2, client_account_code="110", standard_account_id=accounts["4.1"].id),
+            models.AccountMapping(firm_id=1, client_description="No code", standard_account_id=accounts["3.1"].id),
+        ])
+        rows = [("100", 500.0), ("100", 250.0), ("110", 1000.0), ("200", -900.0), ("201", -50.0),
+                ("300", -2000.0), ("400", 1200.0), ("400", None), ("999", 77.0), ("unmapped", 5.0), (None, 3.0)]
+        self.db.add_all([models.Transaction(engagement_id=self.engagement.id, vendor="V", account_code=code, amount=amount)
+                         for code, amount in rows])
+        self.db.add(models.Transaction(engagement_id=other.id, vendor="V", account_code="100", amount=10000.0))
+        self.db.commit()
+        resolve_firm_mappings(self.db, 1, [self.engagement.id, other.id])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_matches_python_rollup(self):
+        balances = rollup_balances(self.db, self.engagement)
+        expected = python_rollup(self.db, self.engagement, firm_id=1)
+        for prefix in REPORT_PREFIXES:
+            self.assertAlmostEqual(balances[prefix], expected[prefix])
+        self.assertEqual(balances["1.1"], 750.0)
+        self.assertEqual(balances["2"], -950.0)  # "2" also covers the condominium code "201"
+        self.assertEqual(balances["2.2"], 0.0)
+        self.assertEqual(rollup_balances(self.db, self.engagement, prefixes=("1",))["1"], 1750.0)  # not the other engagement
+
+    def test_client_custom_chart(self):
+        client = models.Client(name="Client", firm_id=1)
+        self.db.add(client)
+        self.db.flush()
+        self.engagement.chart_mode = "client_custom"
+        self.engagement.client_id = client.id
+        self.db.commit()
+        balances = rollup_balances(self.db, self.engagement, prefixes=("1", "3"))
+        self.assertEqual(balances, {"1": 0.0, "3": 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 import io
+import pandas as pd
 import pytest
 from fastapi import UploadFile
-from src.api.services.ingestion import TrialBalanceIngestion
+from src.api.services.ingestion import TrialBalanceIngestion, clean_currency, clean_currency_column
 
 def test_csv_ingestion_valid():
     # Emulating a Portuguese CSV with semicolon and commas
@@ -51,3 +52,23 @@ def test_missing_columns():
     assert result["valid"] is False
     assert "errors" in result
     assert any("Account Code" in e for e in result["errors"])
+
+def test_clean_currency_column_formats():
+    br = pd.Series(["R$ 1.000,00", "-2.500,50", "1000,00", None, "", "abc"])
+    assert clean_currency_column(br).tolist() == [1000.0, -2500.5, 1000.0, 0.0, 0.0, 0.0]
+
+    us = pd.Series(["1,000.00", "2.5", "3"])
+    assert clean_currency_column(us).tolist() == [1000.0, 2.5, 3.0]
+
+    # Mixed column: each cell is resolved on its own, numbers pass through
+    mixed = pd.Series(["1.000,00", "1,000.00", "12,5", "12.5", 7, 2.5])
+    result = clean_currency_column(mixed)
+    assert result.dtype == "float64"
+    assert result.tolist() == [1000.0, 1000.0, 12.5, 12.5, 7.0, 2.5]
+
+
+def test_clean_currency_column_matches_per_cell_parser():
+    cells = ["1.000,00", " ", "1\t2", "R$ 10", "-3,5", "1_000", "inf", "1,000,000", "2.5.1", None]
+    for column in (cells, [c for c in cells if c is None or "," in c or c.strip() == ""]):
+        series = pd.Series(column, dtype=object)
+        assert clean_currency_column(series).tolist() == [clean_currency(c) for c in column]
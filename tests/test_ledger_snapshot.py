@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+
+from src.api import models
+from src.api.services import ledger_snapshot
+from src.api.services.ledger_snapshot import (
+    current_snapshot, ledger_columns, load_columns, snapshot_frame, verify_snapshot, write_snapshot
+)
+from src.api.tasks import snapshot_transactions
+from tests.helpers import make_session
+
+
+class TestLedgerSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(ledger_snapshot, "SNAPSHOT_DIR", tempfile.mkdtemp())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.db = make_session()
+        self.engagement = models.Engagement(name="Test")
+        self.db.add(self.engagement)
+        self.db.commit()
+
+        self.db.add_all([
+            models.Transaction(engagement_id=self.engagement.id, vendor="Acme", amount=100.5,
+                               date=datetime(2024, 1, 15), account_code="1.1"),
+            models.Transaction(engagement_id=self.engagement.id, vendor="Beta", amount=None, account_code=None),
+            models.Transaction(engagement_id=self.engagement.id, vendor="Acme", amount=7.0, account_code="1.1"),
+        ])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_snapshot_round_trip(self):
+        snapshot = write_snapshot(self.db, self.engagement.id)
+        self.db.commit()
+        self.assertEqual((snapshot.version, snapshot.row_count), (1, 3))
+        self.assertTrue(verify_snapshot(snapshot))
+
+        columns = load_columns(snapshot, ['amount', 'vendor'])
+        self.assertIsInstance(columns['amount'], np.memmap)
+        codes, values = columns['vendor']
+        self.assertEqual([values[c] for c in codes], ["Acme", "Beta", "Acme"])
+
+        frame = snapshot_frame(self.db, self.engagement.id)
+        self.assertEqual(frame['account_code'].tolist(), ["1.1", None, "1.1"])
+        self.assertEqual(snapshot_transactions(frame)[0],
+                         {"id": 1, "vendor": "Acme", "amount": 100.5, "date": "2024-01-15 00:00:00"})
+        self.assertIsNone(snapshot_transactions(frame)[1]["amount"])
+        self.assertIsNone(snapshot_transactions(frame)[1]["date"])
+
+    def test_ledger_columns(self):
+        ledger = ledger_columns(self.db, self.engagement.id)
+        self.db.commit()
+
+        self.assertEqual(len(ledger), 3)
+        self.assertIsInstance(ledger.amount, np.memmap)
+        np.testing.assert_array_equal(ledger.amount, [100.5, np.nan, 7.0])
+        self.assertTrue(np.isnat(ledger.date[1]))
+        np.testing.assert_array_equal(ledger.account_mask(["1.1"]), [True, False, True])
+
+        self.assertEqual(ledger.rows([2, 1], columns=('id', 'vendor', 'amount', 'date')), [
+            {"id": 3, "vendor": "Acme", "amount": 7.0, "date": None},
+            {"id": 2, "vendor": "Beta", "amount": None, "date": None},
+        ])
+        self.assertEqual(ledger.rows([0])[0]["date"], "2024-01-15 00:00:00")
+
+    def test_stale_snapshot_is_rebuilt_and_old_versions_pruned(self):
+        first = current_snapshot(self.db, self.engagement.id)
+        self.db.commit()
+        self.assertIs(current_snapshot(self.db, self.engagement.id), first)
+
+        for amount in (1.0, 2.0):
+            self.db.add(models.Transaction(engagement_id=self.engagement.id, vendor="New", amount=amount))
+            self.db.commit()
+            latest = current_snapshot(self.db, self.engagement.id)
+            self.db.commit()
+
+        self.assertEqual((latest.version, latest.row_count), (3, 5))
+        self.assertEqual([s.version for s in self.db.query(models.LedgerSnapshot)], [2, 3])
+        self.assertFalse(os.path.exists(first.path))
+
+    def test_pruned_files_removed_after_commit(self):
+        first = write_snapshot(self.db, self.engagement.id)
+        self.db.commit()
+        write_snapshot(self.db, self.engagement.id)
+        self.db.commit()
+        write_snapshot(self.db, self.engagement.id)
+        self.db.flush()
+        # Version 1 is out of the catalog, but other sessions may still read it
+        self.assertTrue(os.path.isdir(first.path))
+        self.db.rollback()
+        self.assertTrue(os.path.isdir(first.path))
+
+        write_snapshot(self.db, self.engagement.id)
+        self.db.commit()
+        self.assertFalse(os.path.exists(first.path))
+
+    def test_existing_version_directory_is_kept(self):
+        # Left by a rolled back write: a reader may hold it, so the next version is taken
+        stray = os.path.join(ledger_snapshot.SNAPSHOT_DIR, f"engagement_{self.engagement.id}", "v000001")
+        os.makedirs(stray)
+        snapshot = write_snapshot(self.db, self.engagement.id)
+        self.db.commit()
+        self.assertEqual(snapshot.version, 2)
+        self.assertTrue(os.path.isdir(stray))
+        self.assertTrue(verify_snapshot(snapshot))
+
+
+if __name__ == '__main__':
+    unittest.main()
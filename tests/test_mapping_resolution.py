@@ -0,0 +1,98 @@
+import io
+import unittest
+
+import pandas as pd
+
+from src.api import models
+from src.api.services.mapping_resolution import (
+    backfill_description_keys, description_key, load_mapping_lookup, normalize_description, resolve_firm_mappings
+)
+from src.api.services.transaction_ingest import ingest_transactions
+from tests.helpers import make_session, seed_firm
+
+
+class TestMappingResolution(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_session()
+        self.firm, _, _, self.engagement = seed_firm(self.db)
+        self.cash = models.StandardAccount(code="1.1.01", name="Caixa", template_type="br_gaap")
+        self.suppliers = models.StandardAccount(code="2.1.01", name="Fornecedores", template_type="br_gaap")
+        self.db.add_all([self.cash, self.suppliers])
+        self.db.flush()
+        self.by_code = models.AccountMapping(firm_id=self.firm.id, client_description="Caixa Geral",
+                                             client_account_code="1.10", standard_account_id=self.cash.id)
+        self.by_description = models.AccountMapping(firm_id=self.firm.id, client_description="Fornecedores",
+                                                    standard_account_id=self.suppliers.id)
+        self.db.add_all([self.by_code, self.by_description])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _stored(self):
+        return [(t.account_code, t.mapping_id, t.standard_account_id)
+                for t in self.db.query(models.Transaction).order_by(models.Transaction.id)]
+
+    def test_resolve_columns_prefers_code(self):
+        lookup = load_mapping_lookup(self.db, self.firm.id)
+        resolved = lookup.resolve_columns(pd.Series(["1.10", "9", None, "1.10"]),
+                                          pd.Series(["Fornecedores", "Fornecedores", "Outros", None]))
+        self.assertEqual(resolved['standard_account_id'].tolist(),
+                         [self.cash.id, self.suppliers.id, pd.NA, self.cash.id])
+        self.assertEqual([lookup.resolve(c, n) for c, n in [("1.10", "Fornecedores"), ("9", "Fornecedores"), (None, "Outros")]],
+                         [(self.by_code.id, self.cash.id), (self.by_description.id, self.suppliers.id), (None, None)])
+
+    def test_description_key_matches_spelling_variants(self):
+        self.assertEqual(normalize_description("  Depreciação - Veículos/Máquinas "), "depreciacaoveiculosmaquinas")
+        self.assertEqual(description_key("FORNECEDORES."), description_key("fornecedores"))
+        self.assertNotEqual(description_key("Fornecedores"), description_key("Fornecedores 2"))
+        self.assertIsNone(description_key(" - "))
+
+        lookup = load_mapping_lookup(self.db, self.firm.id)
+        resolved = lookup.resolve_columns(pd.Series(["7", "8"]), pd.Series(["FORNECEDORES ", "Forneçedores"]))
+        self.assertEqual(resolved['standard_account_id'].tolist(), [self.suppliers.id, self.suppliers.id])
+        self.assertEqual(lookup.resolve(None, "caixa-geral"), (self.by_code.id, self.cash.id))
+
+    def test_backfill_description_keys(self):
+        self.assertEqual(backfill_description_keys(self.db), 2)
+        self.db.commit()
+        self.db.refresh(self.by_description)
+        self.assertEqual(self.by_description.description_key, description_key("Fornecedores"))
+        self.assertEqual(backfill_description_keys(self.db), 0)
+
+    def test_ingest_and_re_resolution(self):
+        ingest_transactions(self.db, self.engagement.id, self.firm.id, io.BytesIO(
+            b"vendor,amount,account_code,account_name\n"
+            b"A,10,1.10,Caixa\n"
+            b"B,20,2.01,Fornecedores\n"
+            b"C,30,3.01,Receitas\n"
+            b"D,40,,\n"
+        ))
+        self.db.commit()
+        self.assertEqual(self._stored(), [
+            ("1.10", self.by_code.id, self.cash.id),
+            ("2.01", self.by_description.id, self.suppliers.id),
+            ("3.01", None, None),
+            (None, None, None),
+        ])
+
+        # Remap the code and map the revenue account; only those pairs change
+        self.by_code.standard_account_id = self.suppliers.id
+        revenue = models.AccountMapping(firm_id=self.firm.id, client_description="Receitas",
+                                        client_account_code="3.01", standard_account_id=self.cash.id)
+        self.db.add(revenue)
+        self.db.commit()
+        self.assertEqual(resolve_firm_mappings(self.db, self.firm.id), 2)
+        self.db.commit()
+        self.assertEqual(self._stored(), [
+            ("1.10", self.by_code.id, self.suppliers.id),
+            ("2.01", self.by_description.id, self.suppliers.id),
+            ("3.01", revenue.id, self.cash.id),
+            (None, None, None),
+        ])
+        self.assertEqual(resolve_firm_mappings(self.db, self.firm.id), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+from src.api.main import app
+from src.api import models
+from src.api.services.mapping_suggestions import (
+    SuggestionIndex, invalidate_suggestion_indexes, suggest_mappings, suggestion_index
+)
+from tests.helpers import make_sessionmaker, override_dependencies, seed_firm
+
+
+class TestSuggestionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SuggestionIndex(
+            [(1, "1.1.01", "Caixa e Equivalentes"), (2, "1.1.02", "Bancos Conta Movimento"),
+             (3, "2.1.01", "Fornecedores Nacionais"), (4, "3.1.01", "Receita de Vendas")],
+            [("CEF c/c 123", 2), ("Fornec. Diversos", 3), ("Caixa Pequeno", 1)],
+        )
+
+    def test_exact_history_match_first(self):
+        [candidates] = self.index.suggest(["cef C/C 123"])
+        self.assertEqual(candidates[0]["standard_account_id"], 2)
+        self.assertEqual(candidates[0]["score"], 1.0)
+
+    def test_similar_wording_ranks_account(self):
+        candidates = self.index.suggest(["Banco Itau Conta Movimento", "Receitas de vendas de mercadorias", "zzzz"])
+        self.assertEqual(candidates[0][0]["standard_account_id"], 2)
+        self.assertEqual(candidates[1][0]["standard_account_id"], 4)
+        self.assertEqual(candidates[2], [])
+        scores = [c["score"] for c in candidates[0]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertLessEqual(len(candidates[0]), 3)
+
+    def test_history_pulls_wording_towards_account(self):
+        [candidates] = self.index.suggest(["Fornec. Diversos Ltda"])
+        self.assertEqual(candidates[0]["standard_account_id"], 3)
+
+    def test_shared_columns_score_like_separate_ngrams(self):
+        # Every 3-gram of "xyzw" is only in the first account: they share one column
+        index = SuggestionIndex([(1, "1", "xyzw"), (2, "2", "xyab")], [])
+        self.assertLess(index._feature_column.max() + 1, len(index.vocabulary))
+        [candidates] = index.suggest(["xyzw"])
+        self.assertEqual(candidates[0], {"standard_account_id": 1, "code": "1", "name": "xyzw", "score": 1.0})
+
+    def test_blocks_match_single_pass(self):
+        descriptions = [f"Bancos {i}" for i in range(50)] + ["Caixa Pequeno"] * 3
+        with mock.patch("src.api.services.mapping_suggestions.SUGGESTION_CHUNK_ROWS", 7):
+            chunked = self.index.suggest(descriptions)
+        self.assertEqual(chunked, self.index.suggest(descriptions))
+
+
+class TestSuggestMappings(unittest.TestCase):
+
+    def setUp(self):
+        invalidate_suggestion_indexes()
+        self.addCleanup(invalidate_suggestion_indexes)
+        Session = make_sessionmaker()
+        self.db = Session()
+
+        firm, self.user, _, _ = seed_firm(self.db)
+        self.firm_id = firm.id
+        self.cash = models.StandardAccount(code="1.1.01", name="Caixa", type="Asset", template_type="br_gaap")
+        self.banks = models.StandardAccount(code="1.1.02", name="Bancos", type="Asset", template_type="br_gaap")
+        self.db.add_all([self.cash, self.banks])
+        self.db.commit()
+
+        override_dependencies(self, Session, self.user)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_index_cached_until_mappings_change(self):
+        index = suggestion_index(self.db, self.firm_id)
+        self.assertIs(suggestion_index(self.db, self.firm_id), index)
+
+        self.db.add(models.AccountMapping(firm_id=self.firm_id, client_description="Fundo Fixo",
+                                          standard_account_id=self.cash.id))
+        self.db.commit()
+        rebuilt = suggestion_index(self.db, self.firm_id)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(suggest_mappings(self.db, self.firm_id, ["FUNDO FIXO"])["FUNDO FIXO"][0]["score"], 1.0)
+
+        # Re-mapped in place (same count and ids), e.g. by another process
+        self.db.query(models.AccountMapping).update({"standard_account_id": self.banks.id})
+        self.db.commit()
+        [candidate] = suggest_mappings(self.db, self.firm_id, ["FUNDO FIXO"], top_k=1)["FUNDO FIXO"]
+        self.assertEqual((candidate["standard_account_id"], candidate["score"]), (self.banks.id, 1.0))
+        rebuilt = suggestion_index(self.db, self.firm_id)
+
+        invalidate_suggestion_indexes(self.firm_id)
+        self.assertIsNot(suggestion_index(self.db, self.firm_id), rebuilt)
+
+    def test_suggestions_endpoint(self):
+        response = self.client.post("/mapping/suggestions?top_k=1", json=["Bancos Conta Corrente"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["Bancos Conta Corrente"][0]["standard_account_id"], self.banks.id)
+        self.assertEqual(len(response.json()["Bancos Conta Corrente"]), 1)
+
+    def test_bulk_map_integrity_error_is_bad_request(self):
+        # Batches are flushed inside upsert_mappings, before the commit
+        error = IntegrityError("INSERT INTO account_mappings", {}, Exception("UNIQUE constraint failed"))
+        with mock.patch("src.api.routes.mapping.upsert_mappings", side_effect=error), \
+                mock.patch("src.api.routes.mapping.task_resolve_mappings") as resolve:
+            response = self.client.post("/mapping/bulk-map", json=[
+                {"client_description": "Caixa", "standard_account_id": self.cash.id}])
+        self.assertEqual(response.status_code, 400)
+        resolve.delay.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
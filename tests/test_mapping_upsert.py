@@ -0,0 +1,69 @@
+import unittest
+
+from src.api import models, schemas
+from src.api.services.mapping_resolution import description_key
+from src.api.services.mapping_upsert import upsert_mappings
+from tests.helpers import make_session
+
+
+class TestMappingUpsert(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_session()
+        self.db.add_all([
+            models.AccountMapping(firm_id=1, client_description="Caixa", client_account_code="10", standard_account_id=1),
+            models.AccountMapping(firm_id=1, client_description="Bancos", standard_account_id=1),
+            models.AccountMapping(firm_id=2, client_description="Estoques", client_account_code="30", standard_account_id=1),
+        ])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _mappings(self, firm_id):
+        return sorted((m.client_account_code or "", m.client_description, m.standard_account_id)
+                      for m in self.db.query(models.AccountMapping).filter(models.AccountMapping.firm_id == firm_id))
+
+    def test_updates_by_code_then_description_and_inserts(self):
+        items = [
+            schemas.AccountMappingBase(client_description="Caixa Geral", client_account_code="10", standard_account_id=5),
+            schemas.AccountMappingBase(client_description="Bancos", client_account_code="11", standard_account_id=6),
+            schemas.AccountMappingBase(client_description="Estoques", client_account_code="30", standard_account_id=7),
+            # Repeated within the upload: updates the row created just above
+            schemas.AccountMappingBase(client_description="Estoques", client_account_code="30", standard_account_id=8),
+            schemas.AccountMappingBase(client_description="Outros", standard_account_id=9),
+        ]
+        stats = upsert_mappings(self.db, 1, items, batch_size=1)
+        self.db.commit()
+
+        self.assertEqual((stats.created, stats.updated), (2, 2))
+        self.assertEqual(len(stats.batches), 4)
+        self.assertEqual(self._mappings(1), [
+            ("", "Outros", 9),
+            ("10", "Caixa", 5),
+            ("11", "Bancos", 6),
+            ("30", "Estoques", 8),
+        ])
+        self.assertEqual(self._mappings(2), [("30", "Estoques", 1)])
+
+    def test_spelling_variants_update_same_mapping(self):
+        items = [
+            schemas.AccountMappingBase(client_description="BANCOS.", standard_account_id=4),
+            schemas.AccountMappingBase(client_description="Bancos Conta Movimento", standard_account_id=3),
+        ]
+        stats = upsert_mappings(self.db, 1, items)
+        self.db.commit()
+
+        self.assertEqual((stats.created, stats.updated), (1, 1))
+        self.assertEqual(self._mappings(1), [
+            ("", "Bancos", 4),
+            ("", "Bancos Conta Movimento", 3),
+            ("10", "Caixa", 1),
+        ])
+        keys = {m.client_description: m.description_key for m in self.db.query(models.AccountMapping)}
+        self.assertEqual(keys["Bancos"], description_key("bancos"))
+        self.assertEqual(keys["Bancos Conta Movimento"], description_key("bancos conta movimento"))
+
+
+if __name__ == '__main__':
+    unittest.main()
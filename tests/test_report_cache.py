@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.api import models
+from src.api.services import report_cache
+from src.api.services.report_cache import claim_render, release_render, render_report, report_key
+from tests.helpers import make_sessionmaker, override_dependencies, seed_firm
+
+
+class TestReportCache(unittest.TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        patcher = mock.patch.object(report_cache, "REPORT_CACHE_DIR", cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        Session = make_sessionmaker()
+        self.db = Session()
+
+        _, self.user, _, self.engagement = seed_firm(self.db, "Client SA", "Audit 2024",
+                                                     end_date=datetime(2024, 12, 31))
+        self.mistatement = models.Mistatement(engagement_id=self.engagement.id, description="Cut-off",
+                                              amount_divergence=100.0, type="factual", status="open")
+        self.db.add_all([
+            self.mistatement,
+            models.AnalysisResult(engagement_id=self.engagement.id, test_type="duplicates",
+                                  result={"duplicates": []}, executed_at=datetime(2024, 3, 1)),
+            models.Transaction(engagement_id=self.engagement.id, vendor="V", amount=10.0),
+        ])
+        self.db.commit()
+
+        override_dependencies(self, Session, self.user)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_key_follows_inputs(self):
+        key = report_key(self.db, self.engagement, 'pdf')
+        self.assertEqual(report_key(self.db, self.engagement, 'pdf'), key)
+        self.assertNotEqual(report_key(self.db, self.engagement, 'docx'), key)
+
+        self.mistatement.status = "adjusted"
+        self.db.commit()
+        adjusted = report_key(self.db, self.engagement, 'pdf')
+        self.assertNotEqual(adjusted, key)
+
+        self.engagement.client_letterhead_url = "/static/letterheads/1.png"
+        self.db.commit()
+        letterhead = report_key(self.db, self.engagement, 'pdf')
+        self.assertNotEqual(letterhead, adjusted)
+
+        # A reload changes the key even if nothing bumped the balances version
+        self.db.add(models.Transaction(engagement_id=self.engagement.id, vendor="V", amount=20.0))
+        self.db.commit()
+        self.assertNotEqual(report_key(self.db, self.engagement, 'pdf'), letterhead)
+        self.assertIsNone(self.engagement.balances_version)
+
+        # The report date is printed: the next day needs a new render
+        self.assertNotEqual(report_key(self.db, self.engagement, 'pdf', date(2024, 3, 1)),
+                            report_key(self.db, self.engagement, 'pdf', date(2024, 3, 2)))
+
+    def test_render_once_and_drop_stale(self):
+        with mock.patch.object(report_cache, "generate_audit_report", wraps=report_cache.generate_audit_report) as generate:
+            path = render_report(self.db, self.engagement.id, 'pdf')
+            self.assertEqual(render_report(self.db, self.engagement.id, 'pdf'), path)
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(generate.call_args.kwargs["transaction_count"], 1)
+        self.assertEqual(generate.call_args.kwargs["report_date"], date.today())
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(4), b"%PDF")
+
+        self.db.add(models.AnalysisResult(engagement_id=self.engagement.id, test_type="duplicates",
+                                          result={"duplicates": []}))
+        self.db.commit()
+        new_path = render_report(self.db, self.engagement.id, 'pdf')
+        self.assertNotEqual(new_path, path)
+        self.assertFalse(os.path.exists(path))
+
+        docx_path = render_report(self.db, self.engagement.id, 'docx')
+        self.assertTrue(os.path.exists(docx_path) and os.path.exists(new_path))
+
+    def test_claim_coalesces(self):
+        self.assertTrue(claim_render(self.engagement.id, "abc", 'pdf'))
+        self.assertFalse(claim_render(self.engagement.id, "abc", 'pdf'))
+        self.assertTrue(claim_render(self.engagement.id, "abc", 'docx'))
+        with mock.patch.object(report_cache, "RENDER_CLAIM_SECONDS", -1):
+            self.assertTrue(claim_render(self.engagement.id, "abc", 'pdf'))
+        release_render(self.engagement.id, "abc", 'pdf')
+        self.assertTrue(claim_render(self.engagement.id, "abc", 'pdf'))
+
+    def test_endpoint_renders_in_background_then_serves_cache(self):
+        url = f"/engagements/{self.engagement.id}/report"
+        with mock.patch("src.api.routes.analysis.task_render_report") as task:
+            first = self.client.get(url, params={"format": "pdf"})
+            second = self.client.get(url, params={"format": "pdf"})
+        self.assertEqual((first.status_code, second.status_code), (202, 202))
+        self.assertEqual(first.json()["task_id"], second.json()["task_id"])
+        task.apply_async.assert_called_once()
+        self.assertEqual(task.apply_async.call_args.kwargs["task_id"], first.json()["task_id"])
+
+        # What the worker runs
+        render_report(self.db, *task.apply_async.call_args.args[0])
+        response = self.client.get(url, params={"format": "pdf"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/pdf")
+        self.assertIn("Relatorio_Auditoria_Client_SA_2024.pdf", response.headers["content-disposition"])
+        self.assertEqual(response.content[:4], b"%PDF")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.api import models
+from src.api.services import ledger_snapshot
+from src.api.services.sampling import (
+    allocate, monetary_unit_sample, random_sample, sampling_rng, stratified_sample, systematic_sample
+)
+from tests.helpers import make_sessionmaker, override_dependencies, seed_firm
+
+
+class TestSamplingEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.amounts = np.random.default_rng(0).lognormal(5, 2, 20000)
+        self.amounts[::50] = np.nan
+
+    def test_reproducible(self):
+        for draw in (
+            lambda rng: random_sample(len(self.amounts), 50, rng),
+            lambda rng: systematic_sample(len(self.amounts), 50, rng),
+            lambda rng: monetary_unit_sample(self.amounts, 50, rng, 'cell').indexes,
+            lambda rng: stratified_sample(self.amounts, 50, rng, boundaries=[100, 1000]).indexes,
+        ):
+            first = draw(sampling_rng(7))
+            np.testing.assert_array_equal(first, draw(sampling_rng(7)))
+            self.assertFalse(np.array_equal(first, draw(sampling_rng(8))))
+
+    def test_random_and_systematic(self):
+        selected = random_sample(100, 500, sampling_rng(1))
+        np.testing.assert_array_equal(selected, np.arange(100))
+
+        selected = systematic_sample(1000, 10, sampling_rng(1))
+        self.assertEqual(len(selected), 10)
+        self.assertTrue(np.all(np.diff(selected) == 100))
+        with self.assertRaises(ValueError):
+            systematic_sample(1000, 0, sampling_rng(1))
+
+    def test_monetary_unit_sampling(self):
+        amounts = np.array([10.0, np.nan, 0.0, -5000.0, 20.0, 30.0, 40.0])
+        for selection in ('systematic', 'cell', 'random'):
+            sample = monetary_unit_sample(amounts, 4, sampling_rng(3), selection)
+            self.assertNotIn(1, sample.indexes)
+            self.assertNotIn(2, sample.indexes)
+            self.assertEqual(sample.population_value, 5100.0)
+            self.assertEqual(sample.hits.sum(), 4)
+        # Above the interval (1275): always selected, once per sampling point in it
+        sample = monetary_unit_sample(amounts, 4, sampling_rng(3))
+        self.assertIn(3, sample.indexes)
+        self.assertGreaterEqual(sample.hits[list(sample.indexes).index(3)], 3)
+
+        with self.assertRaises(ValueError):
+            monetary_unit_sample(np.array([np.nan, 0.0]), 2, sampling_rng(3))
+
+    def test_allocate(self):
+        np.testing.assert_array_equal(allocate(10, [3, 100, 50], [5, 1, 0]), [3, 7, 0])
+        np.testing.assert_array_equal(allocate(10, [3, 4], [0, 0]), [3, 4])
+        self.assertEqual(allocate(7, [10, 10, 10], [1, 1, 1]).sum(), 7)
+
+    def test_stratified_optimal_allocation(self):
+        # Constant amounts in stratum 0: no variance, so Neyman gives it nothing
+        amounts = np.concatenate([np.full(1000, 50.0), np.linspace(100, 900, 1000), [5000.0, 6000.0]])
+        sample = stratified_sample(amounts, 20, sampling_rng(2), boundaries=[100], certainty_threshold=1000)
+        np.testing.assert_array_equal(sample.population_counts, [1000, 1000])
+        np.testing.assert_array_equal(sample.sample_counts, [0, 20])
+        self.assertEqual(sample.certainty_count, 2)
+        self.assertEqual(len(sample.indexes), 22)
+        np.testing.assert_array_equal(sample.indexes[sample.strata == -1], [2000, 2001])
+
+        sample = stratified_sample(amounts, 20, sampling_rng(2), boundaries=[100], allocation='proportional')
+        np.testing.assert_array_equal(sample.sample_counts, [10, 10])
+        self.assertTrue(np.all(amounts[sample.indexes[sample.strata == 0]] < 100))
+
+
+class TestSamplingEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(ledger_snapshot, "SNAPSHOT_DIR", tempfile.mkdtemp())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        Session = make_sessionmaker()
+        self.db = Session()
+
+        _, self.user, _, self.engagement = seed_firm(self.db, engagement_name="Ledger")
+        self.db.add_all([
+            models.Transaction(engagement_id=self.engagement.id, vendor=f"V{i}", amount=float(i * 10) if i % 7 else None)
+            for i in range(60)
+        ] + [models.Transaction(engagement_id=self.engagement.id, vendor="Big", amount=100000.0)])
+        self.db.commit()
+
+        override_dependencies(self, Session, self.user)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def run_sampling(self, method, params):
+        response = self.client.post(f"/engagements/{self.engagement.id}/sampling/{method}", json=params)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()["result"]
+
+    def test_seeded_samples_repeat(self):
+        for method in ("random", "systematic", "mus"):
+            first = self.run_sampling(method, {"sample_size": 5, "seed": 11})
+            second = self.run_sampling(method, {"sample_size": 5, "seed": 11})
+            self.assertEqual([i["id"] for i in first["items"]], [i["id"] for i in second["items"]])
+            self.assertEqual(first["seed"], 11)
+
+        unseeded = self.run_sampling("random", {"sample_size": 5})
+        again = self.run_sampling("random", {"sample_size": 5, "seed": unseeded["seed"]})
+        self.assertEqual([i["id"] for i in unseeded["items"]], [i["id"] for i in again["items"]])
+
+    def test_mus_selects_large_amount(self):
+        result = self.run_sampling("mus", {"sample_size": 4, "selection": "cell", "seed": 1})
+        big = [item for item in result["items"] if item["vendor"] == "Big"]
+        self.assertEqual(len(big), 1)
+        self.assertGreaterEqual(big[0]["hits"], 3)
+
+    def test_stratified(self):
+        result = self.run_sampling("stratified", {"threshold": 1000, "sample_size_below": 6,
+                                                  "boundaries": [200], "seed": 3})
+        self.assertEqual(result["high_value_count"], 1)
+        self.assertEqual(result["low_value_sample_count"], 6)
+        self.assertEqual(sum(s["sample"] for s in result["strata"]), 6)
+        self.assertEqual([i["reason"] for i in result["items"] if i["vendor"] == "Big"], ["High Value"])
+
+        response = self.client.post(f"/engagements/{self.engagement.id}/sampling/stratified",
+                                    json={"allocation": "equal"})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
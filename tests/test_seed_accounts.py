@@ -0,0 +1,59 @@
+import unittest
+
+from sqlalchemy import inspect, text
+
+from src.scripts.seed_accounts import apply_schema_patches, schema_patch_statements
+from tests.helpers import make_session
+
+
+class TestSchemaPatches(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_session()
+        self.engine = self.db.get_bind()
+        # A database created before these columns and constraints existed
+        with self.engine.begin() as connection:
+            connection.execute(text("DROP INDEX ix_account_mappings_firm_description_key"))
+            connection.execute(text("ALTER TABLE account_mappings DROP COLUMN description_key"))
+            connection.execute(text("ALTER TABLE engagements DROP COLUMN balances_version"))
+            connection.execute(text("ALTER TABLE account_mappings DROP COLUMN updated_at"))
+            connection.execute(text("DROP TABLE ledger_snapshots"))
+            connection.execute(text(
+                "CREATE TABLE ledger_snapshots (id INTEGER PRIMARY KEY, engagement_id INTEGER, version INTEGER, "
+                "path VARCHAR, row_count INTEGER, checksum VARCHAR, created_at DATETIME)"
+            ))
+            connection.execute(text(
+                "INSERT INTO ledger_snapshots (id, engagement_id, version) VALUES (1, 1, 1), (2, 1, 1), (3, 1, 2)"
+            ))
+
+    def tearDown(self):
+        self.db.close()
+
+    def columns(self, table):
+        return {c["name"] for c in inspect(self.engine).get_columns(table)}
+
+    def test_patches_old_sqlite_database(self):
+        apply_schema_patches(self.db)
+
+        self.assertIn("balances_version", self.columns("engagements"))
+        self.assertTrue({"description_key", "updated_at"} <= self.columns("account_mappings"))
+        indexes = {i["name"] for i in inspect(self.engine).get_indexes("account_mappings")}
+        self.assertIn("ix_account_mappings_firm_description_key", indexes)
+        self.assertIn("uq_ledger_snapshots_engagement_version",
+                      {i["name"] for i in inspect(self.engine).get_indexes("ledger_snapshots")})
+        self.assertEqual(self.db.execute(text("SELECT id FROM ledger_snapshots ORDER BY id")).scalars().all(), [1, 3])
+
+        # Idempotent: nothing left to add, and the rest runs cleanly again
+        self.assertFalse([s for s in schema_patch_statements(self.engine) if s.startswith("ALTER")])
+        apply_schema_patches(self.db)
+        self.assertIn("description_key", self.columns("account_mappings"))
+
+    def test_postgresql_only_syntax_is_not_used_on_sqlite(self):
+        statements = " ".join(schema_patch_statements(self.engine))
+        self.assertNotIn("ADD COLUMN IF NOT EXISTS", statements)
+        self.assertNotIn("NULLS NOT DISTINCT", statements)
+        self.assertNotIn("USING", statements)
+
+
+if __name__ == '__main__':
+    unittest.main()
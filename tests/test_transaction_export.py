@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+import unittest
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+from src.api.main import app
+from src.api import models
+from src.api.services.transaction_export import iter_transaction_rows, stream_transactions
+from tests.helpers import make_sessionmaker, override_dependencies, seed_firm
+
+
+class TestTransactionExport(unittest.TestCase):
+
+    def setUp(self):
+        Session = make_sessionmaker()
+        self.db = Session()
+
+        _, self.user, _, self.engagement = seed_firm(self.db, engagement_name="Ledger")
+        self.db.add_all([
+            models.Transaction(engagement_id=self.engagement.id, vendor="Fornecedor A", amount=10.5,
+                               date=datetime(2024, 1, 5), account_code="1.1", account_name="Caixa"),
+            models.Transaction(engagement_id=self.engagement.id, vendor="Ação, \"Ltda\"", amount=-3.0,
+                               description="linha\nquebrada"),
+            models.Transaction(engagement_id=self.engagement.id, vendor="C", amount=7.0, date=datetime(2024, 2, 1)),
+        ])
+        self.db.commit()
+
+        override_dependencies(self, Session, self.user)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_rows_in_chunks(self):
+        chunks = list(iter_transaction_rows(self.db, self.engagement.id, chunk_rows=2))
+        self.assertEqual([len(c) for c in chunks], [2, 1])
+        self.assertEqual(chunks[0][0][2:4], ("Fornecedor A", 10.5))
+
+    def test_csv(self):
+        parts = list(stream_transactions(self.db, self.engagement.id, 'csv', chunk_rows=2))
+        self.assertEqual(len(parts), 3)  # Header, then one part per chunk
+        rows = list(csv.reader(io.StringIO(b"".join(parts).decode('utf-8'))))
+        self.assertEqual(rows[0], ['ID', 'Data', 'Fornecedor', 'Valor', 'Descrição', 'Conta', 'Nome da Conta'])
+        self.assertEqual(rows[1][1:], ['2024-01-05 00:00:00', 'Fornecedor A', '10.5', '', '1.1', 'Caixa'])
+        self.assertEqual(rows[2][2:5], ['Ação, "Ltda"', '-3.0', 'linha\nquebrada'])
+        self.assertEqual(len(rows), 4)
+
+    def test_ndjson(self):
+        body = b"".join(stream_transactions(self.db, self.engagement.id, 'ndjson', chunk_rows=2)).decode('utf-8')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]["date"], "2024-01-05T00:00:00")
+        self.assertEqual(records[1]["vendor"], 'Ação, "Ltda"')
+        self.assertIsNone(records[1]["date"])
+
+    def test_xlsx(self):
+        body = b"".join(stream_transactions(self.db, self.engagement.id, 'xlsx', chunk_rows=2))
+        sheet = load_workbook(io.BytesIO(body))["Transactions"]
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:3], ('ID', 'Data', 'Fornecedor'))
+        self.assertEqual(rows[1][1:4], (datetime(2024, 1, 5), 'Fornecedor A', 10.5))
+        self.assertEqual(len(rows), 4)
+
+    def test_endpoint_streams_transactions(self):
+        response = self.client.get(f"/engagements/{self.engagement.id}/export/transactions", params={"format": "ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        self.assertIn("transactions_Ledger.ndjson", response.headers["content-disposition"])
+        self.assertEqual(len(response.text.splitlines()), 3)
+
+        response = self.client.get(f"/engagements/{self.engagement.id}/export/transactions", params={"format": "csv"})
+        self.assertEqual(len(list(csv.reader(io.StringIO(response.text)))), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import io
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from src.api import models
+from src.api.services.benford_sketch import get_benford_counts
+from src.api.services import vendor_registry
+from src.api.services.transaction_ingest import ingest_transactions, IngestError
+from src.api.services.vendor_registry import resolve_vendor_ids
+from src.scripts.benford_analysis import benford_counts
+from tests.helpers import make_session, seed_firm
+
+
+class TestTransactionIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_session()
+        self.firm, _, _, self.engagement = seed_firm(self.db)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _ingest(self, csv_text, chunk_size=2):
+        stats = ingest_transactions(self.db, self.engagement.id, self.firm.id,
+                                    io.BytesIO(csv_text.encode()), chunk_size=chunk_size)
+        self.db.commit()
+        return stats
+
+    def test_chunks_are_loaded_with_aliases_and_vendor_ids(self):
+        stats = self._ingest(
+            "Vendor,Amount,Date,Conta,Descricao\n"
+            "Acme Ltda,123.45,2024-01-15,1.10,Caixa\n"
+            "ACME LTDA.,987.00,2024-02-01,1.10,Caixa\n"
+            "Beta SA,15.5,,2.1,\n"
+            "Gama,42,15/03/2024,,Bancos\n"
+            "Delta,abc,2024-03-20,3,Outros\n"
+        )
+        self.assertEqual(stats.rows, 5)
+        self.assertEqual(stats.chunks, 3)
+
+        txs = self.db.query(models.Transaction).order_by(models.Transaction.id).all()
+        self.assertEqual([t.vendor for t in txs], ["Acme Ltda", "ACME LTDA.", "Beta SA", "Gama", "Delta"])
+        self.assertEqual(txs[0].account_code, "1.10")
+        self.assertEqual(txs[0].account_name, "Caixa")
+        self.assertEqual(txs[0].date, datetime(2024, 1, 15))
+        self.assertIsNone(txs[2].date)
+        self.assertIsNone(txs[2].account_name)
+        self.assertIsNone(txs[3].account_code)
+        self.assertIsNone(txs[4].amount)
+
+        # Same canonical vendor across chunks
+        self.assertEqual(txs[0].vendor_id, txs[1].vendor_id)
+        self.assertEqual(self.db.query(models.Vendor).count(), 4)
+
+        self.assertEqual(get_benford_counts(self.db, [self.engagement.id]),
+                         benford_counts([123.45, 987.0, 15.5, 42.0]))
+
+    def test_dates_are_day_first_in_every_chunk(self):
+        self._ingest(
+            "Vendor,Amount,Date\n"
+            "A,1,13/01/2024\n"
+            "B,2,05/01/2024\n"
+            "C,3,05/01/2024\n"
+            "D,4,2024-02-01\n"
+            "E,5,5/1/2024\n"
+        )
+        dates = [t.date for t in self.db.query(models.Transaction).order_by(models.Transaction.id)]
+        self.assertEqual(dates, [datetime(2024, 1, 13), datetime(2024, 1, 5), datetime(2024, 1, 5),
+                                 datetime(2024, 2, 1), datetime(2024, 1, 5)])
+
+    def test_vendor_created_concurrently_is_reused(self):
+        existing = models.Vendor(firm_id=self.firm.id, normalized_name="acme ltda", name="Acme Ltda")
+        self.db.add(existing)
+        self.db.commit()
+
+        # The first lookup misses it, as when another ingest inserts it in between
+        lookups = iter([lambda *args: {}, vendor_registry._vendor_ids])
+        with mock.patch.object(vendor_registry, "_vendor_ids", side_effect=lambda *args: next(lookups)(*args)):
+            ids = resolve_vendor_ids(self.db, self.firm.id, ["ACME LTDA.", "Beta SA"])
+        self.db.commit()
+
+        self.assertEqual(ids[0], existing.id)
+        self.assertEqual(self.db.query(models.Vendor).count(), 2)
+
+    def test_missing_columns(self):
+        with self.assertRaises(IngestError):
+            self._ingest("supplier,value\nAcme,10\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.api import models
+from src.api.services.transaction_query import TransactionFilters, page_transactions
+from tests.helpers import make_sessionmaker, override_dependencies, seed_firm
+
+
+class TestTransactionQuery(unittest.TestCase):
+
+    def setUp(self):
+        Session = make_sessionmaker()
+        self.db = Session()
+
+        _, self.user, client, self.engagement = seed_firm(self.db)
+        other = models.Engagement(name="Other", client_id=client.id)
+        self.db.add(other)
+        self.db.flush()
+
+        rows = []
+        for i in range(23):
+            # Several rows per day, inserted out of date order, and a few undated
+            date = datetime(2024, 1, 1 + (i * 7) % 5) if i % 6 else None
+            rows.append(models.Transaction(engagement_id=self.engagement.id, vendor=f"Vendor {i % 3}",
+                                           account_code=f"1.{i % 4}", amount=float(i * 10), date=date))
+        rows.append(models.Transaction(engagement_id=other.id, vendor="Vendor 0", amount=1.0))
+        self.db.add_all(rows)
+        self.db.commit()
+
+        override_dependencies(self, Session, self.user)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _expected(self, keep=lambda t: True):
+        rows = [t for t in self.db.query(models.Transaction).filter(
+            models.Transaction.engagement_id == self.engagement.id) if keep(t)]
+        dated = sorted((t for t in rows if t.date), key=lambda t: (t.date, t.id))
+        return [t.id for t in dated] + sorted(t.id for t in rows if not t.date)
+
+    def _walk(self, filters=None, limit=5):
+        ids, cursor, pages = [], None, 0
+        while True:
+            page = page_transactions(self.db, self.engagement.id, filters, cursor, limit)
+            ids += [t.id for t in page.items]
+            pages += 1
+            if page.next_cursor is None:
+                return ids, pages
+            cursor = page.next_cursor
+
+    def test_pages_cover_rows_in_order(self):
+        for limit in (1, 4, 5, 23, 100):
+            ids, pages = self._walk(limit=limit)
+            self.assertEqual(ids, self._expected())
+            self.assertEqual(pages, max(-(-23 // limit), 1))
+
+        first = page_transactions(self.db, self.engagement.id, limit=5)
+        self.assertEqual((first.total, first.total_is_estimate), (23, False))
+        second = page_transactions(self.db, self.engagement.id, cursor=first.next_cursor, limit=5)
+        self.assertIsNone(second.total)
+
+    def test_filters(self):
+        filters = TransactionFilters(vendor="Vendor 1", min_amount=50, max_amount=200,
+                                     date_from=datetime(2024, 1, 2))
+        ids, _ = self._walk(filters, limit=2)
+        self.assertEqual(ids, self._expected(
+            lambda t: t.vendor == "Vendor 1" and 50 <= t.amount <= 200 and t.date and t.date >= datetime(2024, 1, 2)
+        ))
+        self.assertTrue(ids)
+
+        ids, _ = self._walk(TransactionFilters(account_code="1.2"), limit=3)
+        self.assertEqual(ids, self._expected(lambda t: t.account_code == "1.2"))
+
+    def test_total_is_capped_estimate(self):
+        with mock.patch("src.api.services.transaction_query.EXACT_COUNT_LIMIT", 10):
+            page = page_transactions(self.db, self.engagement.id)
+        self.assertEqual((page.total, page.total_is_estimate), (11, True))
+
+    def test_endpoint(self):
+        url = f"/engagements/{self.engagement.id}/transactions"
+        response = self.client.get(url, params={"limit": 10, "vendor": "Vendor 2"})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["total"], 7)
+        self.assertEqual(len(body["items"]), 7)
+        self.assertIsNone(body["next_cursor"])
+
+        self.assertEqual(self.client.get(url, params={"cursor": "not-a-cursor"}).status_code, 400)
+        self.assertEqual(self.client.get(url, params={"limit": 5000}).status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
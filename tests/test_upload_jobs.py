@@ -0,0 +1,82 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import UploadFile
+
+from src.api import models, tasks
+from src.api.services import ledger_snapshot, upload_jobs
+from src.api.services.payroll_ingest import summarize_payroll
+from src.api.services.transaction_ingest import IngestError
+from src.api.services.upload_jobs import UploadProgress, spool_upload
+from tests.helpers import make_sessionmaker, seed_firm
+
+
+class TestUploadJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        for patcher in (mock.patch.object(upload_jobs, "UPLOAD_SPOOL_DIR", self.spool_dir),
+                        mock.patch.object(ledger_snapshot, "SNAPSHOT_DIR", os.path.join(self.spool_dir, "snapshots"))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.Session = make_sessionmaker()
+        db = self.Session()
+        firm, _, _, engagement = seed_firm(db)
+        db.commit()
+        self.firm_id, self.engagement_id = firm.id, engagement.id
+        db.close()
+
+    def _spool(self, content, filename="upload.csv"):
+        return spool_upload(UploadFile(filename=filename, file=io.BytesIO(content)))
+
+    def test_ingest_task_loads_and_removes_spooled_file(self):
+        path = self._spool(b"vendor,amount\nAcme,10.5\nBeta,abc\n")
+        self.assertTrue(path.endswith(".csv"))
+
+        with mock.patch.object(tasks, "SessionLocal", self.Session):
+            result = tasks.task_ingest_transactions(self.engagement_id, self.firm_id, path)
+
+        self.assertEqual(result["status"], "completed")
+        self.assertEqual(result["stats"]["rows"], 2)
+        self.assertEqual(result["stats"]["errors"], 1)
+        self.assertFalse(os.path.exists(path))
+        db = self.Session()
+        self.assertEqual(db.query(models.Transaction).count(), 2)
+        self.assertEqual(db.query(models.LedgerSnapshot).one().row_count, 2)
+        db.close()
+
+    def test_ingest_task_reports_invalid_file(self):
+        path = self._spool(b"supplier,value\nAcme,10\n")
+        with mock.patch.object(tasks, "SessionLocal", self.Session):
+            result = tasks.task_ingest_transactions(self.engagement_id, self.firm_id, path)
+        self.assertIn("error", result)
+        self.assertFalse(os.path.exists(path))
+
+    def test_progress_meta(self):
+        source = io.BytesIO(b"x" * 100)
+        source.seek(25)
+        progress = UploadProgress(None, source, 100)
+        meta = progress.meta(rows=10, errors=1)
+        self.assertEqual(meta["fraction"], 0.25)
+        self.assertEqual((meta["rows"], meta["errors"]), (10, 1))
+        self.assertIsNotNone(meta["eta_seconds"])
+
+    def test_payroll_summary_is_chunked(self):
+        csv_content = b"Code,Name,Gross_Salary,INSS,FGTS\n1,Ana,1000,110,80\n2,Bia,2000,220,160\n3,Caio,x,0,0\n"
+        seen = []
+        summary = summarize_payroll(io.BytesIO(csv_content), chunk_size=2, progress=lambda r, e: seen.append((r, e)))
+        self.assertEqual(summary["total_gross"], 3000.0)
+        self.assertEqual(summary["total_fgts"], 240.0)
+        self.assertEqual(summary["employee_count"], 3)
+        self.assertEqual(seen, [(2, 0), (3, 1)])
+
+        with self.assertRaises(IngestError):
+            summarize_payroll(io.BytesIO(b"name,salary\nAna,1\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()